@@ -0,0 +1,110 @@
+"""
+Synthetic Issue Log / Schedule generators for benchmarks
+Produces rows in the column layout of resources/knowledge/sheet_structure_proposal.md
+"""
+
+import random
+from datetime import date, timedelta
+from typing import List, Any
+
+
+ISSUE_HEADERS = ['ID', '起票日', 'カテゴリ', '内容', 'ベンダー名', '担当者',
+                 '優先度', '期限', 'ステータス', '影響範囲', '更新日']
+
+SCHEDULE_HEADERS = ['ID', 'タスク', 'ベンダー名', '担当者', '開始予定', '終了予定',
+                    'ステータス', '進捗率', '依存タスクID', 'クリティカルパス', 'メモ']
+
+VENDORS = [f"ベンダー{c}" for c in "ABCDEFGHIJKLMNO"]  # 15社
+ASSIGNEES = ['鈴木', '佐藤', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤']
+CATEGORIES = ['技術課題', '環境構築', '仕様確認', '品質', '調達', '体制']
+PRIORITIES = ['緊急', '高', '中', '低']
+IMPACTS = ['全体', '特定ベンダー', '限定的']
+ISSUE_STATUSES = ['新規', '対応中', '保留', '完了']
+TASK_STATUSES = ['未着手', '進行中', '停滞', '完了', '保留']
+
+SUBJECTS = ['API連携', 'SIT環境', '認証基盤', 'バッチ処理', 'データ移行', '帳票出力',
+            '外部IF', 'ネットワーク', '性能試験', 'ログ監視']
+PROBLEMS = ['エラーが解消しない', '手順書が未提出', '接続テストで遅延発生',
+            '仕様の認識齟齬あり', '担当者不在で停滞', '再現性のない障害',
+            '見積もりが未回答', 'テストデータ不足']
+TASK_VERBS = ['設計レビュー', '結合テスト', '環境準備', '移行リハーサル', '性能測定', '受入確認']
+
+
+def generate_issues(count: int, seed: int = 42, today: date = None) -> List[List[Any]]:
+    """
+    Generate an Issue Log sheet (header + count rows)
+
+    Args:
+        count: Number of issue rows
+        seed: Random seed for reproducible data
+        today: Reference date for 起票日/期限 (default: today)
+
+    Returns:
+        Rows including the header row
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    rows: List[List[Any]] = [list(ISSUE_HEADERS)]
+
+    for i in range(1, count + 1):
+        opened = today - timedelta(days=rng.randint(0, 120))
+        deadline = opened + timedelta(days=rng.randint(3, 60))
+        updated = min(today, opened + timedelta(days=rng.randint(0, 30)))
+        content = f"{rng.choice(SUBJECTS)}の{rng.choice(PROBLEMS)}（#{rng.randint(100, 999)}）"
+
+        rows.append([
+            str(i),
+            opened.strftime('%Y-%m-%d'),
+            rng.choice(CATEGORIES),
+            content,
+            rng.choice(VENDORS),
+            rng.choice(ASSIGNEES),
+            rng.choice(PRIORITIES),
+            # A few rows use the slash format seen in hand-edited sheets
+            deadline.strftime('%Y/%m/%d' if rng.random() < 0.05 else '%Y-%m-%d'),
+            rng.choices(ISSUE_STATUSES, weights=[3, 4, 1, 4])[0],
+            rng.choice(IMPACTS),
+            updated.strftime('%Y-%m-%d')
+        ])
+
+    return rows
+
+
+def generate_schedule(count: int, seed: int = 7, today: date = None) -> List[List[Any]]:
+    """
+    Generate a Schedule sheet (header + count rows)
+
+    Args:
+        count: Number of task rows
+        seed: Random seed for reproducible data
+        today: Reference date for 開始予定/終了予定 (default: today)
+
+    Returns:
+        Rows including the header row
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    rows: List[List[Any]] = [list(SCHEDULE_HEADERS)]
+
+    for i in range(1, count + 1):
+        start = today + timedelta(days=rng.randint(-60, 30))
+        end = start + timedelta(days=rng.randint(1, 30))
+        status = rng.choices(TASK_STATUSES, weights=[3, 5, 1, 4, 1])[0]
+        progress = 100 if status == '完了' else rng.randint(0, 90)
+        depends = ",".join(str(rng.randint(1, max(1, i - 1))) for _ in range(rng.randint(0, 2))) if i > 1 else ""
+
+        rows.append([
+            str(i),
+            f"{rng.choice(SUBJECTS)}{rng.choice(TASK_VERBS)}",
+            rng.choice(VENDORS),
+            rng.choice(ASSIGNEES),
+            start.strftime('%Y-%m-%d'),
+            end.strftime('%Y-%m-%d'),
+            status,
+            f"{progress}%",
+            depends,
+            'TRUE' if rng.random() < 0.1 else 'FALSE',
+            ''
+        ])
+
+    return rows
@@ -0,0 +1,440 @@
+"""
+In-memory fakes for the Sheets values() API, Vertex AI GenerativeModel and Firestore
+Used by benchmarks and load tests; latency is injected per call
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+
+def column_to_index(letters: str) -> int:
+    """Convert column letters to a 0-based index (A -> 0, AA -> 26)"""
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + (ord(ch) - 64)
+    return index - 1
+
+
+def index_to_column(index: int) -> str:
+    """Convert a 0-based index to column letters (0 -> A, 26 -> AA)"""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+_CELL_RE = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def parse_a1(range_name: str):
+    """
+    Parse an A1 range into (sheet, row_start, row_end, col_start, col_end)
+
+    Rows and columns are 0-based, ends exclusive; None means unbounded.
+    """
+    sheet, _, cells = range_name.partition("!")
+    sheet = sheet.strip("'")
+
+    if not cells:
+        return sheet, 0, None, 0, None
+
+    start, _, end = cells.partition(":")
+    end = end or start
+
+    start_col, start_row = _CELL_RE.match(start).groups()
+    end_col, end_row = _CELL_RE.match(end).groups()
+
+    col_start = column_to_index(start_col) if start_col else 0
+    col_end = column_to_index(end_col) + 1 if end_col else None
+    row_start = int(start_row) - 1 if start_row else 0
+    row_end = int(end_row) if end_row else None
+
+    return sheet, row_start, row_end, col_start, col_end
+
+
+class _Latency:
+    """Injected latency with optional jitter"""
+
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self.latency_s <= 0 and self.jitter_s <= 0:
+            return
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_s) if self.jitter_s else 0.0
+        time.sleep(self.latency_s + jitter)
+
+
+class FakeRequest:
+    """Mimics googleapiclient HttpRequest (execute only)"""
+
+    def __init__(self, func, latency: _Latency):
+        self._func = func
+        self._latency = latency
+
+    def execute(self, num_retries: int = 0):
+        self._latency.wait()
+        return self._func()
+
+
+class FakeSheetsService:
+    """
+    In-memory stand-in for build('sheets', 'v4')
+
+    Supports values().get/batchGet/append/update and spreadsheets().get/batchUpdate
+    (insertDimension, updateCells and setDataValidation; other requests are recorded only).
+    """
+
+    def __init__(self, sheets: Optional[Dict[str, List[List[Any]]]] = None,
+                 latency_s: float = 0.0, jitter_s: float = 0.0):
+        """
+        Args:
+            sheets: Mapping of sheet name to rows (first row is the header)
+            latency_s: Fixed latency added to every execute()
+            jitter_s: Maximum random extra latency per execute()
+        """
+        self.sheets = sheets if sheets is not None else {}
+        self.latency = _Latency(latency_s, jitter_s)
+        self.lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.bytes_served = 0
+        self.batch_requests: List[Dict[str, Any]] = []
+        self.validations: Dict[Any, Dict[str, Any]] = {}
+
+    def _count(self, name: str):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def spreadsheets(self):
+        return _FakeSpreadsheets(self)
+
+    def read(self, range_name: str) -> List[List[Any]]:
+        """Slice the stored rows like the Sheets API (trailing empties trimmed)"""
+        sheet, row_start, row_end, col_start, col_end = parse_a1(range_name)
+        rows = self.sheets.get(sheet, [])[row_start:row_end]
+
+        values = []
+        for row in rows:
+            cells = list(row[col_start:col_end])
+            while cells and cells[-1] in ("", None):
+                cells.pop()
+            values.append(cells)
+
+        while values and not values[-1]:
+            values.pop()
+
+        return values
+
+
+class _FakeSpreadsheets:
+
+    def __init__(self, service: FakeSheetsService):
+        self._service = service
+
+    def values(self):
+        return _FakeValues(self._service)
+
+    def get(self, spreadsheetId: str = None, ranges: List[str] = None,
+            includeGridData: bool = False, **kwargs):
+        def run():
+            self._service._count("get")
+            sheets = []
+            for i, (name, rows) in enumerate(self._service.sheets.items()):
+                sheet = {"properties": {"title": name, "sheetId": i,
+                                        "gridProperties": {"rowCount": max(len(rows), 1000),
+                                                           "columnCount": max(max((len(r) for r in rows), default=0), 26)}}}
+                if includeGridData:
+                    sheet["data"] = [self._grid_data(name, r) for r in ranges or [] if parse_a1(r)[0] == name]
+                sheets.append(sheet)
+            return {"sheets": sheets}
+        return FakeRequest(run, self._service.latency)
+
+    def _grid_data(self, sheet: str, range_name: str) -> Dict[str, Any]:
+        _, row_start, row_end, _, _ = parse_a1(range_name)
+        rows = self._service.sheets.get(sheet, [])
+        row_end = row_end if row_end is not None else len(rows)
+        width = max((len(r) for r in rows), default=0)
+
+        row_data = []
+        for r in range(row_start, row_end):
+            row = rows[r] if r < len(rows) else []
+            values = []
+            for c in range(width):
+                cell = {}
+                if c < len(row) and row[c] not in ("", None):
+                    cell["formattedValue"] = str(row[c])
+                rule = self._service.validations.get((sheet, c))
+                if rule is not None and r > 0:
+                    cell["dataValidation"] = rule
+                values.append(cell)
+            row_data.append({"values": values})
+        return {"startRow": row_start, "rowData": row_data}
+
+    def batchUpdate(self, spreadsheetId: str = None, body: Dict[str, Any] = None):
+        def run():
+            self._service._count("batchUpdate")
+            names = list(self._service.sheets)
+            with self._service.lock:
+                self._service.batch_requests.append(body)
+                for request in body.get("requests", []):
+                    if "insertDimension" in request:
+                        rng = request["insertDimension"]["range"]
+                        rows = self._service.sheets[names[rng["sheetId"]]]
+                        width = rng["endIndex"] - rng["startIndex"]
+                        for row in rows:
+                            if len(row) >= rng["startIndex"]:
+                                row[rng["startIndex"]:rng["startIndex"]] = [""] * width
+                        sheet = names[rng["sheetId"]]
+                        self._service.validations = {
+                            (s, c + width if s == sheet and c >= rng["startIndex"] else c): rule
+                            for (s, c), rule in self._service.validations.items()
+                        }
+                    elif "setDataValidation" in request:
+                        rng = request["setDataValidation"]["range"]
+                        sheet = names[rng["sheetId"]]
+                        for c in range(rng["startColumnIndex"], rng["endColumnIndex"]):
+                            self._service.validations[(sheet, c)] = request["setDataValidation"]["rule"]
+                    elif "updateCells" in request:
+                        update = request["updateCells"]
+                        start = update["start"]
+                        rows = self._service.sheets[names[start["sheetId"]]]
+                        for r, row_data in enumerate(update.get("rows", [])):
+                            row_index = start.get("rowIndex", 0) + r
+                            while len(rows) <= row_index:
+                                rows.append([])
+                            row = rows[row_index]
+                            for c, cell in enumerate(row_data.get("values", [])):
+                                col_index = start.get("columnIndex", 0) + c
+                                while len(row) <= col_index:
+                                    row.append("")
+                                value = cell.get("userEnteredValue", {})
+                                row[col_index] = next(iter(value.values()), "")
+            return {"replies": [{} for _ in body.get("requests", [])]}
+        return FakeRequest(run, self._service.latency)
+
+
+class _FakeValues:
+
+    def __init__(self, service: FakeSheetsService):
+        self._service = service
+
+    def _served(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        size = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        with self._service.lock:
+            self._service.bytes_served += size
+        return payload
+
+    def get(self, spreadsheetId: str = None, range: str = None, **kwargs):
+        def run():
+            self._service._count("values.get")
+            result = {"range": range, "majorDimension": "ROWS"}
+            values = self._service.read(range)
+            if values:
+                result["values"] = values
+            return self._served(result)
+        return FakeRequest(run, self._service.latency)
+
+    def batchGet(self, spreadsheetId: str = None, ranges: List[str] = None, **kwargs):
+        def run():
+            self._service._count("values.batchGet")
+            value_ranges = []
+            for range_name in ranges or []:
+                entry = {"range": range_name, "majorDimension": "ROWS"}
+                values = self._service.read(range_name)
+                if values:
+                    entry["values"] = values
+                value_ranges.append(entry)
+            return self._served({"valueRanges": value_ranges})
+        return FakeRequest(run, self._service.latency)
+
+    def append(self, spreadsheetId: str = None, range: str = None, body: Dict[str, Any] = None, **kwargs):
+        def run():
+            self._service._count("values.append")
+            sheet = range.partition("!")[0].strip("'")
+            with self._service.lock:
+                rows = self._service.sheets.setdefault(sheet, [])
+                rows.extend([list(r) for r in body.get("values", [])])
+            return {"updates": {"updatedRows": len(body.get("values", []))}}
+        return FakeRequest(run, self._service.latency)
+
+    def update(self, spreadsheetId: str = None, range: str = None, body: Dict[str, Any] = None, **kwargs):
+        def run():
+            self._service._count("values.update")
+            sheet, row_start, _, col_start, _ = parse_a1(range)
+            with self._service.lock:
+                rows = self._service.sheets.setdefault(sheet, [])
+                for r, values in enumerate(body.get("values", [])):
+                    while len(rows) <= row_start + r:
+                        rows.append([])
+                    row = rows[row_start + r]
+                    for c, value in enumerate(values):
+                        while len(row) <= col_start + c:
+                            row.append("")
+                        row[col_start + c] = value
+            return {"updatedRows": len(body.get("values", []))}
+        return FakeRequest(run, self._service.latency)
+
+
+class _FakeUsage:
+
+    def __init__(self, prompt_tokens: int, response_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+
+
+class _FakeTokenCount:
+    """Mimics vertexai CountTokensResponse"""
+
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+
+class FakeResponse:
+    """Mimics vertexai GenerationResponse (text and usage_metadata)"""
+
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = _FakeUsage(prompt_tokens, len(text) // 2)
+
+
+class FakeGenerativeModel:
+    """
+    Stand-in for vertexai GenerativeModel
+
+    Returns a fixed JSON answer after the injected latency. Token counts are
+    estimated at ~2 characters per token for mixed Japanese text.
+    """
+
+    DEFAULT_ANSWER = {
+        "analysis": "事実: 緊急課題が複数存在。推測: ベンダー間の調整遅延。リスク: SIT開始遅延。",
+        "recommendation": "- 緊急課題の担当者へ期限再確認\n- 停滞タスクの阻害要因を確認",
+        "next_action": "本日中に緊急課題のオーナーと15分の確認会を設定する"
+    }
+
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0,
+                 answer: Optional[Dict[str, Any]] = None, fail_rate: float = 0.0,
+                 seed: int = 0):
+        """
+        Args:
+            latency_s: Fixed latency per generate_content call
+            jitter_s: Maximum random extra latency per call
+            answer: JSON answer to return (default: DEFAULT_ANSWER)
+            fail_rate: Probability of raising an exception instead of answering
+        """
+        self.latency = _Latency(latency_s, jitter_s, seed)
+        self.answer = answer or self.DEFAULT_ANSWER
+        self.fail_rate = fail_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_chars = 0
+        self.last_prompt = ''
+        self.token_counts = 0
+
+    def generate_content(self, contents, **kwargs) -> FakeResponse:
+        prompt = contents if isinstance(contents, str) else str(contents)
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+            self.last_prompt = prompt
+            fail = self.fail_rate and self._random.random() < self.fail_rate
+
+        self.latency.wait()
+
+        if fail:
+            raise RuntimeError("503 Service Unavailable (injected)")
+
+        return FakeResponse(json.dumps(self.answer, ensure_ascii=False), len(prompt) // 2)
+
+    def count_tokens(self, contents, **kwargs):
+        prompt = contents if isinstance(contents, str) else str(contents)
+        with self._lock:
+            self.token_counts += 1
+        return _FakeTokenCount(len(prompt) // 2)
+
+
+class _FakeDocSnapshot:
+
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return json.loads(json.dumps(self._data)) if self._data is not None else None
+
+
+class _FakeDocRef:
+
+    def __init__(self, docs: Dict[str, Dict[str, Any]], doc_id: str):
+        self.docs, self.id = docs, doc_id
+
+    def get(self) -> _FakeDocSnapshot:
+        return _FakeDocSnapshot(self.id, self.docs.get(self.id))
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        base = self.docs.get(self.id, {}) if merge else {}
+        self.docs[self.id] = {**base, **json.loads(json.dumps(data))}
+
+
+class _FakeQuery:
+
+    def __init__(self, docs: Dict[str, Dict[str, Any]], field: str, value: Any):
+        self.docs, self.field, self.value = docs, field, value
+
+    def stream(self):
+        return [_FakeDocSnapshot(doc_id, data) for doc_id, data in list(self.docs.items())
+                if data.get(self.field) == self.value]
+
+
+class _FakeCollection:
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+
+    def document(self, doc_id: str) -> _FakeDocRef:
+        assert '/' not in doc_id
+        return _FakeDocRef(self.docs, doc_id)
+
+    def where(self, field: str, op: str, value: Any) -> _FakeQuery:
+        assert op == '=='
+        return _FakeQuery(self.docs, field, value)
+
+
+class _FakeWriteBatch:
+
+    def __init__(self):
+        self.writes = []
+
+    def set(self, ref: _FakeDocRef, data: Dict[str, Any], merge: bool = False):
+        self.writes.append((ref, data, merge))
+
+    def commit(self):
+        for ref, data, merge in self.writes:
+            ref.set(data, merge=merge)
+
+
+class FakeFirestore:
+    """
+    Stand-in for google.cloud.firestore.Client (documents, equality queries,
+    write batches); values round-trip through JSON like stored documents
+    """
+
+    def __init__(self):
+        self.collections: Dict[str, _FakeCollection] = {}
+
+    def collection(self, name: str) -> _FakeCollection:
+        return self.collections.setdefault(name, _FakeCollection())
+
+    def batch(self) -> _FakeWriteBatch:
+        return _FakeWriteBatch()
@@ -0,0 +1,292 @@
+"""
+Load Test Driver for handle_chat_message
+Drives the function through the functions-framework Flask app with a realistic
+command mix against fake backends, at increasing concurrency levels
+
+Usage:
+    python benchmarks/load_test.py --concurrency 1,4,16,32 --requests 200
+    python benchmarks/load_test.py --server --model-latency 1.5 --output load.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.dirname(__file__))
+
+import functions_framework
+from tools import tracing
+from run_benchmarks import build_clients, git_commit
+from stats import summarize, percentile
+
+
+MAIN_SOURCE = os.path.join(os.path.dirname(__file__), '../src/main.py')
+
+DEFAULT_MIX = "ask=5,risk=3,update=2"
+
+COMMANDS = {
+    'ask': [
+        '/ask 期限が近い緊急課題は？',
+        '/ask ベンダーAのリスクを整理して',
+        '/ask 今週のSIT準備で優先すべきことは？',
+        '/ask 停滞しているタスクの原因と対策は？',
+    ],
+    'risk': ['/risk-alert'],
+    'update': [
+        '/update-issue 技術課題|API連携エラー|ベンダーA|鈴木|高|2025-12-15',
+        '/update-issue 環境構築|SIT環境のDNS設定漏れ|ベンダーC|佐藤|緊急|2025-12-10|全体',
+    ],
+}
+
+
+def parse_mix(mix: str) -> List[Tuple[str, int]]:
+    """Parse 'ask=5,risk=3,update=2' into weighted command kinds"""
+    weights = []
+    for part in mix.split(','):
+        kind, _, weight = part.partition('=')
+        if kind not in COMMANDS:
+            raise ValueError(f"Unknown command kind: {kind}")
+        weights.append((kind, int(weight or 1)))
+    return weights
+
+
+class InProcessTarget:
+    """Send requests through the Flask test client (no sockets)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post('/', json=payload)
+        return response.status_code, response.get_json(silent=True) or {}
+
+
+class HttpServerTarget:
+    """Send requests to a threaded local WSGI server over HTTP keep-alive"""
+
+    def __init__(self, app, host: str = '127.0.0.1'):
+        from werkzeug.serving import make_server
+
+        self.server = make_server(host, 0, app, threaded=True)
+        self.host, self.port = host, self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def post(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        try:
+            conn.request('POST', '/', body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self._local.conn = None
+            raise
+
+        try:
+            return response.status, json.loads(data or b'{}')
+        except ValueError:
+            return response.status, {}
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_level(target, concurrency: int, total_requests: int,
+              weights: List[Tuple[str, int]], seed: int) -> Dict[str, Any]:
+    """Run one concurrency level and summarize latency, errors and stages"""
+    rng = random.Random(seed)
+    kinds = [k for k, _ in weights]
+    plan = rng.choices(kinds, weights=[w for _, w in weights], k=total_requests)
+    payloads = [(kind, {"message": {"text": rng.choice(COMMANDS[kind])}}) for kind in plan]
+
+    traces: List[Dict[str, Any]] = []
+    traces_lock = threading.Lock()
+
+    def sink(record):
+        with traces_lock:
+            traces.append(record)
+
+    tracing.set_sink(sink)
+    tracing.set_enabled(True)
+
+    latencies: Dict[str, List[float]] = {k: [] for k in kinds}
+    errors: Dict[str, int] = {k: 0 for k in kinds}
+    lock = threading.Lock()
+    cursor = iter(payloads)
+
+    def worker():
+        while True:
+            with lock:
+                item = next(cursor, None)
+            if item is None:
+                return
+
+            kind, payload = item
+            t0 = time.perf_counter()
+            try:
+                status, body = target.post(payload)
+                failed = status != 200 or str(body.get('text', '')).startswith('❌')
+            except Exception:
+                failed = True
+            elapsed = (time.perf_counter() - t0) * 1000
+
+            with lock:
+                latencies[kind].append(elapsed)
+                if failed:
+                    errors[kind] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - start
+
+    tracing.set_enabled(False)
+    tracing.set_sink(None)
+
+    all_samples = [s for samples in latencies.values() for s in samples]
+    total_errors = sum(errors.values())
+
+    return {
+        'concurrency': concurrency,
+        'overall': summarize(all_samples, wall),
+        'error_rate': round(total_errors / len(all_samples), 4) if all_samples else 0.0,
+        'by_command': {
+            kind: dict(summarize(samples, wall),
+                       error_rate=round(errors[kind] / len(samples), 4) if samples else 0.0)
+            for kind, samples in latencies.items() if samples
+        },
+        'stages': stage_breakdown(traces)
+    }
+
+
+def stage_breakdown(traces: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Aggregate span durations by stage name across all traced requests"""
+    durations: Dict[str, List[float]] = {}
+    for record in traces:
+        for span in record.get('spans', []):
+            durations.setdefault(span['name'], []).append(span['duration_ms'])
+
+    return {
+        name: {
+            'count': len(samples),
+            'mean_ms': round(sum(samples) / len(samples), 3),
+            'p95_ms': round(percentile(samples, 95), 3)
+        }
+        for name, samples in sorted(durations.items())
+    }
+
+
+def print_level(result: Dict[str, Any]):
+    overall = result['overall']
+    print(f"\n[concurrency={result['concurrency']}] "
+          f"{overall['ops_per_s']:.1f} req/s  p50={overall['p50_ms']:.1f}ms  "
+          f"p95={overall['p95_ms']:.1f}ms  p99={overall['p99_ms']:.1f}ms  "
+          f"errors={result['error_rate'] * 100:.1f}%")
+
+    for kind, stats in result['by_command'].items():
+        print(f"  {kind:<8} n={stats['count']:<5} p50={stats['p50_ms']:>8.1f}ms "
+              f"p95={stats['p95_ms']:>8.1f}ms errors={stats['error_rate'] * 100:.1f}%")
+
+    for name, stats in result['stages'].items():
+        print(f"    stage {name:<26} n={stats['count']:<6} mean={stats['mean_ms']:>8.1f}ms "
+              f"p95={stats['p95_ms']:>8.1f}ms")
+
+
+def find_knee(levels: List[Dict[str, Any]], factor: float = 2.0):
+    """First concurrency level whose p95 exceeds factor x the lowest level's p95"""
+    if not levels:
+        return None
+    baseline = levels[0]['overall']['p95_ms']
+    for level in levels[1:]:
+        if baseline and level['overall']['p95_ms'] > baseline * factor:
+            return level['concurrency']
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test handle_chat_message with fake backends")
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32',
+                        help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Command weights, e.g. ask=5,risk=3,update=2')
+    parser.add_argument('--issues', type=int, default=2000, help='Issue Log rows')
+    parser.add_argument('--tasks', type=int, default=300, help='Schedule rows')
+    parser.add_argument('--sheets-latency', type=float, default=0.05)
+    parser.add_argument('--model-latency', type=float, default=0.8)
+    parser.add_argument('--server', action='store_true',
+                        help='Use a threaded local HTTP server instead of the in-process test client')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+
+    app = functions_framework.create_app(target='handle_chat_message', source=MAIN_SOURCE)
+    sheets, gemini, _, _ = build_clients(args.issues, args.tasks,
+                                         args.sheets_latency, args.model_latency)
+    sys.modules['main'].set_clients(sheets=sheets, gemini=gemini)
+
+    target = HttpServerTarget(app) if args.server else InProcessTarget(app)
+
+    print("=" * 60)
+    print("myPMO Agent - Load Test")
+    print("=" * 60)
+    print(f"mix={args.mix} requests/level={args.requests} "
+          f"sheets_latency={args.sheets_latency}s model_latency={args.model_latency}s")
+
+    results = []
+    try:
+        for i, concurrency in enumerate(levels):
+            result = run_level(target, concurrency, args.requests, weights, args.seed + i)
+            print_level(result)
+            results.append(result)
+    finally:
+        if args.server:
+            target.close()
+
+    knee = find_knee(results)
+    print("\n" + "=" * 60)
+    if knee:
+        print(f"p95 latency more than doubled at concurrency={knee}")
+    else:
+        print("p95 latency stayed within 2x of the baseline at all levels")
+
+    model_stats = gemini.get_model_stats()
+    for name, stats in model_stats.items():
+        print(f"model {name}: calls={stats['calls']} errors={stats['errors']} "
+              f"p95={stats['p95_ms']}ms cost=${stats['cost_usd']:.4f}")
+
+    if args.output:
+        report = {
+            'commit': git_commit(),
+            'config': vars(args),
+            'knee_concurrency': knee,
+            'levels': results,
+            'models': model_stats
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[OK] Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
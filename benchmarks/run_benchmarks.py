@@ -0,0 +1,221 @@
+"""
+Offline Benchmark Suite for myPMO Agent
+Runs SheetsClient / GeminiClient / command paths against in-memory fakes
+and records throughput and latency percentiles as JSON
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --iterations 20
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from typing import Callable, Dict, Any, List
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.dirname(__file__))
+
+from brain.gemini_client import GeminiClient
+from tools.sheets_client import SheetsClient
+from fakes import FakeSheetsService, FakeGenerativeModel
+from datagen import generate_issues, generate_schedule
+from stats import summarize
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def build_clients(issue_count: int,
+                  task_count: int,
+                  sheets_latency_s: float = 0.0,
+                  model_latency_s: float = 0.0):
+    """
+    Create Sheets/Gemini clients backed by fakes with synthetic data
+
+    Returns:
+        Tuple of (SheetsClient, GeminiClient, FakeSheetsService, FakeGenerativeModel)
+    """
+    service = FakeSheetsService(
+        {'Issues': generate_issues(issue_count), 'Schedule': generate_schedule(task_count)},
+        latency_s=sheets_latency_s
+    )
+    model = FakeGenerativeModel(latency_s=model_latency_s)
+
+    # Benchmarks issue far more calls than the free-tier quota allows
+    GeminiClient.DAILY_LIMIT = 10 ** 9
+
+    sheets = SheetsClient(spreadsheet_id='bench', service=service)
+    gemini = GeminiClient(project_id='bench', model_name='fake-model', model=model)
+    return sheets, gemini, service, model
+
+
+def measure(func: Callable[[], Any], iterations: int, warmup: int = 1) -> Dict[str, float]:
+    """Run func repeatedly and summarize per-call latency"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+
+    return summarize(samples, elapsed)
+
+
+def benchmark_cases(sheets: SheetsClient, gemini: GeminiClient) -> Dict[str, Callable[[], Any]]:
+    """Named benchmark cases for one dataset"""
+    import main
+    main.set_clients(sheets=sheets, gemini=gemini)
+
+    issues = sheets.get_all_issues()
+    tasks = sheets.get_all_schedule_tasks()
+
+    return {
+        'sheets.get_all_issues': sheets.get_all_issues,
+        'sheets.get_all_schedule_tasks': sheets.get_all_schedule_tasks,
+        'sheets.filter.vendor': lambda: sheets.get_issues_by_filter(vendor='ベンダーA'),
+        'sheets.filter.priority_status': lambda: sheets.get_issues_by_filter(priority='緊急', status='対応中'),
+        'sheets.get_overdue_issues': sheets.get_overdue_issues,
+        'sheets.get_stalled_tasks': sheets.get_stalled_tasks,
+        'sheets.get_critical_path_tasks': sheets.get_critical_path_tasks,
+        'sheets.add_issue': lambda: sheets.add_issue(
+            category='技術課題', content='ベンチマーク用課題', vendor='ベンダーA',
+            assignee='鈴木', priority='高', deadline='2025-12-15'
+        ),
+        'gemini.build_context': lambda: gemini._build_context(issues, tasks),
+        'command.ask': lambda: main.route_command('/ask 期限が近い緊急課題は？'),
+        'command.risk_alert': lambda: main.route_command('/risk-alert'),
+        'command.update_issue': lambda: main.route_command(
+            '/update-issue 技術課題|API連携エラー|ベンダーA|鈴木|高|2025-12-15'
+        ),
+    }
+
+
+def git_commit() -> str:
+    """Current commit hash (or 'unknown' outside a git checkout)"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def run(sizes: List[int], iterations: int, sheets_latency_s: float,
+        model_latency_s: float, only: str = None) -> Dict[str, Any]:
+    """Run all benchmark cases for each dataset size"""
+    results = []
+
+    for size in sizes:
+        sheets, gemini, service, model = build_clients(
+            size, max(1, size // 10), sheets_latency_s, model_latency_s
+        )
+        cases = benchmark_cases(sheets, gemini)
+
+        for name, func in cases.items():
+            if only and only not in name:
+                continue
+
+            calls_before = dict(service.calls)
+            bytes_before = service.bytes_served
+            stats = measure(func, iterations)
+
+            api_calls = sum(service.calls.values()) - sum(calls_before.values())
+            stats.update({
+                'name': name,
+                'rows': size,
+                'api_calls_per_op': round(api_calls / (iterations + 1), 2),
+                'bytes_per_op': int((service.bytes_served - bytes_before) / (iterations + 1))
+            })
+            results.append(stats)
+            print(f"  {name:<34} rows={size:<7} p50={stats['p50_ms']:>9.2f}ms "
+                  f"p95={stats['p95_ms']:>9.2f}ms  {stats['ops_per_s']:>9.1f} ops/s")
+
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {
+            'sizes': sizes,
+            'iterations': iterations,
+            'sheets_latency_s': sheets_latency_s,
+            'model_latency_s': model_latency_s
+        },
+        'results': results
+    }
+
+
+def compare(base_path: str, new_path: str):
+    """Print p95 and throughput deltas between two result files"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    base_index = {(r['name'], r['rows']): r for r in base['results']}
+
+    print(f"Comparing {base['commit']} -> {new['commit']}")
+    print(f"{'benchmark':<34} {'rows':>7} {'p95 base':>10} {'p95 new':>10} {'Δp95':>8} {'Δops/s':>8}")
+
+    for r in new['results']:
+        b = base_index.get((r['name'], r['rows']))
+        if not b:
+            continue
+        d_p95 = (r['p95_ms'] - b['p95_ms']) / b['p95_ms'] * 100 if b['p95_ms'] else 0.0
+        d_ops = (r['ops_per_s'] - b['ops_per_s']) / b['ops_per_s'] * 100 if b['ops_per_s'] else 0.0
+        print(f"{r['name']:<34} {r['rows']:>7} {b['p95_ms']:>10.2f} {r['p95_ms']:>10.2f} "
+              f"{d_p95:>+7.1f}% {d_ops:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="myPMO Agent offline benchmarks")
+    parser.add_argument('--sizes', default='1000,10000,100000',
+                        help='Comma-separated Issue Log row counts (Schedule uses 1/10)')
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--sheets-latency', type=float, default=0.0,
+                        help='Injected latency per Sheets API call (seconds)')
+    parser.add_argument('--model-latency', type=float, default=0.0,
+                        help='Injected latency per generate_content call (seconds)')
+    parser.add_argument('--only', help='Run only benchmarks whose name contains this string')
+    parser.add_argument('--output', help='Result JSON path (default: benchmarks/results/<timestamp>_<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'),
+                        help='Compare two result files instead of running')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+
+    print("=" * 60)
+    print("myPMO Agent - Offline Benchmarks")
+    print("=" * 60)
+
+    report = run(sizes, args.iterations, args.sheets_latency, args.model_latency, args.only)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{report['commit']}.json")
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n[OK] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
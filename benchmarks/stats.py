@@ -0,0 +1,41 @@
+"""
+Latency statistics helpers shared by benchmarks and load tests
+"""
+
+import math
+from typing import Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples_ms: List[float], elapsed_s: float = None) -> Dict[str, float]:
+    """
+    Summarize latency samples
+
+    Args:
+        samples_ms: Per-operation latencies in milliseconds
+        elapsed_s: Wall-clock time for all operations (default: sum of samples)
+
+    Returns:
+        Dict with count, mean/p50/p95/p99/max (ms) and ops_per_s
+    """
+    count = len(samples_ms)
+    if elapsed_s is None:
+        elapsed_s = sum(samples_ms) / 1000
+
+    return {
+        'count': count,
+        'mean_ms': round(sum(samples_ms) / count, 3) if count else 0.0,
+        'p50_ms': round(percentile(samples_ms, 50), 3),
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'max_ms': round(max(samples_ms), 3) if count else 0.0,
+        'ops_per_s': round(count / elapsed_s, 2) if elapsed_s > 0 else 0.0
+    }
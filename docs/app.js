@@ -121,8 +121,75 @@ async function sendRequest(payload) {
     }
 }
 
+// Read-only data API: revalidate with the ETag so unchanged data costs a 304
+const SUMMARY_REFRESH_MS = 60 * 1000;
+const dataCache = {};
+
+// The data API requires DATA_API_TOKEN; it is asked once and kept in this browser only
+const TOKEN_KEY = 'pmoDataApiToken';
+
+function dataApiToken() {
+    let token = localStorage.getItem(TOKEN_KEY);
+    if (!token) {
+        token = (window.prompt('データAPIのトークン（DATA_API_TOKEN）を入力してください') || '').trim();
+        if (token) {
+            localStorage.setItem(TOKEN_KEY, token);
+        }
+    }
+    return token;
+}
+
+async function fetchData(resource, params = '') {
+    const url = `${API_URL}/api/${resource}${params}`;
+    const cached = dataCache[url];
+    const headers = { 'Authorization': `Bearer ${dataApiToken()}` };
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+
+    const response = await fetch(url, { headers });
+
+    if (response.status === 304) {
+        return cached.data;
+    }
+    if (response.status === 401) {
+        // Wrong or rotated token: ask again on the next refresh
+        localStorage.removeItem(TOKEN_KEY);
+    }
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const data = await response.json();
+    dataCache[url] = { etag: response.headers.get('ETag'), data };
+    return data;
+}
+
+// Project Summary
+async function refreshSummary() {
+    const summarySection = document.getElementById('summary-section');
+    const summaryContent = document.getElementById('summary-content');
+
+    try {
+        const data = await fetchData('rollups');
+        const { issues, schedule, risks } = data;
+
+        summaryContent.textContent =
+            `課題: ${issues.total}件（期限超過 ${risks.overdue}件 / 7日以内期限 ${risks.due_soon}件）\n` +
+            `タスク: ${schedule.total}件（停滞 ${risks.stalled}件 / 終了予定超過 ${risks.slipped}件 / クリティカルパス ${schedule.critical_path}件）\n` +
+            `更新: ${new Date(data.taken_at).toLocaleString('ja-JP')}`;
+        summarySection.classList.remove('hidden');
+    } catch (error) {
+        // The summary is optional; the command forms keep working without it
+        console.warn('Summary unavailable:', error.message);
+    }
+}
+
 // Initialize: Set today's date for deadline field
 document.addEventListener('DOMContentLoaded', () => {
     const today = new Date().toISOString().split('T')[0];
     document.getElementById('deadline').value = today;
+
+    refreshSummary();
+    setInterval(refreshSummary, SUMMARY_REFRESH_MS);
 });
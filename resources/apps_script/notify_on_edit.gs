@@ -0,0 +1,23 @@
+/**
+ * myPMO Agent - sheet-change notification (installable onEdit trigger)
+ *
+ * Setup: Extensions > Apps Script, paste this file, set the script properties
+ * PMO_NOTIFY_URL (<Function URL>/notify) and PMO_NOTIFY_TOKEN (= NOTIFY_TOKEN),
+ * then add an "On edit" trigger for notifyPmoAgent.
+ */
+function notifyPmoAgent(e) {
+  const props = PropertiesService.getScriptProperties();
+  const range = e.range;
+
+  UrlFetchApp.fetch(props.getProperty('PMO_NOTIFY_URL'), {
+    method: 'post',
+    contentType: 'application/json',
+    headers: { 'X-PMO-Notify-Token': props.getProperty('PMO_NOTIFY_TOKEN') },
+    payload: JSON.stringify({
+      spreadsheet_id: e.source.getId(),
+      sheet: range.getSheet().getName(),
+      row: range.getRow()
+    }),
+    muteHttpExceptions: true
+  });
+}
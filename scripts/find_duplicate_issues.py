@@ -0,0 +1,73 @@
+"""
+Find likely duplicate issues before a bulk import (or within the Issue Log)
+
+Usage:
+    python scripts/find_duplicate_issues.py new_issues.csv   # CSV with a 内容 column
+    python scripts/find_duplicate_issues.py                  # pairs inside the Issue Log
+"""
+
+import os
+import sys
+import csv
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from dotenv import load_dotenv
+
+from tools.sheets_client import SheetsClient
+from tools.dedup_index import duplicate_checker_for
+from tools.snapshot import snapshot_cache_for
+
+
+def check_csv(checker, csv_path: str):
+    """Report rows of a CSV that resemble existing issues or earlier rows"""
+    with open(csv_path, encoding='utf-8-sig', newline='') as f:
+        contents = [row.get('内容', '') for row in csv.DictReader(f)]
+
+    results = checker.check_many(contents)
+    flagged = 0
+    for line, (content, matches) in enumerate(zip(contents, results), 2):
+        if matches:
+            flagged += 1
+            similar = ", ".join(f"{key}({score:.0%})" for key, score in matches)
+            print(f"{csv_path}:{line} {content} -> {similar}")
+
+    print(f"\n{flagged}/{len(contents)} row(s) look like duplicates")
+
+
+def check_issue_log(checker):
+    """Report pairs of existing issues that look like duplicates"""
+    checker.refresh()
+    index = checker.index
+    pairs = set()
+    for issue in snapshot_cache_for(checker.sheets_client).get().issues:
+        for key, score in index.query(issue.get('内容', '')):
+            if key != str(issue.get('ID')):
+                pairs.add((min(key, str(issue['ID'])), max(key, str(issue['ID'])), score))
+
+    for a, b, score in sorted(pairs, key=lambda p: -p[2]):
+        print(f"#{a} ~ #{b} ({score:.0%})")
+    print(f"\n{len(pairs)} likely duplicate pair(s) among {len(index)} issue(s)")
+
+
+def main():
+    load_dotenv()
+
+    key_path = os.getenv('SERVICE_ACCOUNT_KEY_PATH')
+    client = SheetsClient(
+        service_account_key_path=key_path if key_path and os.path.exists(key_path) else None,
+        spreadsheet_id=os.getenv('SPREADSHEET_ID'),
+        issue_sheet_name=os.getenv('ISSUE_SHEET_NAME', 'Issues'),
+        schedule_sheet_name=os.getenv('SCHEDULE_SHEET_NAME', 'Schedule')
+    )
+    checker = duplicate_checker_for(client)
+    print(f"Similarity threshold: {checker.index.threshold:.0%} "
+          f"({'persisted at ' + checker.index.path if checker.index.path else 'not persisted'})\n")
+
+    if len(sys.argv) > 1:
+        check_csv(checker, sys.argv[1])
+    else:
+        check_issue_log(checker)
+
+
+if __name__ == "__main__":
+    main()
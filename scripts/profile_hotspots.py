@@ -0,0 +1,65 @@
+"""
+Aggregate captured request profiles and list the top hot spots
+
+Usage:
+    python scripts/profile_hotspots.py                       # all profiles in PROFILE_DIR
+    python scripts/profile_hotspots.py profiles/ --label ask --top 30
+    python scripts/profile_hotspots.py profiles/ --min-ms 5000 --sort cumtime
+
+Profiles stored to GCS can be fetched first with
+`gsutil -m cp "gs://bucket/path/*.prof.gz" profiles/`.
+"""
+
+import os
+import sys
+import argparse
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from tools.profiling import PROFILE_DIR, PROFILE_SUFFIX, hot_spots, parse_name
+
+
+def collect_paths(targets, label=None, min_ms=0):
+    """Profile files under the given files/directories, filtered by label and duration"""
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            names = sorted(n for n in os.listdir(target) if n.endswith(PROFILE_SUFFIX))
+            candidates = [os.path.join(target, n) for n in names]
+        else:
+            candidates = [target]
+        for path in candidates:
+            meta = parse_name(path)
+            if meta is None:
+                continue
+            if label and meta['label'] != label:
+                continue
+            if meta['ms'] < min_ms:
+                continue
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate request profiles")
+    parser.add_argument('targets', nargs='*', default=[PROFILE_DIR], help="profile files or directories")
+    parser.add_argument('--label', help="only this label (e.g. ask, deferred-ask, tasks)")
+    parser.add_argument('--min-ms', type=int, default=0, help="only requests at least this slow")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', choices=['tottime', 'cumtime'], default='tottime')
+    args = parser.parse_args()
+
+    paths = collect_paths(args.targets, args.label, args.min_ms)
+    count, rows = hot_spots(paths, args.top, args.sort)
+    if not count:
+        print("No profiles found")
+        return
+
+    durations = sorted(parse_name(p)['ms'] for p in paths)
+    print(f"{count} profile(s), median {durations[len(durations) // 2]}ms, max {durations[-1]}ms\n")
+    print(f"{'calls':>9} {'tottime':>9} {'cumtime':>9}  function")
+    for func, calls, tottime, cumtime in rows:
+        print(f"{calls:>9} {tottime:>9.3f} {cumtime:>9.3f}  {func}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,304 +1,357 @@
 """
 Spreadsheet Structure Setup Script
-Automatically adds required columns to Issue and Schedule sheets
+Declarative schema migration: diffs the columns defined in
+resources/knowledge/sheet_structure_proposal.md against the current headers
+and applies every change in a single batchUpdate per spreadsheet
+
+Usage:
+    python scripts/setup_sheets_structure.py --dry-run
+    python scripts/setup_sheets_structure.py --spreadsheet <ID> --spreadsheet <ID> --yes
 """
 
 import os
+import re
 import sys
+import argparse
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
 from dotenv import load_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+
+from tools.credentials import get_credentials
+from tools.sheet_schema import column_letter
+from tools.transport import build_service
+
+
+PROPOSAL_PATH = os.path.join(
+    os.path.dirname(__file__), '../resources/knowledge/sheet_structure_proposal.md'
+)
+
+# Proposal section heading keyword -> schema key
+SECTION_KEYS = {'Issue Log': 'issue', 'Schedule': 'schedule'}
+
+
+def load_desired_schema(proposal_path: str = PROPOSAL_PATH):
+    """
+    Parse the desired sheet schema from the structure proposal
+
+    Args:
+        proposal_path: Path to sheet_structure_proposal.md
+
+    Returns:
+        Dict of schema key ('issue'/'schedule') to
+        {'columns': [...], 'dropdowns': {column: [values]}, 'checkboxes': [columns]}
+    """
+    with open(proposal_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    schema = {}
+    # Split on level-2 headings; each section holds one sheet definition
+    for section in re.split(r'^## ', text, flags=re.MULTILINE)[1:]:
+        heading = section.splitlines()[0]
+        key = next((v for k, v in SECTION_KEYS.items() if k in heading), None)
+        if key is None:
+            continue
+
+        block = re.search(r'```\n(.+?)\n```', section, flags=re.DOTALL)
+        if not block:
+            continue
+
+        columns = [c.strip() for c in block.group(1).split('|') if c.strip()]
+        dropdowns, checkboxes = {}, []
+
+        for line in section.splitlines():
+            cells = [c.strip() for c in line.strip().strip('|').split('|')]
+            if len(cells) < 3:
+                continue
+
+            column = cells[0].strip('*')
+            if column not in columns:
+                continue
+
+            if cells[1] == 'プルダウン':
+                dropdowns[column] = re.findall(r'`([^`]+)`', cells[2])
+            elif cells[1] == 'チェックボックス':
+                checkboxes.append(column)
+
+        schema[key] = {'columns': columns, 'dropdowns': dropdowns, 'checkboxes': checkboxes}
+
+    return schema
+
+
+def plan_columns(current_headers, desired_columns):
+    """
+    Compute column insertions that bring the header row to the desired schema
+
+    Missing columns are inserted right after the nearest preceding desired
+    column that already exists, so existing data moves with its header and
+    unknown extra columns are left where they are.
+
+    Args:
+        current_headers: Current header row
+        desired_columns: Desired columns in order
+
+    Returns:
+        Tuple of (inserts as [(index, column)] in apply order, resulting headers)
+    """
+    headers = list(current_headers)
+    inserts = []
+    anchor = -1
+
+    for column in desired_columns:
+        if column in headers:
+            anchor = headers.index(column)
+            continue
+
+        anchor += 1
+        headers.insert(anchor, column)
+        if current_headers:
+            inserts.append((anchor, column))
+
+    return inserts, headers
 
 
 class SheetStructureSetup:
-    """Automate spreadsheet structure improvements"""
-    
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
-    
-    def __init__(self, service_account_key_path, spreadsheet_id):
+    """Plan and apply spreadsheet schema migrations"""
+
+    def __init__(self, service_account_key_path, spreadsheet_id, service=None):
         self.spreadsheet_id = spreadsheet_id
-        
-        # Authenticate
-        credentials = service_account.Credentials.from_service_account_file(
-            service_account_key_path, scopes=self.SCOPES
-        )
-        self.service = build('sheets', 'v4', credentials=credentials)
-    
-    def setup_issue_sheet(self, sheet_name="Issues"):
-        """Add required columns to Issue sheet"""
-        print(f"\n[1/2] Setting up {sheet_name} sheet...")
-        
-        try:
-            # Get current sheet structure
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!1:1"
-            ).execute()
-            
-            current_headers = result.get('values', [[]])[0]
-            print(f"  Current columns: {current_headers}")
-            
-            # Define required columns
-            required_columns = ['ベンダー名', '優先度', '期限', '影響範囲', '更新日']
-            
-            # Check which columns are missing
-            missing_columns = [col for col in required_columns if col not in current_headers]
-            
-            if not missing_columns:
-                print("  [OK] All required columns already exist!")
-                return True
-            
-            print(f"  Adding columns: {missing_columns}")
-            
-            # Append missing columns to header row
-            new_headers = current_headers + missing_columns
-            
-            # Update header row
-            self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!1:1",
-                valueInputOption='RAW',
-                body={'values': [new_headers]}
-            ).execute()
-            
-            # Add data validation for dropdown columns
-            self._add_dropdown_validation(
-                sheet_name,
-                column_name='優先度',
-                values=['緊急', '高', '中', '低'],
-                current_headers=new_headers
-            )
-            
-            self._add_dropdown_validation(
-                sheet_name,
-                column_name='影響範囲',
-                values=['全体', '特定ベンダー', '限定的'],
-                current_headers=new_headers
-            )
-            
-            print(f"  [OK] {sheet_name} sheet setup complete!")
-            return True
-        
-        except Exception as e:
-            print(f"  [ERROR] {e}")
-            return False
-    
-    def setup_schedule_sheet(self, sheet_name="Schedule"):
-        """Add required columns to Schedule sheet"""
-        print(f"\n[2/2] Setting up {sheet_name} sheet...")
-        
-        try:
-            # Get current sheet structure
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!1:1"
-            ).execute()
-            
-            current_headers = result.get('values', [[]])[0]
-            print(f"  Current columns: {current_headers}")
-            
-            # Define required columns
-            required_new_columns = {
-                'ベンダー名': None,
-                '担当者': None,
-                'ステータス': None
-            }
-            
-            # Check if ID column exists at the beginning
-            if current_headers and current_headers[0] != 'ID':
-                print("  Adding 'ID' column at the beginning...")
-                self._insert_column_at_position(sheet_name, 0, 'ID')
-                current_headers.insert(0, 'ID')
-            
-            # Add other missing columns at the end
-            missing_columns = [col for col in required_new_columns if col not in current_headers]
-            
-            if not missing_columns:
-                print("  [OK] All required columns already exist!")
-                return True
-            
-            print(f"  Adding columns: {missing_columns}")
-            
-            # Append missing columns
-            new_headers = current_headers + missing_columns
-            
-            # Update header row
-            self.service.spreadsheets().values().update(
-                spreadsheetId=self.spreadsheet_id,
-                range=f"{sheet_name}!1:1",
-                valueInputOption='RAW',
-                body={'values': [new_headers]}
-            ).execute()
-            
-            # Add data validation for status
-            self._add_dropdown_validation(
-                sheet_name,
-                column_name='ステータス',
-                values=['未着手', '進行中', '停滞', '完了', '保留'],
-                current_headers=new_headers
-            )
-            
-            print(f"  [OK] {sheet_name} sheet setup complete!")
-            return True
-        
-        except Exception as e:
-            print(f"  [ERROR] {e}")
-            return False
-    
-    def _insert_column_at_position(self, sheet_name, position, column_name):
-        """Insert a column at a specific position"""
-        # Get sheet ID
-        sheet_metadata = self.service.spreadsheets().get(
-            spreadsheetId=self.spreadsheet_id
+
+        if service is not None:
+            self.service = service
+            return
+
+        # Shared credentials provider (same scopes and refresh as the function)
+        self.service = build_service('sheets', 'v4', get_credentials(service_account_key_path))
+
+    def fetch_state(self, sheet_names):
+        """
+        Read sheet IDs, grid sizes, header rows and row-2 validations in one call
+
+        Returns:
+            Dict of sheet name to {'sheet_id', 'row_count', 'column_count',
+            'headers', 'validations': {column_index: rule}}
+        """
+        ranges = [f"'{name}'!1:2" for name in sheet_names]
+        metadata = self.service.spreadsheets().get(
+            spreadsheetId=self.spreadsheet_id,
+            ranges=ranges,
+            includeGridData=True,
+            fields='sheets(properties(sheetId,title,gridProperties(rowCount,columnCount)),'
+                   'data(rowData(values(formattedValue,dataValidation))))'
         ).execute()
-        
-        sheet_id = None
-        for sheet in sheet_metadata['sheets']:
-            if sheet['properties']['title'] == sheet_name:
-                sheet_id = sheet['properties']['sheetId']
-                break
-        
-        if sheet_id is None:
-            raise ValueError(f"Sheet '{sheet_name}' not found")
-        
-        # Insert column
-        requests = [{
-            'insertDimension': {
-                'range': {
-                    'sheetId': sheet_id,
-                    'dimension': 'COLUMNS',
-                    'startIndex': position,
-                    'endIndex': position + 1
-                }
+
+        state = {}
+        for sheet in metadata.get('sheets', []):
+            props = sheet['properties']
+            rows = []
+            for data in sheet.get('data', []):
+                rows.extend(data.get('rowData', []))
+
+            header_cells = rows[0].get('values', []) if rows else []
+            headers = [c.get('formattedValue', '') for c in header_cells]
+            while headers and not headers[-1]:
+                headers.pop()
+
+            second_row = rows[1].get('values', []) if len(rows) > 1 else []
+            validations = {
+                i: c['dataValidation'] for i, c in enumerate(second_row) if 'dataValidation' in c
+            }
+
+            state[props['title']] = {
+                'sheet_id': props['sheetId'],
+                'row_count': props.get('gridProperties', {}).get('rowCount', 1000),
+                'column_count': props.get('gridProperties', {}).get('columnCount', 26),
+                'headers': headers,
+                'validations': validations
             }
-        }]
-        
+
+        return state
+
+    def plan(self, sheet_schemas, state=None):
+        """
+        Diff desired schemas against the current sheets
+
+        Args:
+            sheet_schemas: Dict of sheet name to desired schema (see load_desired_schema)
+            state: Pre-fetched state (optional, fetched if None)
+
+        Returns:
+            Dict with 'requests' (batchUpdate requests) and 'changes' (human readable)
+        """
+        state = state if state is not None else self.fetch_state(list(sheet_schemas))
+        requests, changes = [], []
+
+        for sheet_name, schema in sheet_schemas.items():
+            if sheet_name not in state:
+                changes.append(f"[{sheet_name}] sheet not found, skipped")
+                continue
+
+            sheet = state[sheet_name]
+            sheet_id = sheet['sheet_id']
+            current = sheet['headers']
+            inserts, headers = plan_columns(current, schema['columns'])
+
+            for index, column in inserts:
+                requests.append({
+                    'insertDimension': {
+                        'range': {'sheetId': sheet_id, 'dimension': 'COLUMNS',
+                                  'startIndex': index, 'endIndex': index + 1},
+                        'inheritFromBefore': False
+                    }
+                })
+                changes.append(f"[{sheet_name}] insert column '{column}' at {column_letter(index)}")
+
+            # Blank sheets may have fewer grid columns than the schema needs
+            missing_grid = len(headers) - (sheet['column_count'] + len(inserts))
+            if missing_grid > 0:
+                requests.append({
+                    'appendDimension': {'sheetId': sheet_id, 'dimension': 'COLUMNS',
+                                        'length': missing_grid}
+                })
+
+            if headers != current:
+                requests.append({
+                    'updateCells': {
+                        'start': {'sheetId': sheet_id, 'rowIndex': 0, 'columnIndex': 0},
+                        'rows': [{'values': [{'userEnteredValue': {'stringValue': h}} for h in headers]}],
+                        'fields': 'userEnteredValue'
+                    }
+                })
+                if not current:
+                    changes.append(f"[{sheet_name}] write header row: {headers}")
+
+            # Validations live on data cells, so track where existing columns moved
+            shifted = {}
+            for old_index, rule in sheet['validations'].items():
+                if old_index < len(current):
+                    shifted[headers.index(current[old_index])] = rule
+
+            rules = {column: {'type': 'ONE_OF_LIST',
+                              'values': [{'userEnteredValue': v} for v in values]}
+                     for column, values in schema.get('dropdowns', {}).items()}
+            rules.update({column: {'type': 'BOOLEAN'} for column in schema.get('checkboxes', [])})
+
+            for column, condition in rules.items():
+                index = headers.index(column)
+                if shifted.get(index, {}).get('condition') == condition:
+                    continue
+
+                requests.append({
+                    'setDataValidation': {
+                        'range': {'sheetId': sheet_id,
+                                  'startRowIndex': 1, 'endRowIndex': max(sheet['row_count'], 2),
+                                  'startColumnIndex': index, 'endColumnIndex': index + 1},
+                        'rule': {'condition': condition,
+                                 'showCustomUi': True,
+                                 'strict': False}
+                    }
+                })
+                changes.append(f"[{sheet_name}] set {condition['type']} validation on '{column}'")
+
+        return {'requests': requests, 'changes': changes}
+
+    def apply(self, plan):
+        """
+        Apply a migration plan in a single batchUpdate
+
+        Returns:
+            Number of requests applied (0 when already up to date)
+        """
+        if not plan['requests']:
+            return 0
+
         self.service.spreadsheets().batchUpdate(
             spreadsheetId=self.spreadsheet_id,
-            body={'requests': requests}
+            body={'requests': plan['requests']}
         ).execute()
-        
-        # Add column header
-        col_letter = chr(65 + position)  # A=65
-        self.service.spreadsheets().values().update(
-            spreadsheetId=self.spreadsheet_id,
-            range=f"{sheet_name}!{col_letter}1",
-            valueInputOption='RAW',
-            body={'values': [[column_name]]}
-        ).execute()
-    
-    def _add_dropdown_validation(self, sheet_name, column_name, values, current_headers):
-        """Add dropdown validation to a column"""
-        try:
-            # Get sheet ID
-            sheet_metadata = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
-            
-            sheet_id = None
-            for sheet in sheet_metadata['sheets']:
-                if sheet['properties']['title'] == sheet_name:
-                    sheet_id = sheet['properties']['sheetId']
-                    break
-            
-            if sheet_id is None:
-                return
-            
-            # Find column index
-            if column_name not in current_headers:
-                return
-            
-            column_index = current_headers.index(column_name)
-            
-            # Create validation rule
-            requests = [{
-                'setDataValidation': {
-                    'range': {
-                        'sheetId': sheet_id,
-                        'startRowIndex': 1,
-                        'endRowIndex': 1000,
-                        'startColumnIndex': column_index,
-                        'endColumnIndex': column_index + 1
-                    },
-                    'rule': {
-                        'condition': {
-                            'type': 'ONE_OF_LIST',
-                            'values': [{'userEnteredValue': v} for v in values]
-                        },
-                        'showCustomUi': True,
-                        'strict': False
-                    }
-                }
-            }]
-            
-            self.service.spreadsheets().batchUpdate(
-                spreadsheetId=self.spreadsheet_id,
-                body={'requests': requests}
-            ).execute()
-            
-            print(f"    [OK] Added dropdown for '{column_name}'")
-        
-        except Exception as e:
-            print(f"    [WARNING] Could not add dropdown for '{column_name}': {e}")
+
+        return len(plan['requests'])
+
+    def migrate(self, sheet_schemas, dry_run=False):
+        """Plan, print and (unless dry_run) apply the migration"""
+        plan = self.plan(sheet_schemas)
+
+        if not plan['changes'] and not plan['requests']:
+            print("  [OK] Already up to date")
+            return plan
+
+        for change in plan['changes']:
+            print(f"  - {change}")
+
+        if dry_run:
+            print(f"  [DRY-RUN] {len(plan['requests'])} request(s) not applied")
+        else:
+            applied = self.apply(plan)
+            print(f"  [OK] Applied {applied} request(s) in one batchUpdate")
+
+        return plan
 
 
 def main():
     """Main setup script"""
     load_dotenv()
-    
+
+    parser = argparse.ArgumentParser(description="Migrate spreadsheets to the PMO sheet schema")
+    parser.add_argument('--spreadsheet', action='append',
+                        help='Spreadsheet ID (repeatable, default: SPREADSHEET_ID)')
+    parser.add_argument('--dry-run', action='store_true', help='Print the plan without applying it')
+    parser.add_argument('--yes', action='store_true', help='Do not wait for ENTER before applying')
+    args = parser.parse_args()
+
     print("=" * 60)
     print("myPMO Agent - Spreadsheet Structure Setup")
     print("=" * 60)
-    
+
     service_account_key = os.getenv('SERVICE_ACCOUNT_KEY_PATH')
-    spreadsheet_id = os.getenv('SPREADSHEET_ID')
+    spreadsheet_ids = args.spreadsheet or [os.getenv('SPREADSHEET_ID')]
     issue_sheet_name = os.getenv('ISSUE_SHEET_NAME', 'Issues')
     schedule_sheet_name = os.getenv('SCHEDULE_SHEET_NAME', 'Schedule')
-    
-    if not service_account_key or not spreadsheet_id:
+
+    if not service_account_key or not all(spreadsheet_ids):
         print("\n[ERROR] Missing environment variables")
         print("  Please configure .env file with:")
         print("  - SERVICE_ACCOUNT_KEY_PATH")
         print("  - SPREADSHEET_ID")
         return False
-    
+
+    desired = load_desired_schema()
+    sheet_schemas = {
+        issue_sheet_name: desired['issue'],
+        schedule_sheet_name: desired['schedule']
+    }
+
     print(f"\nUsing service account: {service_account_key}")
-    print(f"Target spreadsheet: {spreadsheet_id}")
+    print(f"Target spreadsheets: {', '.join(spreadsheet_ids)}")
     print(f"Issue sheet: {issue_sheet_name}")
     print(f"Schedule sheet: {schedule_sheet_name}")
-    print("\n[IMPORTANT] Ensure the service account has EDITOR access!")
-    print("   Email: pmo-agent-sa@my-pmo-agent-v1.iam.gserviceaccount.com")
-    
-    input("\nPress ENTER to continue...")
-    
-    try:
-        setup = SheetStructureSetup(service_account_key, spreadsheet_id)
-        
-        # Setup Issue sheet
-        issue_success = setup.setup_issue_sheet(issue_sheet_name)
-        
-        # Setup Schedule sheet
-        schedule_success = setup.setup_schedule_sheet(schedule_sheet_name)
-        
-        print("\n" + "=" * 60)
-        if issue_success and schedule_success:
-            print("[SUCCESS] Spreadsheet structure setup complete!")
+
+    if not args.dry_run and not args.yes:
+        print("\n[IMPORTANT] Ensure the service account has EDITOR access!")
+        print("   Email: pmo-agent-sa@my-pmo-agent-v1.iam.gserviceaccount.com")
+        input("\nPress ENTER to continue...")
+
+    failed = []
+    for spreadsheet_id in spreadsheet_ids:
+        print(f"\n[{spreadsheet_id}]")
+        try:
+            setup = SheetStructureSetup(service_account_key, spreadsheet_id)
+            setup.migrate(sheet_schemas, dry_run=args.dry_run)
+        except Exception as e:
+            print(f"  [ERROR] {e}")
+            failed.append(spreadsheet_id)
+
+    print("\n" + "=" * 60)
+    if not failed:
+        print("[SUCCESS] Spreadsheet structure setup complete!")
+        if not args.dry_run:
             print("\nNext steps:")
             print("1. Verify changes in your spreadsheet")
             print("2. Run tests: python tests/test_sheets_client.py")
-            return True
-        else:
-            print("[WARNING] Setup completed with some errors")
-            print("   Please check the output above")
-            return False
-    
-    except Exception as e:
-        print(f"\n[ERROR] Setup failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+        return True
+
+    print(f"[WARNING] Setup failed for: {', '.join(failed)}")
+    print("   Please check the output above")
+    return False
 
 
 if __name__ == "__main__":
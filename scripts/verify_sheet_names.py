@@ -7,8 +7,9 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
 
 from dotenv import load_dotenv
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+
+from tools.credentials import get_credentials
+from tools.transport import build_service
 
 
 def list_sheet_names():
@@ -18,12 +19,7 @@ def list_sheet_names():
     service_account_key = os.getenv('SERVICE_ACCOUNT_KEY_PATH')
     spreadsheet_id = os.getenv('SPREADSHEET_ID')
     
-    SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
-    
-    credentials = service_account.Credentials.from_service_account_file(
-        service_account_key, scopes=SCOPES
-    )
-    service = build('sheets', 'v4', credentials=credentials)
+    service = build_service('sheets', 'v4', get_credentials(service_account_key))
     
     print("=" * 60)
     print("Spreadsheet Sheet Names")
@@ -0,0 +1,59 @@
+"""
+Local stand-in for the Apps Script / Drive change notifications
+
+Polls the spreadsheet and POSTs to the agent's /notify endpoint whenever the
+data changes, e.g. against a function started with functions-framework.
+
+Usage:
+    python scripts/watch_sheet_changes.py http://localhost:8080/notify [interval_seconds]
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+import requests
+from dotenv import load_dotenv
+
+from tools.sheets_client import SheetsClient
+from tools.snapshot import SnapshotCache
+
+
+def watch(notify_url: str, interval: float = 10.0):
+    """Poll until interrupted, notifying on every new snapshot version"""
+    load_dotenv()
+
+    key_path = os.getenv('SERVICE_ACCOUNT_KEY_PATH')
+    client = SheetsClient(
+        service_account_key_path=key_path if key_path and os.path.exists(key_path) else None,
+        spreadsheet_id=os.getenv('SPREADSHEET_ID'),
+        issue_sheet_name=os.getenv('ISSUE_SHEET_NAME', 'Issues'),
+        schedule_sheet_name=os.getenv('SCHEDULE_SHEET_NAME', 'Schedule')
+    )
+    cache = SnapshotCache(client, ttl=0)
+    headers = {'X-PMO-Notify-Token': os.getenv('NOTIFY_TOKEN', '')}
+
+    version = cache.get().version
+    print(f"Watching {client.spreadsheet_id} every {interval:.0f}s (version {version[:8]})")
+
+    while True:
+        time.sleep(interval)
+        current = cache.get().version
+        if current == version:
+            continue
+
+        version = current
+        response = requests.post(notify_url, json={'spreadsheet_id': client.spreadsheet_id},
+                                 headers=headers, timeout=60)
+        print(f"Changed (version {version[:8]}) -> {response.status_code} {response.text.strip()}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    try:
+        watch(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else 10.0)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,490 @@
+"""
+Nightly Batch Prediction for myPMO Agent
+Per-vendor analyses built from one snapshot and sent as a single Vertex AI
+batch prediction job (JSONL in/out); results are stored for chat commands in a
+store every instance reads (Firestore)
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from brain.gemini_client import AnswerParseError, SINGLE_FORMAT
+from brain.model_router import classify_query
+from tools import tracing
+
+
+BATCH_BACKEND = os.getenv('BATCH_BACKEND', 'vertex')
+BATCH_DIR = os.getenv('BATCH_DIR', os.path.join(tempfile.gettempdir(), 'pmo_batch_jobs'))
+BATCH_GCS_PREFIX = os.getenv('BATCH_GCS_PREFIX', '')
+BATCH_RESULTS_BACKEND = os.getenv('BATCH_RESULTS_BACKEND', 'firestore')
+BATCH_RESULTS_COLLECTION = os.getenv('BATCH_RESULTS_COLLECTION', 'pmo_batch_runs')
+BATCH_RESULTS_DB = os.getenv('BATCH_RESULTS_DB', 'pmo_batch_results.db')
+
+VENDOR_QUERY = ("ベンダー「{vendor}」の課題とタスクを分析し、遅延・品質リスクと"
+                "PMが次に取るべき打ち手をまとめてください")
+# Tier of the vendor analyses, picked once so both backends answer with the same model
+VENDOR_TIER = classify_query(VENDOR_QUERY)
+
+
+def request_key(prompt: str) -> str:
+    """
+    Identify a request by its prompt
+
+    Batch output lines echo their request but not their input position, so
+    results are matched back to vendors through this key.
+    """
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+
+
+def vendor_prompts(issues: List[Dict[str, Any]], tasks: List[Dict[str, Any]],
+                   gemini_client) -> Dict[str, str]:
+    """
+    Build one analysis prompt per vendor
+
+    Args:
+        issues, tasks: Records of one snapshot
+        gemini_client: GeminiClient (persona and context formatting are shared with /ask)
+
+    Returns:
+        Dict of vendor name to prompt, in vendor order
+    """
+    persona = gemini_client._load_pmo_persona()
+    vendors = sorted({r.get('ベンダー名') for r in issues + tasks if r.get('ベンダー名')})
+
+    prompts = {}
+    for vendor in vendors:
+        context = gemini_client._build_context(
+            [i for i in issues if i.get('ベンダー名') == vendor],
+            [t for t in tasks if t.get('ベンダー名') == vendor]
+        )
+        query = f"# User Query\n\n{VENDOR_QUERY.format(vendor=vendor)}"
+        prompts[vendor] = gemini_client._build_prompt(persona, "", context, query, SINGLE_FORMAT)
+    return prompts
+
+
+def to_request_line(prompt: str) -> Dict[str, Any]:
+    """Batch input line in the Vertex AI Gemini request format"""
+    return {"request": {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}}
+
+
+def parse_output_line(line: Dict[str, Any]) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Split a batch output line
+
+    Returns:
+        (request key, response text or None, error message or None)
+    """
+    parts = line.get("request", {}).get("contents", [{}])[0].get("parts", [{}])
+    key = request_key(parts[0].get("text", ""))
+
+    if line.get("status"):
+        return key, None, str(line["status"])
+
+    candidates = line.get("response", {}).get("candidates") or []
+    if not candidates:
+        return key, None, "empty response"
+    text = "".join(p.get("text", "") for p in candidates[0].get("content", {}).get("parts", []))
+    return key, text, None
+
+
+class LocalBatchBackend:
+    """
+    File-based stand-in for Vertex AI batch prediction (development)
+
+    Writes the input JSONL, answers every line through the GeminiClient (so
+    the daily limit, circuit breaker and model router apply) and writes
+    Vertex-shaped output JSONL, all during submit (jobs finish immediately).
+    """
+
+    def __init__(self, gemini_client, directory: str = BATCH_DIR, tier: str = VENDOR_TIER):
+        """
+        Args:
+            gemini_client: GeminiClient answering each line
+            directory: Where input/output JSONL files are written
+            tier: Model tier of the vendor analyses
+        """
+        self.gemini_client = gemini_client
+        self.directory = directory
+        self.tier = tier
+
+    def submit(self, run_id: str, lines: List[Dict[str, Any]]) -> str:
+        run_dir = os.path.join(self.directory, run_id)
+        os.makedirs(run_dir, exist_ok=True)
+        _write_jsonl(os.path.join(run_dir, "input.jsonl"), lines)
+
+        outputs = []
+        for line in lines:
+            prompt = line["request"]["contents"][0]["parts"][0]["text"]
+            try:
+                text = self.gemini_client.generate_text(prompt, self.tier)
+                outputs.append({**line, "status": "", "response": {
+                    "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]
+                }})
+            except Exception as e:
+                outputs.append({**line, "status": str(e)})
+
+        _write_jsonl(os.path.join(run_dir, "predictions.jsonl"), outputs)
+        return run_dir
+
+    def poll(self, job_name: str) -> Optional[List[Dict[str, Any]]]:
+        """Output lines once the job has finished (None while running)"""
+        path = os.path.join(job_name, "predictions.jsonl")
+        return _read_jsonl(path) if os.path.exists(path) else None
+
+
+class VertexBatchBackend:
+    """Vertex AI batch prediction with JSONL files on Cloud Storage"""
+
+    def __init__(self, model_name: str, gcs_prefix: str = BATCH_GCS_PREFIX):
+        """
+        Args:
+            model_name: Gemini model (e.g. gemini-2.5-flash)
+            gcs_prefix: gs://bucket/path under which each run gets a folder
+        """
+        if not gcs_prefix.startswith("gs://"):
+            raise ValueError("BATCH_GCS_PREFIX must be a gs:// URI for the vertex batch backend")
+        self.model_name = model_name
+        self.gcs_prefix = gcs_prefix.rstrip("/")
+
+    def submit(self, run_id: str, lines: List[Dict[str, Any]]) -> str:
+        from google.cloud import storage
+        from vertexai.batch_prediction import BatchPredictionJob
+
+        bucket_name, _, prefix = self.gcs_prefix[len("gs://"):].partition("/")
+        blob_name = "/".join(p for p in (prefix, run_id, "input.jsonl") if p)
+        storage.Client().bucket(bucket_name).blob(blob_name).upload_from_string(
+            "\n".join(json.dumps(line, ensure_ascii=False) for line in lines),
+            content_type="application/jsonl"
+        )
+
+        job = BatchPredictionJob.submit(
+            source_model=self.model_name,
+            input_dataset=f"gs://{bucket_name}/{blob_name}",
+            output_uri_prefix=f"{self.gcs_prefix}/{run_id}/output"
+        )
+        return job.resource_name
+
+    def poll(self, job_name: str) -> Optional[List[Dict[str, Any]]]:
+        """Output lines once the job has finished (None while running)"""
+        from google.cloud import storage
+        from vertexai.batch_prediction import BatchPredictionJob
+
+        job = BatchPredictionJob(job_name)
+        if not job.has_ended:
+            return None
+        if not job.has_succeeded:
+            raise RuntimeError(f"Batch prediction job failed: {job.error}")
+
+        bucket_name, _, prefix = job.output_location[len("gs://"):].partition("/")
+        lines = []
+        for blob in storage.Client().list_blobs(bucket_name, prefix=prefix):
+            if blob.name.endswith(".jsonl"):
+                lines.extend(json.loads(l) for l in blob.download_as_text().splitlines() if l.strip())
+        return lines
+
+
+class BatchResultStore:
+    """Base interface for batch runs and their per-vendor results"""
+
+    def add_run(self, run_id: str, project: str, job_name: str, request_keys: Dict[str, str],
+                snapshot_version: Optional[str] = None):
+        """
+        Record a submitted run
+
+        Args:
+            run_id: Unique run ID
+            project: Spreadsheet ID the prompts were built from
+            job_name: Backend job identifier used for polling
+            request_keys: request_key(prompt) -> vendor
+            snapshot_version: Version of the snapshot the prompts were built from
+        """
+        raise NotImplementedError
+
+    def running_runs(self) -> List[Tuple[str, str, Dict[str, str]]]:
+        """(run_id, job_name, request key -> vendor) of unfinished runs, oldest first"""
+        raise NotImplementedError
+
+    def finish_run(self, run_id: str, status: str, results: Dict[str, Dict[str, Any]]):
+        """Store a run's results and mark it done (one transaction)"""
+        raise NotImplementedError
+
+    def latest_results(self, project: str) -> Tuple[Optional[str], Dict[str, Dict[str, Any]]]:
+        """
+        Results of a project's most recent finished run
+
+        Returns:
+            (finished_at or None, vendor -> result)
+        """
+        raise NotImplementedError
+
+
+class SQLiteBatchResultStore(BatchResultStore):
+    """
+    SQLite store of batch runs and their per-vendor results
+
+    For local runs: the file is not shared between Cloud Functions instances
+    and does not survive a recycle. Use FirestoreBatchResultStore there.
+    """
+
+    def __init__(self, db_path: str = BATCH_RESULTS_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS batch_runs ("
+                " run_id TEXT PRIMARY KEY,"
+                " project TEXT NOT NULL,"
+                " job_name TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " snapshot_version TEXT,"
+                " request_keys TEXT NOT NULL,"
+                " created_at TEXT NOT NULL,"
+                " finished_at TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vendor_results ("
+                " run_id TEXT NOT NULL,"
+                " vendor TEXT NOT NULL,"
+                " result TEXT NOT NULL,"
+                " PRIMARY KEY (run_id, vendor))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add_run(self, run_id: str, project: str, job_name: str, request_keys: Dict[str, str],
+                snapshot_version: Optional[str] = None):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO batch_runs (run_id, project, job_name, status, snapshot_version, request_keys, created_at)"
+                " VALUES (?, ?, ?, 'running', ?, ?, ?)",
+                (run_id, project, job_name, snapshot_version, json.dumps(request_keys, ensure_ascii=False), _now())
+            )
+
+    def running_runs(self) -> List[Tuple[str, str, Dict[str, str]]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT run_id, job_name, request_keys FROM batch_runs WHERE status = 'running' ORDER BY created_at"
+            ).fetchall()
+        return [(run_id, job_name, json.loads(keys)) for run_id, job_name, keys in rows]
+
+    def finish_run(self, run_id: str, status: str, results: Dict[str, Dict[str, Any]]):
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO vendor_results (run_id, vendor, result) VALUES (?, ?, ?)",
+                [(run_id, vendor, json.dumps(result, ensure_ascii=False)) for vendor, result in results.items()]
+            )
+            conn.execute("UPDATE batch_runs SET status = ?, finished_at = ? WHERE run_id = ?",
+                         (status, _now(), run_id))
+
+    def latest_results(self, project: str) -> Tuple[Optional[str], Dict[str, Dict[str, Any]]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT run_id, finished_at FROM batch_runs WHERE project = ? AND status = 'done'"
+                " ORDER BY finished_at DESC LIMIT 1",
+                (project,)
+            ).fetchone()
+            if row is None:
+                return None, {}
+            results = conn.execute(
+                "SELECT vendor, result FROM vendor_results WHERE run_id = ? ORDER BY vendor", (row[0],)
+            ).fetchall()
+        return row[1], {vendor: json.loads(result) for vendor, result in results}
+
+
+class FirestoreBatchResultStore(BatchResultStore):
+    """
+    Firestore store shared by every instance
+
+    One document per run in the collection, plus a "<collection>_latest"
+    document per project holding its most recent finished results, so
+    /vendor-report is a single read.
+    """
+
+    def __init__(self, collection: str = BATCH_RESULTS_COLLECTION, client=None):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.Client()
+        self.client = client
+        self.runs = client.collection(collection)
+        self.latest = client.collection(f"{collection}_latest")
+
+    def add_run(self, run_id: str, project: str, job_name: str, request_keys: Dict[str, str],
+                snapshot_version: Optional[str] = None):
+        self.runs.document(run_id).set({
+            'project': project, 'job_name': job_name, 'status': 'running',
+            'snapshot_version': snapshot_version, 'request_keys': request_keys,
+            'created_at': _now(), 'finished_at': None
+        })
+
+    def running_runs(self) -> List[Tuple[str, str, Dict[str, str]]]:
+        runs = [(doc.id, doc.to_dict()) for doc in self.runs.where('status', '==', 'running').stream()]
+        runs.sort(key=lambda run: run[1]['created_at'])
+        return [(run_id, run['job_name'], run['request_keys']) for run_id, run in runs]
+
+    def finish_run(self, run_id: str, status: str, results: Dict[str, Dict[str, Any]]):
+        finished_at = _now()
+        encoded = {vendor: json.dumps(result, ensure_ascii=False) for vendor, result in results.items()}
+        run_ref = self.runs.document(run_id)
+
+        batch = self.client.batch()
+        batch.set(run_ref, {'status': status, 'finished_at': finished_at, 'results': encoded}, merge=True)
+        if status == 'done':
+            project = run_ref.get().to_dict()['project']
+            batch.set(self.latest.document(project),
+                      {'run_id': run_id, 'finished_at': finished_at, 'results': encoded})
+        batch.commit()
+
+    def latest_results(self, project: str) -> Tuple[Optional[str], Dict[str, Dict[str, Any]]]:
+        snapshot = self.latest.document(project).get()
+        if not snapshot.exists:
+            return None, {}
+        latest = snapshot.to_dict()
+        return latest['finished_at'], {vendor: json.loads(result)
+                                       for vendor, result in sorted(latest['results'].items())}
+
+
+class VendorBatchJob:
+    """Submit per-vendor analyses as one batch job and collect the results later"""
+
+    def __init__(self, backend, store: BatchResultStore):
+        self.backend = backend
+        self.store = store
+
+    def submit(self, project: str, snapshot, gemini_client) -> Dict[str, Any]:
+        """
+        Build one request per vendor from a snapshot and submit them together
+
+        The vertex backend uses no interactive /ask quota; the local backend
+        charges each vendor to it.
+
+        Args:
+            project: Spreadsheet ID the snapshot belongs to
+            snapshot: Snapshot to analyze
+            gemini_client: GeminiClient providing persona and prompt format
+
+        Returns:
+            Dict with run_id, job name and number of vendors
+        """
+        with tracing.span("batch.build"):
+            prompts = vendor_prompts(snapshot.issues, snapshot.tasks, gemini_client)
+        if not prompts:
+            return {"run_id": None, "vendors": 0}
+
+        run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        with tracing.span("batch.submit", requests=len(prompts)):
+            job_name = self.backend.submit(run_id, [to_request_line(p) for p in prompts.values()])
+
+        keys = {request_key(prompt): vendor for vendor, prompt in prompts.items()}
+        self.store.add_run(run_id, project, job_name, keys, snapshot_version=snapshot.version)
+        return {"run_id": run_id, "job": job_name, "vendors": len(prompts)}
+
+    def collect(self, gemini_client) -> Dict[str, str]:
+        """
+        Parse and store the output of every finished run
+
+        Returns:
+            run_id -> 'done', 'running' or 'failed'
+        """
+        statuses = {}
+        for run_id, job_name, keys in self.store.running_runs():
+            try:
+                lines = self.backend.poll(job_name)
+            except Exception as e:
+                print(f"Batch run {run_id} failed: {e}")
+                self.store.finish_run(run_id, "failed", {})
+                statuses[run_id] = "failed"
+                continue
+
+            if lines is None:
+                statuses[run_id] = "running"
+                continue
+
+            with tracing.span("batch.parse", lines=len(lines)):
+                results = parse_results(lines, keys, gemini_client)
+            self.store.finish_run(run_id, "done", results)
+            statuses[run_id] = "done"
+        return statuses
+
+
+def parse_results(lines: List[Dict[str, Any]], keys: Dict[str, str], gemini_client) -> Dict[str, Dict[str, Any]]:
+    """Map output lines back to vendors and parse each answer (errors are kept per vendor)"""
+    results = {}
+    for line in lines:
+        key, text, error = parse_output_line(line)
+        vendor = keys.get(key)
+        if vendor is None:
+            continue
+        if error is not None:
+            results[vendor] = {"error": error}
+            continue
+        try:
+            results[vendor] = gemini_client._parse_json(text)
+        except AnswerParseError as e:
+            results[vendor] = {"error": f"Failed to parse AI response as JSON: {e}"}
+    return results
+
+
+def create_batch_result_store() -> BatchResultStore:
+    """
+    Create the batch result store from environment configuration
+
+    BATCH_RESULTS_BACKEND selects 'firestore' (default; shared by every
+    instance) or 'sqlite' (BATCH_RESULTS_DB, local runs only).
+    """
+    if BATCH_RESULTS_BACKEND.lower() == 'sqlite':
+        return SQLiteBatchResultStore(BATCH_RESULTS_DB)
+    return FirestoreBatchResultStore(BATCH_RESULTS_COLLECTION)
+
+
+def create_vendor_batch_job(gemini_client, store: Optional[BatchResultStore] = None) -> VendorBatchJob:
+    """
+    Create the nightly vendor job from environment configuration
+
+    BATCH_BACKEND selects 'vertex' (default; Vertex AI batch prediction via
+    BATCH_GCS_PREFIX) or 'local' (development: answers through the client,
+    charged to its daily limit, and writes JSONL under BATCH_DIR). Both use
+    the VENDOR_TIER model of the client's router.
+
+    Raises:
+        ValueError: 'vertex' without a gs:// BATCH_GCS_PREFIX, or an unknown backend
+    """
+    backend_name = BATCH_BACKEND.lower()
+    if backend_name == 'vertex':
+        backend = VertexBatchBackend(gemini_client.router.model_name(VENDOR_TIER), BATCH_GCS_PREFIX)
+    elif backend_name == 'local':
+        backend = LocalBatchBackend(gemini_client)
+    else:
+        raise ValueError(f"Unknown BATCH_BACKEND: {BATCH_BACKEND}")
+    return VendorBatchJob(backend, store or create_batch_result_store())
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def _write_jsonl(path: str, lines: List[Dict[str, Any]]):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
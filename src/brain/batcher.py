@@ -0,0 +1,86 @@
+"""
+Micro-batcher for myPMO Agent
+Collects requests that arrive within a short window for the same key (e.g.
+the same data snapshot) and sends them to the model as one call
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+# send(key, items) -> one result (or Exception instance) per item, in order
+BatchSender = Callable[[Hashable, List[Any]], List[Any]]
+
+
+class MicroBatcher:
+    """
+    Group concurrent submissions by key
+
+    The first submission for a key becomes the leader: it waits up to
+    window seconds (or until max_batch items are queued), sends the whole
+    batch and hands each waiter its own result. Later submissions just wait.
+    """
+
+    def __init__(self, send: BatchSender, window: float, max_batch: int = 8,
+                 timeout: float = 60.0):
+        """
+        Args:
+            send: Function that processes a batch
+            window: Seconds the leader waits for more submissions
+            max_batch: Send as soon as this many items are queued
+            timeout: Maximum seconds a submission waits for its result
+        """
+        self.send = send
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._batches: Dict[Hashable, Tuple[List[Tuple[Any, Future]], threading.Event]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, item: Any) -> Tuple[Any, int]:
+        """
+        Add an item to the key's batch and wait for its result
+
+        Returns:
+            Tuple of (result, size of the batch it was sent in)
+
+        Raises:
+            The batch error or the item's own error; TimeoutError after timeout
+        """
+        future: Future = Future()
+        with self._lock:
+            entry = self._batches.get(key)
+            leader = entry is None
+            if leader:
+                entry = self._batches[key] = ([], threading.Event())
+            batch, full = entry
+            batch.append((item, future))
+            if len(batch) >= self.max_batch:
+                # Close the batch so later arrivals start a new one
+                full.set()
+                del self._batches[key]
+
+        if leader:
+            full.wait(self.window)
+            with self._lock:
+                if self._batches.get(key) is entry:
+                    del self._batches[key]
+            self._send(key, batch)
+
+        return future.result(timeout=self.timeout)
+
+    def _send(self, key: Hashable, batch: List[Tuple[Any, Future]]):
+        size = len(batch)
+        try:
+            results = self.send(key, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result((result, size))
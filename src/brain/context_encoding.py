@@ -0,0 +1,245 @@
+"""
+Prompt Context Encoding for myPMO Agent
+Renders the Issue Log / Schedule summary of a prompt and picks the encoding
+that shows the most rows within the token budget
+
+Encodings:
+    bullets: one labelled line per row, first 5 rows (the original format)
+    table:   header-once TSV tables
+    compact: TSV plus dictionary-coded vendor/assignee names and dates
+             relative to today ("D-3" = three days ago)
+"""
+
+import os
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from brain.conversation import estimate_tokens
+from tools import tracing
+from tools.date_columns import parse_date
+
+
+CONTEXT_ENCODING = os.getenv('CONTEXT_ENCODING', 'auto')
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1500'))
+
+ENCODINGS = ('bullets', 'table', 'compact')
+
+# Rows shown by the bullet encoding
+BULLET_ROWS = 5
+
+# (record field, table header)
+ISSUE_COLUMNS = (('ベンダー名', 'ベンダー'), ('内容', '内容'), ('期限', '期限'), ('担当者', '担当'), ('優先度', '優先度'))
+TASK_COLUMNS = (('タスク', 'タスク'), ('担当者', '担当'))
+
+# Columns whose names are dictionary-coded, with the code prefix
+CODED_FIELDS = {'ベンダー名': 'V', '担当者': 'P'}
+
+
+class ContextSummary:
+    """Counts and highlighted rows (urgent/high issues, stalled tasks) from one pass over the data"""
+
+    def __init__(self):
+        self.issue_total = 0
+        self.priorities: Dict[str, int] = {}
+        self.urgent: List[Dict[str, Any]] = []
+        self.task_total = 0
+        self.statuses: Dict[str, int] = {}
+        self.stalled: List[Dict[str, Any]] = []
+
+    @classmethod
+    def collect(cls, issues_data: Optional[Iterable], schedule_data: Optional[Iterable]) -> "ContextSummary":
+        """Read each input once (lists or SheetsClient.iter_issues() streams)"""
+        summary = cls()
+        for issue in issues_data or ():
+            summary.issue_total += 1
+            p = issue.get('優先度', '不明')
+            summary.priorities[p] = summary.priorities.get(p, 0) + 1
+            if issue.get('優先度') in ['緊急', '高']:
+                summary.urgent.append(issue)
+
+        for task in schedule_data or ():
+            summary.task_total += 1
+            s = task.get('ステータス', '不明')
+            summary.statuses[s] = summary.statuses.get(s, 0) + 1
+            if task.get('ステータス') == '停滞':
+                summary.stalled.append(task)
+        return summary
+
+    def rows_shown(self, limit: int) -> int:
+        return min(limit, len(self.urgent)) + min(limit, len(self.stalled))
+
+
+def render_bullets(summary: ContextSummary, limit: int = BULLET_ROWS) -> str:
+    """The original labelled-line format"""
+    parts = []
+    if summary.issue_total:
+        parts.append(f"## Issue Log ({summary.issue_total}件)")
+        parts.append(f"優先度別: {summary.priorities}")
+        if summary.urgent and limit:
+            parts.append(f"\n緊急・高優先度課題 ({len(summary.urgent)}件):")
+            for issue in summary.urgent[:limit]:
+                parts.append(
+                    f"- [{issue.get('ベンダー名', 'N/A')}] {issue.get('内容', 'N/A')} "
+                    f"(期限: {issue.get('期限', 'N/A')}, 担当: {issue.get('担当者', 'N/A')})"
+                )
+
+    if summary.task_total:
+        parts.append(f"\n## Schedule ({summary.task_total}タスク)")
+        parts.append(f"ステータス別: {summary.statuses}")
+        if summary.stalled and limit:
+            parts.append(f"\n停滞中タスク ({len(summary.stalled)}件):")
+            for task in summary.stalled[:limit]:
+                parts.append(f"- {task.get('タスク', 'N/A')} (担当: {task.get('担当者', 'N/A')})")
+
+    return "\n".join(parts) if parts else "データなし"
+
+
+def relative_date(value: Any, today: date) -> str:
+    """'D-3' / 'D+0' / 'D+5' for a parsable date, the cell as is otherwise"""
+    parsed = parse_date(value)
+    if np.isnat(parsed):
+        return _cell(value)
+    days = int((parsed - np.datetime64(today, 'D')).astype('int64'))
+    return f"D{days:+d}"
+
+
+def _cell(value: Any) -> str:
+    """TSV-safe cell text"""
+    if value is None:
+        return ''
+    return str(value).replace('\t', ' ').replace('\r', ' ').replace('\n', ' ')
+
+
+def _counts(counts: Dict[str, int]) -> str:
+    return ' '.join(f"{k}={v}" for k, v in counts.items())
+
+
+def name_codes(rows: List[Dict[str, Any]]) -> Dict[Tuple[str, str], str]:
+    """
+    Codes for names that repeat in the shown rows
+
+    A name used once costs more as a legend entry than it saves, so only
+    repeated names are coded.
+    """
+    seen: Dict[Tuple[str, str], int] = {}
+    for row in rows:
+        for field in CODED_FIELDS:
+            value = _cell(row.get(field))
+            if value:
+                key = (field, value)
+                seen[key] = seen.get(key, 0) + 1
+
+    codes, counters = {}, {prefix: 0 for prefix in CODED_FIELDS.values()}
+    for (field, value), count in seen.items():
+        if count > 1:
+            prefix = CODED_FIELDS[field]
+            counters[prefix] += 1
+            codes[(field, value)] = f"{prefix}{counters[prefix]}"
+    return codes
+
+
+def render_table(summary: ContextSummary, limit: int, compact: bool = False,
+                 today: Optional[date] = None) -> str:
+    """
+    Header-once TSV tables of the first `limit` highlighted rows per section
+
+    Args:
+        compact: Dictionary-code repeated names and write dates relative to today
+    """
+    today = today or date.today()
+    urgent, stalled = summary.urgent[:limit], summary.stalled[:limit]
+    codes = name_codes(urgent + stalled) if compact else {}
+
+    def cell(row, field):
+        value = _cell(row.get(field))
+        if compact and field == '期限':
+            return relative_date(row.get(field), today)
+        return codes.get((field, value), value)
+
+    def section(title, total, rows, columns):
+        lines = [f"\n{title} ({total}件{'' if len(rows) == total else f'中{len(rows)}件'}):"]
+        lines.append('\t'.join(header for _, header in columns))
+        lines.extend('\t'.join(cell(row, field) for field, _ in columns) for row in rows)
+        return lines
+
+    parts = []
+    if compact and (urgent or stalled):
+        parts.append(f"基準日: D={today.isoformat()}（日付はDからの日数）")
+        if codes:
+            parts.append("略号: " + ' '.join(f"{code}={value}" for (_, value), code in codes.items()))
+        parts.append("")
+
+    if summary.issue_total:
+        parts.append(f"## Issue Log ({summary.issue_total}件)")
+        parts.append(f"優先度別: {_counts(summary.priorities)}")
+        if urgent:
+            parts.extend(section("緊急・高優先度課題", len(summary.urgent), urgent, ISSUE_COLUMNS))
+
+    if summary.task_total:
+        parts.append(f"\n## Schedule ({summary.task_total}タスク)")
+        parts.append(f"ステータス別: {_counts(summary.statuses)}")
+        if stalled:
+            parts.extend(section("停滞中タスク", len(summary.stalled), stalled, TASK_COLUMNS))
+
+    return "\n".join(parts) if parts else "データなし"
+
+
+def _fit(summary: ContextSummary, encoding: str, budget: int,
+         today: Optional[date]) -> Tuple[int, str, int]:
+    """
+    Most rows per section an encoding shows within the budget
+
+    Returns:
+        (row limit, text, estimated tokens); the smallest rendering when nothing fits
+    """
+    if encoding == 'bullets':
+        text = render_bullets(summary)
+        return BULLET_ROWS, text, estimate_tokens(text)
+
+    # Tokens grow with the limit, so binary-search the largest one that fits
+    low, high = 0, max(len(summary.urgent), len(summary.stalled))
+    text = render_table(summary, low, encoding == 'compact', today)
+    best = (low, text, estimate_tokens(text))
+    while low < high:
+        mid = (low + high + 1) // 2
+        text = render_table(summary, mid, encoding == 'compact', today)
+        tokens = estimate_tokens(text)
+        if tokens <= budget:
+            best, low = (mid, text, tokens), mid
+        else:
+            high = mid - 1
+    return best
+
+
+def encode_context(summary: ContextSummary, encoding: str = None, budget: int = None,
+                   today: Optional[date] = None) -> str:
+    """
+    Render the prompt context
+
+    Args:
+        summary: ContextSummary of the data
+        encoding: 'auto' (default CONTEXT_ENCODING) or one of ENCODINGS
+        budget: Token budget of the context (default CONTEXT_TOKEN_BUDGET)
+        today: Reference date of relative dates (default: today)
+
+    Returns:
+        With 'auto', the encoding showing the most rows within the budget
+        (fewest tokens on a tie); a fixed encoding is used as is
+    """
+    encoding = encoding or CONTEXT_ENCODING
+    budget = budget or CONTEXT_TOKEN_BUDGET
+
+    with tracing.span("gemini.encode_context") as span:
+        candidates = ENCODINGS if encoding == 'auto' else (encoding,)
+        best = None
+        for name in candidates:
+            limit, text, tokens = _fit(summary, name, budget, today)
+            key = (tokens <= budget, summary.rows_shown(limit), -tokens)
+            if best is None or key > best[0]:
+                best = (key, name, text, tokens, limit)
+
+        _, name, text, tokens, limit = best
+        span.set(encoding=name, tokens=tokens, rows=summary.rows_shown(limit))
+        return text
@@ -0,0 +1,283 @@
+"""
+Per-thread Conversation Memory for myPMO Agent
+Keeps earlier /ask turns of each Chat thread (recent ones verbatim, older ones
+clipped to one line each) so follow-up questions send only what changed in the
+data instead of the whole context again
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+
+CONVERSATION_MAX_TURNS = int(os.getenv('CONVERSATION_MAX_TURNS', '3'))
+CONVERSATION_SUMMARY_TOKENS = int(os.getenv('CONVERSATION_SUMMARY_TOKENS', '400'))
+CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', '3600'))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for Gemini
+
+    ASCII averages about 4 characters per token; Japanese is close to one
+    token per character, so non-ASCII characters are counted individually.
+    """
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def thread_key(space_name: Optional[str], thread_name: Optional[str]) -> Optional[str]:
+    """
+    Conversation key for a Chat event: the thread, or None without one
+
+    Unthreaded messages in a space are unrelated questions, so they never
+    share a conversation.
+    """
+    return thread_name or None
+
+
+def _line_digest(line: str) -> str:
+    return hashlib.blake2b(line.encode('utf-8'), digest_size=6).hexdigest()
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class Conversation:
+    """State of one thread: rolling summary, recent turns and the last data context sent"""
+
+    def __init__(self,
+                 key: str,
+                 summary: Optional[List[str]] = None,
+                 turns: Optional[List[Dict[str, str]]] = None,
+                 context_digests: Optional[List[str]] = None):
+        self.key = key
+        self.summary = summary or []
+        self.turns = turns or []
+        self.context_digests = context_digests or []
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "Conversation":
+        return cls(
+            key=state['key'],
+            summary=state.get('summary'),
+            turns=state.get('turns'),
+            context_digests=state.get('context_digests')
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'key': self.key,
+            'summary': self.summary,
+            'turns': self.turns,
+            'context_digests': self.context_digests
+        }
+
+    @property
+    def is_follow_up(self) -> bool:
+        return bool(self.turns or self.summary)
+
+    def memory_text(self) -> str:
+        """Prompt section with the summary and recent turns ('' for a new thread)"""
+        parts = []
+        if self.summary:
+            parts.append("## これまでの会話（要約）")
+            parts.extend(self.summary)
+        if self.turns:
+            parts.append("## 直近のやり取り")
+            for turn in self.turns:
+                parts.append(f"Q: {turn['q']}\nA: {turn['a']}")
+        return "\n".join(parts)
+
+    def delta_context(self, full_context: str) -> Optional[str]:
+        """
+        Data context for a follow-up: only the lines not in the previous turn's context
+
+        The earlier answers in memory_text() stand in for the unchanged data.
+
+        Returns:
+            Change section, or None when there is no previous context to diff
+            against (send full_context instead)
+        """
+        if not self.context_digests:
+            return None
+
+        sent = set(self.context_digests)
+        changed = [line for line in full_context.splitlines()
+                   if line.strip() and _line_digest(line) not in sent]
+        if not changed:
+            return "## データ\n前回の回答時から変更はありません"
+        return "## 前回の回答時からの変更・追加（その他のデータは前回から変わっていません）\n" + "\n".join(changed)
+
+    def record(self, question: str, result: Dict[str, Any], full_context: str,
+               max_turns: int = CONVERSATION_MAX_TURNS,
+               summary_tokens: int = CONVERSATION_SUMMARY_TOKENS):
+        """
+        Add a completed turn; turns beyond max_turns are clipped to one
+        summary line each (truncation, not a model-written summary)
+
+        Args:
+            question: User query
+            result: Parsed model answer (analysis / recommendation / next_action)
+            full_context: Data context sent this turn
+            max_turns: Recent turns kept verbatim
+            summary_tokens: Token budget of the summary lines (oldest dropped first)
+        """
+        answer = result.get('next_action') or result.get('analysis') or ''
+        self.turns.append({
+            'q': _clip(question, 200),
+            'a': _clip(f"{result.get('analysis', '')} → {answer}", 400)
+        })
+
+        while len(self.turns) > max_turns:
+            oldest = self.turns.pop(0)
+            self.summary.append(f"- {_clip(oldest['q'], 60)} → {_clip(oldest['a'], 120)}")
+
+        # Oldest summary lines go first once the budget is exceeded
+        while self.summary and estimate_tokens("\n".join(self.summary)) > summary_tokens:
+            self.summary.pop(0)
+
+        # The next turn's delta is relative to the full data of this turn
+        self.context_digests = sorted({_line_digest(line) for line in full_context.splitlines() if line.strip()})
+
+
+class ConversationStore:
+    """Base interface for conversation state storage"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, key: str, state: Dict[str, Any]):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local LRU store (state is lost when the instance is recycled)"""
+
+    def __init__(self, max_threads: int = 1000, ttl: float = CONVERSATION_TTL):
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self._states: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._states[key]
+                return None
+            self._states.move_to_end(key)
+            return json.loads(entry[1])
+
+    def put(self, key: str, state: Dict[str, Any]):
+        with self._lock:
+            self._states[key] = (time.time(), json.dumps(state, ensure_ascii=False))
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_threads:
+                self._states.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._states.pop(key, None)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """SQLite store shared by processes on one host and kept across restarts"""
+
+    def __init__(self, db_path: str = "pmo_conversations.db", ttl: float = CONVERSATION_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                " key TEXT PRIMARY KEY,"
+                " state TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT state FROM conversations WHERE key = ? AND updated_at > ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, state: Dict[str, Any]):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (key, state, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(state, ensure_ascii=False), time.time())
+            )
+            conn.execute(
+                "DELETE FROM conversations WHERE updated_at <= ?", (time.time() - self.ttl,)
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM conversations WHERE key = ?", (key,))
+
+
+class ConversationMemory:
+    """Load and save Conversation objects through a store"""
+
+    def __init__(self, store: ConversationStore):
+        self.store = store
+
+    def load(self, key: str) -> Conversation:
+        """Get the thread's conversation (a new one if unknown or expired)"""
+        state = self.store.get(key)
+        return Conversation.from_dict(state) if state else Conversation(key)
+
+    def save(self, conversation: Conversation):
+        self.store.put(conversation.key, conversation.to_dict())
+
+    def clear(self, key: str):
+        self.store.delete(key)
+
+
+def create_conversation_memory() -> Optional[ConversationMemory]:
+    """
+    Create conversation memory from environment configuration
+
+    CONVERSATION_BACKEND selects 'memory' (default), 'sqlite' or 'none' (stateless /ask).
+
+    Returns:
+        ConversationMemory, or None when disabled
+    """
+    backend = os.getenv('CONVERSATION_BACKEND', 'memory').lower()
+
+    if backend == 'none':
+        return None
+
+    if backend == 'sqlite':
+        return ConversationMemory(SQLiteConversationStore(
+            db_path=os.getenv('CONVERSATION_DB', 'pmo_conversations.db')
+        ))
+
+    return ConversationMemory(InMemoryConversationStore())
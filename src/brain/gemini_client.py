@@ -5,11 +5,50 @@ Handles AI-powered analysis and recommendations
 
 import os
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import vertexai
 from vertexai.generative_models import GenerativeModel, Part
-from google.oauth2 import service_account
+
+from brain.batcher import MicroBatcher
+from brain.context_encoding import ContextSummary, encode_context
+from brain.model_router import CallLimitError, classify_query, create_model_router
+from brain.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, is_transient
+from tools import tracing
+from tools.credentials import get_credentials
+from tools.date_columns import DateColumnEngine, field_mask, select
+
+
+# Answers arriving within this window on the same data are sent as one call (0 = off)
+GEMINI_BATCH_WINDOW = float(os.getenv('GEMINI_BATCH_WINDOW', '0'))
+GEMINI_BATCH_MAX = int(os.getenv('GEMINI_BATCH_MAX', '8'))
+
+SINGLE_FORMAT = """Respond ONLY with valid JSON in this exact format:
+{
+  "analysis": "事実/推測/リスクの整理",
+  "recommendation": "具体的指示（To-Do形式）",
+  "next_action": "PMが直ちに行うべきアクション1つ"
+}"""
+
+BATCH_FORMAT = """Answer each query separately. Respond ONLY with valid JSON in this exact format:
+{
+  "answers": [
+    {
+      "id": "Q1",
+      "analysis": "事実/推測/リスクの整理",
+      "recommendation": "具体的指示（To-Do形式）",
+      "next_action": "PMが直ちに行うべきアクション1つ"
+    }
+  ]
+}"""
+
+
+class AnswerParseError(ValueError):
+    """The model answered but the answer was not the expected JSON"""
+    
+    def __init__(self, message: str, raw_response: str):
+        super().__init__(message)
+        self.raw_response = raw_response
 
 
 class GeminiClient:
@@ -24,7 +63,9 @@ class GeminiClient:
                  project_id: str,
                  service_account_key_path: Optional[str] = None,
                  location: str = "us-central1",
-                 model_name: str = "gemini-3.0-pro-preview-1118"):
+                 model_name: str = "gemini-3.0-pro-preview-1118",
+                 model=None,
+                 router=None):
         """
         Initialize Gemini AI client
         
@@ -33,22 +74,34 @@ class GeminiClient:
             service_account_key_path: Path to service account JSON key file
             location: Vertex AI location
             model_name: Gemini model name
+            model: Pre-built model with generate_content (optional, skips Vertex AI init; used by benchmarks)
+            router: Pre-built ModelRouter (optional, overrides model tiering from the environment)
         """
         self.project_id = project_id
         self.location = location
         self.model_name = model_name
         
-        # Initialize Vertex AI with service account credentials
-        if service_account_key_path:
-            credentials = service_account.Credentials.from_service_account_file(
-                service_account_key_path,
-                scopes=['https://www.googleapis.com/auth/cloud-platform']
-            )
-            vertexai.init(project=project_id, location=location, credentials=credentials)
-        else:
-            vertexai.init(project=project_id, location=location)
+        if router is None and model is None:
+            # Initialize Vertex AI with the process-wide credentials (token shared with Sheets)
+            vertexai.init(project=project_id, location=location,
+                          credentials=get_credentials(service_account_key_path))
+        
+        # Flash/pro tiers with cross-region fallback; model_name is the flash tier
+        self.router = router or create_model_router(project_id, location, model_name, model=model)
+        self.model = self.router.tiers['flash'][0].model
         
-        self.model = GenerativeModel(model_name)
+        # Transient failures are retried; repeated ones open the breaker and
+        # /ask answers from a rule-based summary until Vertex AI recovers
+        self.retry_policy = RetryPolicy()
+        self.breaker = CircuitBreaker()
+        self._dates = DateColumnEngine()
+        self._persona: Optional[str] = None
+        
+        # Concurrent first-turn questions on the same snapshot share one call
+        self.batcher = None
+        if GEMINI_BATCH_WINDOW > 0:
+            self.batcher = MicroBatcher(self._send_batch, GEMINI_BATCH_WINDOW, max_batch=GEMINI_BATCH_MAX,
+                                        timeout=GEMINI_BATCH_WINDOW + self.retry_policy.budget + 5)
         
         # Reset counter if new day
         self._check_reset_counter()
@@ -76,6 +129,11 @@ class GeminiClient:
         GeminiClient._request_count += 1
         return True
     
+    def _refund_request(self):
+        """Give back a request that did not produce an AI answer"""
+        if GeminiClient._request_count > 0:
+            GeminiClient._request_count -= 1
+    
     def get_remaining_requests(self) -> int:
         """Get remaining requests for today"""
         self._check_reset_counter()
@@ -84,7 +142,9 @@ class GeminiClient:
     def analyze_with_context(self,
                             user_query: str,
                             issues_data: Optional[list] = None,
-                            schedule_data: Optional[list] = None) -> Dict[str, Any]:
+                            schedule_data: Optional[list] = None,
+                            conversation=None,
+                            trends: Optional[str] = None) -> Dict[str, Any]:
         """
         Analyze user query with PMO context
         
@@ -92,9 +152,13 @@ class GeminiClient:
             user_query: User's question or request
             issues_data: Issue Log data (list of dicts)
             schedule_data: Schedule data (list of dicts)
+            conversation: Chat thread Conversation (optional); follow-ups add its
+                memory and the changed context lines, and the turn is recorded
+            trends: Compact trend summary from archived snapshots (optional)
             
         Returns:
             Dict with 'analysis', 'recommendation', 'next_action'
+            ('degraded': True when answered without AI)
         """
         # Check rate limit
         if not self._increment_request_count():
@@ -103,116 +167,293 @@ class GeminiClient:
                 "remaining_requests": 0
             }
         
+        # Vertex AI is known to be unhealthy: answer locally without waiting on it
+        trial = self.breaker.allow()
+        if trial is None:
+            self._refund_request()
+            return self._degraded_answer(issues_data, schedule_data)
+        
+        try:
+            return self._analyze(user_query, issues_data, schedule_data, conversation, trends)
+        finally:
+            # A trial that failed before reaching the model (context, persona,
+            # batch timeout) recorded nothing; let the next call be the trial
+            if trial:
+                self.breaker.release(trial)
+    
+    def _analyze(self, user_query: str, issues_data, schedule_data, conversation,
+                 trends: Optional[str]) -> Dict[str, Any]:
+        """Answer a query the rate limit and circuit breaker have let through"""
         # Build context from data
-        context = self._build_context(issues_data, schedule_data)
+        with tracing.span("gemini.build_context") as span:
+            full_context = self._build_context(issues_data, schedule_data)
+            if trends:
+                full_context += f"\n\n## 推移\n{trends}"
+            # Follow-ups send only what changed since the last turn (the memory
+            # carries the earlier answers); the first turn sends everything
+            delta = conversation.delta_context(full_context) if conversation is not None else None
+            context = delta if delta is not None else full_context
+            span.set(chars=len(context), delta=delta is not None)
         
         # Load PMO persona
-        persona = self._load_pmo_persona()
+        with tracing.span("gemini.load_persona"):
+            persona = self._load_pmo_persona()
         
-        # Construct prompt
-        prompt = f"""{persona}
-
-# Data Context
-
-{context}
-
-# User Query
-
-{user_query}
-
-# Response Format (JSON)
-
-Respond ONLY with valid JSON in this exact format:
-{{
-  "analysis": "事実/推測/リスクの整理",
-  "recommendation": "具体的指示（To-Do形式）",
-  "next_action": "PMが直ちに行うべきアクション1つ"
-}}
-"""
+        memory = ""
+        if conversation is not None and conversation.is_follow_up:
+            memory = f"\n# Conversation Memory\n\n{conversation.memory_text()}\n"
+        
+        tier = classify_query(user_query)
         
         try:
-            response = self.model.generate_content(prompt)
-            
-            # Extract JSON from response
-            response_text = response.text.strip()
+            if self.batcher is not None and not memory:
+                # Questions on the same data snapshot within the window share one call
+                with tracing.span("gemini.batch", tier=tier) as span:
+                    result, size = self.batcher.submit((tier, persona, context), user_query)
+                    span.set(batch_size=size)
+            else:
+                prompt = self._build_prompt(persona, memory, context, f"# User Query\n\n{user_query}", SINGLE_FORMAT)
+                result = self._parse_json(self._generate_text(prompt, tier))
             
-            # Remove markdown code blocks if present
-            if response_text.startswith("```json"):
-                response_text = response_text[7:]  # Remove ```json
-            if response_text.startswith("```"):
-                response_text = response_text[3:]  # Remove ```
-            if response_text.endswith("```"):
-                response_text = response_text[:-3]  # Remove ```
-            
-            response_text = response_text.strip()
-            
-            result = json.loads(response_text)
             result["remaining_requests"] = self.get_remaining_requests()
             
+            if conversation is not None:
+                conversation.record(user_query, result, full_context)
+            
             return result
         
-        except json.JSONDecodeError as e:
+        except AnswerParseError as e:
             return {
                 "error": f"Failed to parse AI response as JSON: {e}",
-                "raw_response": response.text,
+                "raw_response": e.raw_response,
                 "remaining_requests": self.get_remaining_requests()
             }
         
         except Exception as e:
+            self._refund_request()
+            
+            if is_transient(e):
+                print(f"AI request failed, answering from rules: {e}")
+                return self._degraded_answer(issues_data, schedule_data)
+            
             return {
                 "error": f"AI request failed: {str(e)}",
                 "remaining_requests": self.get_remaining_requests()
             }
     
+    def generate_text(self, prompt: str, tier: str = 'flash') -> str:
+        """
+        One model call outside /ask (e.g. the local vendor batch) under the same
+        daily limit and circuit breaker
+        
+        Raises:
+            CallLimitError when the daily limit is reached, CircuitOpenError
+            while the breaker is open, or the model error
+        """
+        if not self._increment_request_count():
+            raise CallLimitError(f"Daily request limit ({self.DAILY_LIMIT}) exceeded")
+        
+        trial = self.breaker.allow()
+        if trial is None:
+            self._refund_request()
+            raise CircuitOpenError("Vertex AI circuit breaker is open")
+        
+        try:
+            return self._generate_text(prompt, tier)
+        except Exception:
+            self._refund_request()
+            raise
+        finally:
+            if trial:
+                self.breaker.release(trial)
+    
+    def _build_prompt(self, persona: str, memory: str, context: str, queries: str, response_format: str) -> str:
+        """Assemble the prompt from its sections"""
+        return f"""{persona}
+{memory}
+# Data Context
+
+{context}
+
+{queries}
+
+# Response Format (JSON)
+
+{response_format}
+"""
+    
+    def _generate_text(self, prompt: str, tier: str) -> str:
+        """
+        Call the model with retries and record the outcome on the circuit breaker
+        
+        Raises:
+            The final model error (transient errors count as breaker failures),
+            or CallLimitError when the daily limit refused every further call
+        """
+        calls = 0
+        
+        def admit() -> bool:
+            # The /ask already paid for one call; hedges, fallbacks and retries
+            # are real Vertex AI calls too and count against the daily limit
+            nonlocal calls
+            calls += 1
+            return calls == 1 or self._increment_request_count()
+        
+        try:
+            with tracing.span("gemini.generate_content", tier=tier) as span:
+                response, endpoint = self.retry_policy.run(
+                    lambda remaining: self.router.generate(prompt, tier, timeout=remaining, admit=admit)
+                )
+                if span.active:
+                    span.set(model=endpoint.name, calls=calls)
+                    self._record_usage(span, response)
+        except Exception as e:
+            if is_transient(e):
+                self.breaker.record_failure()
+            elif isinstance(e, CallLimitError):
+                pass  # no call was made
+            else:
+                # Vertex AI answered (e.g. rejected the request), so it is reachable
+                self.breaker.record_success()
+            raise
+        
+        self.breaker.record_success()
+        return response.text
+    
+    def _parse_json(self, text: str):
+        """Parse a JSON answer, tolerating markdown code fences"""
+        response_text = text.strip()
+        
+        # Remove markdown code blocks if present
+        if response_text.startswith("```json"):
+            response_text = response_text[7:]  # Remove ```json
+        if response_text.startswith("```"):
+            response_text = response_text[3:]  # Remove ```
+        if response_text.endswith("```"):
+            response_text = response_text[:-3]  # Remove ```
+        
+        try:
+            return json.loads(response_text.strip())
+        except json.JSONDecodeError as e:
+            raise AnswerParseError(str(e), text)
+    
+    def _send_batch(self, key, queries: List[str]) -> List[Any]:
+        """
+        Answer a micro-batch of queries against one snapshot with a single call
+        
+        Returns:
+            One result dict (or AnswerParseError) per query, in order
+        """
+        tier, persona, context = key
+        
+        if len(queries) == 1:
+            prompt = self._build_prompt(persona, "", context, f"# User Query\n\n{queries[0]}", SINGLE_FORMAT)
+            return [self._parse_json(self._generate_text(prompt, tier))]
+        
+        numbered = "\n".join(f"[Q{i}] {query}" for i, query in enumerate(queries, 1))
+        prompt = self._build_prompt(persona, "", context, f"# User Queries\n\n{numbered}", BATCH_FORMAT)
+        text = self._generate_text(prompt, tier)
+        
+        # One model call served every query: give back the extra daily requests
+        for _ in queries[1:]:
+            self._refund_request()
+        
+        try:
+            answers = {a.get('id'): a for a in self._parse_json(text).get('answers', [])}
+        except (AnswerParseError, AttributeError) as e:
+            return [AnswerParseError(str(e), text)] * len(queries)
+        
+        results = []
+        for i in range(1, len(queries) + 1):
+            answer = answers.get(f"Q{i}")
+            if answer is None:
+                results.append(AnswerParseError(f"No answer for Q{i} in batched response", text))
+            else:
+                results.append({k: v for k, v in answer.items() if k != 'id'})
+        return results
+    
+    def _degraded_answer(self, issues_data, schedule_data) -> Dict[str, Any]:
+        """Rule-based risk summary used while Vertex AI is unavailable"""
+        issues = issues_data or []
+        tasks = schedule_data or []
+        
+        open_issues = field_mask(issues, 'ステータス', '完了')
+        overdue = select(issues, self._dates.overdue(issues, '期限') & open_issues)
+        due_soon = select(issues, self._dates.due_within(issues, '期限', 7) & open_issues)
+        urgent = [i for i in overdue if i.get('優先度') in ('緊急', '高')]
+        stalled = [t for t in tasks if t.get('ステータス') == '停滞']
+        
+        analysis = (
+            f"【簡易分析（AI一時停止中）】期限超過 {len(overdue)}件（うち緊急・高 {len(urgent)}件）、"
+            f"7日以内に期限 {len(due_soon)}件、停滞タスク {len(stalled)}件"
+        )
+        
+        lines = [
+            f"- 期限超過: [{i.get('ベンダー名', 'N/A')}] {i.get('内容', 'N/A')} "
+            f"(期限: {i.get('期限', 'N/A')}, 担当: {i.get('担当者', 'N/A')})"
+            for i in (urgent or overdue)[:3]
+        ]
+        lines += [f"- 停滞: {t.get('タスク', 'N/A')} (担当: {t.get('担当者', 'N/A')})" for t in stalled[:3]]
+        
+        if urgent or overdue:
+            top = (urgent or overdue)[0]
+            next_action = f"期限超過の課題「{top.get('内容', 'N/A')}」について担当 {top.get('担当者', 'N/A')} に状況を確認する"
+        elif stalled:
+            next_action = f"停滞タスク「{stalled[0].get('タスク', 'N/A')}」の阻害要因を担当 {stalled[0].get('担当者', 'N/A')} に確認する"
+        else:
+            next_action = "AI復旧後に改めて質問してください"
+        
+        return {
+            "analysis": analysis,
+            "recommendation": "\n".join(lines) or "- 対応が必要な項目はありません",
+            "next_action": next_action,
+            "degraded": True,
+            "remaining_requests": self.get_remaining_requests()
+        }
+    
+    def get_model_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model call counts, latency percentiles, tokens and cost"""
+        return self.router.stats()
+    
+    def _record_usage(self, span, response):
+        """Attach token counts from the response to a tracing span"""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            span.set(prompt_tokens=getattr(usage, 'prompt_token_count', None),
+                     response_tokens=getattr(usage, 'candidates_token_count', None))
+    
     def _build_context(self, issues_data, schedule_data) -> str:
-        """Build context string from data"""
-        context_parts = []
+        """
+        Build context string from data
         
-        if issues_data:
-            context_parts.append(f"## Issue Log ({len(issues_data)}件)")
-            
-            # Summarize by priority
-            priorities = {}
-            for issue in issues_data:
-                p = issue.get('優先度', '不明')
-                priorities[p] = priorities.get(p, 0) + 1
-            
-            context_parts.append(f"優先度別: {priorities}")
-            
-            # Show urgent/high priority issues
-            urgent = [i for i in issues_data if i.get('優先度') in ['緊急', '高']]
-            if urgent:
-                context_parts.append(f"\n緊急・高優先度課題 ({len(urgent)}件):")
-                for issue in urgent[:5]:  # Top 5
-                    context_parts.append(
-                        f"- [{issue.get('ベンダー名', 'N/A')}] {issue.get('内容', 'N/A')} "
-                        f"(期限: {issue.get('期限', 'N/A')}, 担当: {issue.get('担当者', 'N/A')})"
-                    )
-        
-        if schedule_data:
-            context_parts.append(f"\n## Schedule ({len(schedule_data)}タスク)")
-            
-            # Summarize by status
-            statuses = {}
-            for task in schedule_data:
-                s = task.get('ステータス', '不明')
-                statuses[s] = statuses.get(s, 0) + 1
-            
-            context_parts.append(f"ステータス別: {statuses}")
-            
-            # Show stalled tasks
-            stalled = [t for t in schedule_data if t.get('ステータス') == '停滞']
-            if stalled:
-                context_parts.append(f"\n停滞中タスク ({len(stalled)}件):")
-                for task in stalled[:5]:
-                    context_parts.append(
-                        f"- {task.get('タスク', 'N/A')} (担当: {task.get('担当者', 'N/A')})"
-                    )
-        
-        return "\n".join(context_parts) if context_parts else "データなし"
+        Accepts lists or streams (SheetsClient.iter_issues()); each input is
+        read once. The encoding (CONTEXT_ENCODING) is chosen to show the most
+        highlighted rows within CONTEXT_TOKEN_BUDGET.
+        """
+        return encode_context(ContextSummary.collect(issues_data, schedule_data))
+    
+    def warm_up(self):
+        """
+        Pay one-time costs before the first /ask: load the persona and open
+        each endpoint's Vertex AI connection (channel setup, credentials)
+
+        count_tokens goes through the same client as generate_content but is
+        not a generation, so it is not charged to the daily limit.
+        """
+        self._load_pmo_persona()
+        for endpoint in self.router.endpoints():
+            try:
+                endpoint.model.count_tokens("ping")
+            except Exception as e:
+                print(f"Warm-up of {endpoint.name} failed: {e}")
     
     def _load_pmo_persona(self) -> str:
-        """Load PMO persona prompt from knowledge base"""
+        """Load PMO persona prompt from knowledge base (read once per client)"""
+        if self._persona is None:
+            self._persona = self._read_pmo_persona()
+        return self._persona
+    
+    def _read_pmo_persona(self) -> str:
         persona_path = os.path.join(
             os.path.dirname(__file__), 
             '../../resources/knowledge/pmo_persona.md'
@@ -0,0 +1,338 @@
+"""
+Model Tiering Router for myPMO Agent
+Sends simple questions to a flash-class model and complex analysis to a
+pro-class model, falls back across models/regions on timeouts, quota and 5xx
+errors, and hedges slow calls so one sluggish endpoint does not set the p95
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from brain.resilience import BoundedExecutor, OverloadedError, is_transient
+from tools import tracing
+
+
+GEMINI_PRO_MODEL = os.getenv('GEMINI_PRO_MODEL', 'gemini-2.5-pro')
+# Extra regions tried when the primary region fails (comma separated)
+GEMINI_FALLBACK_LOCATIONS = [l.strip() for l in os.getenv('GEMINI_FALLBACK_LOCATIONS', '').split(',') if l.strip()]
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '30'))
+# Launch a hedge on the next endpoint after this many seconds (0 = never hedge)
+GEMINI_HEDGE_AFTER = float(os.getenv('GEMINI_HEDGE_AFTER', '8'))
+GEMINI_MAX_INFLIGHT = int(os.getenv('GEMINI_MAX_INFLIGHT', '16'))
+# Log the per-model latency/cost report at most this often (seconds, 0 = never)
+GEMINI_STATS_INTERVAL = float(os.getenv('GEMINI_STATS_INTERVAL', '300'))
+
+# USD per 1K tokens (input, output)
+TIER_COSTS = {
+    'flash': (0.0003, 0.0025),
+    'pro': (0.00125, 0.01)
+}
+
+# Questions that need multi-step reasoning go to the pro tier
+COMPLEX_KEYWORDS = (
+    '分析', '原因', '対策', '比較', '計画', '戦略', 'なぜ', '理由', '影響', '優先順位',
+    'シナリオ', '見通し', '評価', '提案', 'ロードマップ', 'トレードオフ'
+)
+COMPLEX_QUERY_CHARS = 80
+
+
+class CallLimitError(RuntimeError):
+    """A model call (including hedges, fallbacks and retries) was refused by the daily call budget"""
+
+
+def classify_query(query: str) -> str:
+    """
+    Pick a tier for a question
+
+    Returns:
+        'pro' for long or analysis-style questions, otherwise 'flash'
+    """
+    if len(query) > COMPLEX_QUERY_CHARS or any(k in query for k in COMPLEX_KEYWORDS):
+        return 'pro'
+    return 'flash'
+
+
+def resource_name(project_id: str, location: str, model_name: str) -> str:
+    """Full Vertex AI model resource name (pins the call to a region)"""
+    return f"projects/{project_id}/locations/{location}/publishers/google/models/{model_name}"
+
+
+class ModelStats:
+    """Latency, error, token and cost counters of one endpoint"""
+
+    def __init__(self, window: int = 200):
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float, input_tokens: int = 0, output_tokens: int = 0,
+               cost_usd: float = 0.0):
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.cost_usd += cost_usd
+            self._latencies.append(latency_s)
+
+    def record_error(self):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile in seconds over the recent window (None without samples)"""
+        with self._lock:
+            samples = sorted(self._latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cost_usd': round(self.cost_usd, 6)
+        }
+
+
+class ModelEndpoint:
+    """One model in one region"""
+
+    def __init__(self, name: str, model, tier: str = 'flash'):
+        """
+        Args:
+            name: Display name (e.g. gemini-2.5-flash@us-central1)
+            model: Object with generate_content (GenerativeModel or a fake)
+            tier: 'flash' or 'pro' (selects the cost rates)
+        """
+        self.name = name
+        self.model = model
+        self.tier = tier
+        self.stats = ModelStats()
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        input_rate, output_rate = TIER_COSTS.get(self.tier, TIER_COSTS['flash'])
+        return input_tokens / 1000 * input_rate + output_tokens / 1000 * output_rate
+
+
+class ModelRouter:
+    """
+    Route prompts to tiered endpoints with fallback and hedging
+
+    Each tier is an ordered list of endpoints. The first is called; if it
+    fails with a fallback error the next one is called, and if it has not
+    answered within the hedge budget the next one is started in parallel and
+    the first answer wins.
+    """
+
+    def __init__(self,
+                 tiers: Dict[str, List[ModelEndpoint]],
+                 timeout: float = GEMINI_TIMEOUT,
+                 hedge_after: float = GEMINI_HEDGE_AFTER,
+                 max_inflight: int = GEMINI_MAX_INFLIGHT,
+                 stats_interval: float = GEMINI_STATS_INTERVAL):
+        """
+        Args:
+            tiers: Tier name to endpoints in preference order ('flash' is the default tier)
+            timeout: Per-call deadline for one generate call in seconds
+            hedge_after: Hedge budget in seconds (0 disables hedging); once an
+                endpoint has enough samples its own p95 is used when lower
+            max_inflight: Maximum concurrent model calls per process; calls beyond
+                it fail fast with OverloadedError instead of queueing
+            stats_interval: Seconds between model_stats log lines (0 disables them)
+        """
+        self.tiers = tiers
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.stats_interval = stats_interval
+        self._executor = BoundedExecutor(max_inflight, thread_name_prefix="pmo-gemini")
+        self._reported_at = time.monotonic()
+        self._report_lock = threading.Lock()
+
+    def endpoints(self) -> List[ModelEndpoint]:
+        """All distinct endpoints across tiers"""
+        seen = {}
+        for candidates in self.tiers.values():
+            for endpoint in candidates:
+                seen.setdefault(id(endpoint), endpoint)
+        return list(seen.values())
+
+    def model_name(self, tier: str = 'flash') -> str:
+        """Model name of a tier's primary endpoint (e.g. for jobs submitted outside the router)"""
+        candidates = self.tiers.get(tier) or self.tiers['flash']
+        return candidates[0].name.split('@')[0]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-endpoint latency and cost report"""
+        return {endpoint.name: endpoint.stats.to_dict() for endpoint in self.endpoints()}
+
+    def report_stats(self, force: bool = False) -> bool:
+        """
+        Log the per-model report as a structured line once stats_interval has passed
+
+        Returns:
+            True if a line was written
+        """
+        with self._report_lock:
+            now = time.monotonic()
+            if not force and (not self.stats_interval or now - self._reported_at < self.stats_interval):
+                return False
+            self._reported_at = now
+        tracing.emit({'severity': 'INFO', 'message': 'model_stats', 'models': self.stats()})
+        return True
+
+    def _hedge_budget(self, endpoint: ModelEndpoint) -> Optional[float]:
+        if not self.hedge_after:
+            return None
+        p95 = endpoint.stats.percentile(95) if endpoint.stats.calls >= 20 else None
+        # Never hedge sooner than a second, even for a very fast endpoint
+        return min(self.hedge_after, max(p95, 1.0)) if p95 else self.hedge_after
+
+    def _call(self, endpoint: ModelEndpoint, prompt):
+        start = time.perf_counter()
+        try:
+            response = endpoint.model.generate_content(prompt)
+        except Exception:
+            endpoint.stats.record_error()
+            self.report_stats()
+            raise
+
+        usage = getattr(response, 'usage_metadata', None)
+        input_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        endpoint.stats.record(time.perf_counter() - start, input_tokens, output_tokens,
+                              endpoint.cost(input_tokens, output_tokens))
+        self.report_stats()
+        return response
+
+    def generate(self, prompt, tier: str = 'flash', timeout: Optional[float] = None,
+                 admit: Optional[Callable[[], bool]] = None) -> Tuple[Any, ModelEndpoint]:
+        """
+        Generate content on the best available endpoint of a tier
+
+        Args:
+            prompt: Prompt passed to generate_content
+            tier: 'flash' or 'pro'
+            timeout: Deadline in seconds (default: the router's per-call timeout)
+            admit: Called before every model call, hedges and fallbacks included;
+                returning False refuses the call (each one is billed by Vertex AI)
+
+        Returns:
+            Tuple of (response, endpoint that answered)
+
+        Raises:
+            TimeoutError: No endpoint answered before the deadline
+            OverloadedError: No worker slot was free for the first call
+            CallLimitError: admit refused the first call
+            Exception: The last error when every endpoint failed, or the first
+                non-transient error (e.g. an invalid request)
+        """
+        candidates = self.tiers.get(tier) or self.tiers['flash']
+        timeout = self.timeout if timeout is None else min(timeout, self.timeout)
+        deadline = time.monotonic() + timeout
+        pending = {}
+        state = {'next': 0, 'hedge_at': None}
+        last_error = None
+
+        def launch():
+            if admit is not None and not admit():
+                raise CallLimitError("Daily model call limit reached")
+            endpoint = candidates[state['next']]
+            state['next'] += 1
+            pending[self._executor.submit(self._call, endpoint, prompt)] = endpoint
+            budget = self._hedge_budget(endpoint)
+            state['hedge_at'] = time.monotonic() + budget if budget else None
+
+        launch()
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+
+            can_hedge = state['hedge_at'] is not None and state['next'] < len(candidates)
+            wake_at = min(deadline, state['hedge_at']) if can_hedge else deadline
+            done, _ = wait(list(pending), timeout=max(0.0, wake_at - now), return_when=FIRST_COMPLETED)
+
+            if not done:
+                if can_hedge and time.monotonic() >= state['hedge_at']:
+                    try:
+                        launch()
+                    except (OverloadedError, CallLimitError):
+                        # No spare slot or budget for a hedge; keep waiting on what is running
+                        state['hedge_at'] = None
+                continue
+
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    return future.result(), endpoint
+                except Exception as e:
+                    if not is_transient(e):
+                        raise
+                    print(f"Model {endpoint.name} failed, falling back: {e}")
+                    last_error = e
+
+                if state['next'] < len(candidates):
+                    try:
+                        launch()
+                    except OverloadedError as e:
+                        last_error = e
+                    except CallLimitError:
+                        # Out of budget for a fallback: the endpoint's own error stands
+                        pass
+
+        # Calls still running are abandoned; each keeps its slot until it returns
+        if pending or last_error is None:
+            raise TimeoutError(f"No model answered within {timeout:.0f}s")
+        raise last_error
+
+
+def create_model_router(project_id: str, location: str, flash_model: Optional[str] = None,
+                        model=None) -> ModelRouter:
+    """
+    Build the flash/pro router from environment configuration
+
+    With an injected model (benchmarks, tests) both tiers use that model.
+    Otherwise the flash tier is the flash model in the primary then the
+    fallback regions; the pro tier is GEMINI_PRO_MODEL likewise, ending with
+    the flash endpoints as a last resort.
+
+    Args:
+        project_id: GCP project ID
+        location: Primary Vertex AI region
+        flash_model: Flash-class model name (GEMINI_FLASH_MODEL overrides it)
+        model: Pre-built model (optional)
+    """
+    flash_model = os.getenv('GEMINI_FLASH_MODEL') or flash_model or 'gemini-2.5-flash'
+
+    if model is not None:
+        endpoint = ModelEndpoint(flash_model, model)
+        return ModelRouter({'flash': [endpoint], 'pro': [endpoint]})
+
+    from vertexai.generative_models import GenerativeModel
+
+    def endpoints(name, tier):
+        result = [ModelEndpoint(f"{name}@{location}", GenerativeModel(name), tier)]
+        for region in GEMINI_FALLBACK_LOCATIONS:
+            result.append(ModelEndpoint(
+                f"{name}@{region}", GenerativeModel(resource_name(project_id, region, name)), tier
+            ))
+        return result
+
+    flash = endpoints(flash_model, 'flash')
+    if GEMINI_PRO_MODEL == flash_model:
+        return ModelRouter({'flash': flash, 'pro': flash})
+    return ModelRouter({'flash': flash, 'pro': endpoints(GEMINI_PRO_MODEL, 'pro') + flash})
@@ -0,0 +1,189 @@
+"""
+Resilience Primitives for myPMO Agent
+Error classification, bounded executors, retries with backoff and a circuit
+breaker for Vertex AI calls
+"""
+
+import os
+import re
+import time
+import random
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+
+T = TypeVar('T')
+
+GEMINI_MAX_ATTEMPTS = int(os.getenv('GEMINI_MAX_ATTEMPTS', '2'))
+GEMINI_RETRY_BUDGET = float(os.getenv('GEMINI_RETRY_BUDGET', '45'))
+BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', '5'))
+BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', '30'))
+
+# HTTP statuses that may succeed when retried (or sent elsewhere)
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+_STATUS_PATTERN = re.compile(r'^\s*(\d{3})\b')
+
+
+class OverloadedError(RuntimeError):
+    """All worker slots are busy (e.g. calls hanging during an outage)"""
+    code = 503
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit breaker is open and calls are short-circuited"""
+    code = 503
+
+
+def error_status(exc: Exception) -> Optional[int]:
+    """HTTP-like status of an API error (google.api_core code, or a leading '503 ...' message)"""
+    code = getattr(exc, 'code', None)
+    if isinstance(code, int):
+        return code
+    match = _STATUS_PATTERN.match(str(exc))
+    return int(match.group(1)) if match else None
+
+
+def is_transient(exc: Exception) -> bool:
+    """True for timeouts, dropped connections, quota exhaustion and server errors"""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return error_status(exc) in TRANSIENT_STATUSES
+
+
+class BoundedExecutor:
+    """
+    Thread pool that refuses work instead of queueing it
+
+    A call that hangs keeps its slot until it returns, so during an outage the
+    pool fills up and further submissions fail fast with OverloadedError
+    rather than piling up blocked threads and queued requests.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "pmo-worker"):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(max_workers)
+
+    def submit(self, fn: Callable[..., T], *args, **kwargs) -> "Future[T]":
+        if not self._slots.acquire(blocking=False):
+            raise OverloadedError(f"All {self.max_workers} workers are busy")
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+
+class RetryPolicy:
+    """Retry transient errors with capped exponential backoff and full jitter"""
+
+    def __init__(self, max_attempts: int = GEMINI_MAX_ATTEMPTS, base_delay: float = 0.5,
+                 max_delay: float = 4.0, budget: float = GEMINI_RETRY_BUDGET):
+        """
+        Args:
+            max_attempts: Total attempts including the first
+            base_delay: Backoff before the second attempt (doubles each retry)
+            max_delay: Backoff cap in seconds
+            budget: Overall time budget in seconds; no retry starts after it
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def run(self, fn: Callable[[float], T]) -> T:
+        """
+        Call fn(remaining_seconds) until it succeeds or retries are exhausted
+
+        Raises:
+            The last error, immediately for non-transient errors
+        """
+        deadline = time.monotonic() + self.budget
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                return fn(max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                if not is_transient(e) or isinstance(e, CircuitOpenError) or attempt >= self.max_attempts:
+                    raise
+
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                if time.monotonic() + delay >= deadline:
+                    raise
+                print(f"Retrying after transient error ({attempt}/{self.max_attempts}): {e}")
+                time.sleep(delay)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    closed: calls pass. After failure_threshold consecutive transient failures
+    it opens and calls are refused for reset_timeout seconds. Then one trial
+    call is let through (half-open); success closes it, failure re-opens it.
+    A trial that ends without an outcome is released back to open (see
+    release), and one that never reports is replaced after reset_timeout.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial_at = 0.0
+        self._trial = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> Optional[int]:
+        """
+        Admit a call now
+
+        Returns:
+            None if refused, 0 for a normal call, or the trial number (> 0)
+            when this call holds the single half-open trial
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0
+            now = time.monotonic()
+            if (self.state == self.OPEN and now - self._opened_at >= self.reset_timeout
+                    or self.state == self.HALF_OPEN and now - self._trial_at >= self.reset_timeout):
+                # Let exactly one trial call through
+                self.state = self.HALF_OPEN
+                self._trial_at = now
+                self._trial += 1
+                return self._trial
+            return None
+
+    def release(self, trial: int):
+        """
+        End a trial that recorded no outcome (it failed before reaching the model)
+
+        The trial goes back to open, so the next call becomes the trial. A
+        trial that was already replaced (see allow) leaves the newer one alone.
+        """
+        with self._lock:
+            if trial and trial == self._trial and self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
@@ -4,6 +4,7 @@ Handles Google Chat webhook requests
 """
 
 import os
+import hmac
 import json
 import functions_framework
 from flask import Request
@@ -14,7 +15,20 @@ load_dotenv()
 
 # Import our modules
 from brain.gemini_client import GeminiClient
+from brain.conversation import create_conversation_memory, thread_key
+from brain.batch_prediction import create_batch_result_store, create_vendor_batch_job
 from tools.sheets_client import SheetsClient
+from tools.chat_client import ChatClient
+from tools.task_queue import create_task_queue
+from tools.tenants import TenantRegistry, load_tenant_config
+from tools.idempotency import create_idempotency_cache
+from tools.snapshot import snapshot_cache_for
+from tools.history import snapshot_archive_for
+from tools.trends import trend_summary, wants_trends
+from tools.dedup_index import duplicate_checker_for
+from tools.warmup import parse_change_notification, prewarm_sheets
+from tools.data_api import cors_headers, handle_data_request
+from tools import profiling, tracing
 
 
 # Initialize clients
@@ -22,19 +36,91 @@ from tools.sheets_client import SheetsClient
 # We only pass the service account key path if it exists (for local testing)
 service_account_key = os.getenv('SERVICE_ACCOUNT_KEY_PATH')
 
-sheets_client = SheetsClient(
-    service_account_key_path=service_account_key if service_account_key and os.path.exists(service_account_key) else None,
-    spreadsheet_id=os.getenv('SPREADSHEET_ID'),
-    issue_sheet_name=os.getenv('ISSUE_SHEET_NAME', 'Issues'),
-    schedule_sheet_name=os.getenv('SCHEDULE_SHEET_NAME', 'Schedule')
-)
+# Clients are created on first use so the module can be imported offline
+# (benchmarks and load tests inject fakes via set_clients)
+sheets_client = None
+gemini_client = None
 
-gemini_client = GeminiClient(
-    project_id=os.getenv('GCP_PROJECT_ID'),
-    service_account_key_path=service_account_key if service_account_key and os.path.exists(service_account_key) else None,
-    location=os.getenv('GEMINI_LOCATION', 'us-central1'),
-    model_name=os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
-)
+
+def _create_tenant_registry():
+    """Create the tenant registry when TENANTS_CONFIG / TENANTS_JSON is set"""
+    config = load_tenant_config()
+    if config is None:
+        return None
+    
+    return TenantRegistry.from_config(
+        config,
+        client_factory=lambda tenant: SheetsClient(
+            service_account_key_path=service_account_key if service_account_key and os.path.exists(service_account_key) else None,
+            spreadsheet_id=tenant.spreadsheet_id,
+            issue_sheet_name=tenant.issue_sheet_name,
+            schedule_sheet_name=tenant.schedule_sheet_name
+        )
+    )
+
+
+tenant_registry = _create_tenant_registry()
+
+# Per-thread /ask memory (None when CONVERSATION_BACKEND=none)
+conversation_memory = create_conversation_memory()
+
+# Responses of handled Chat events, replayed on redelivery (None when IDEMPOTENCY_BACKEND=none)
+idempotency_cache = create_idempotency_cache()
+
+
+def get_sheets_client(space_name: str = None) -> SheetsClient:
+    """
+    Get the Sheets client for a Chat space, creating it on first use
+    
+    In multi-project mode the space selects the tenant's pooled client;
+    otherwise the single SPREADSHEET_ID client is shared.
+    """
+    global sheets_client
+    if tenant_registry is not None:
+        tenant = tenant_registry.resolve(space_name)
+        if tenant is None:
+            raise LookupError(f"このスペース（{space_name}）に紐づくプロジェクトがありません")
+        return tenant_registry.get_sheets_client(tenant)
+    
+    if sheets_client is None:
+        sheets_client = SheetsClient(
+            service_account_key_path=service_account_key if service_account_key and os.path.exists(service_account_key) else None,
+            spreadsheet_id=os.getenv('SPREADSHEET_ID'),
+            issue_sheet_name=os.getenv('ISSUE_SHEET_NAME', 'Issues'),
+            schedule_sheet_name=os.getenv('SCHEDULE_SHEET_NAME', 'Schedule')
+        )
+    return sheets_client
+
+
+def get_gemini_client() -> GeminiClient:
+    """Get the shared Gemini client, creating it on first use"""
+    global gemini_client
+    if gemini_client is None:
+        gemini_client = GeminiClient(
+            project_id=os.getenv('GCP_PROJECT_ID'),
+            service_account_key_path=service_account_key if service_account_key and os.path.exists(service_account_key) else None,
+            location=os.getenv('GEMINI_LOCATION', 'us-central1'),
+            model_name=os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+        )
+    return gemini_client
+
+
+def set_clients(sheets: SheetsClient = None, gemini: GeminiClient = None):
+    """Replace the shared clients (used by benchmarks and load tests)"""
+    global sheets_client, gemini_client
+    if sheets is not None:
+        sheets_client = sheets
+    if gemini is not None:
+        gemini_client = gemini
+
+
+# Async mode: acknowledge immediately, post the result via Chat API later
+ASYNC_MODE = os.getenv('ASYNC_MODE', 'false').lower() == 'true'
+ASYNC_COMMANDS = ("/ask", "/risk-alert")
+ACK_TEXT = "分析中…"
+
+_chat_client = None
+_task_queue = None
 
 
 @functions_framework.http
@@ -48,6 +134,41 @@ def handle_chat_message(request: Request):
     Returns:
         JSON response for Google Chat
     """
+    # Opt-in cProfile capture (PROFILE_ENABLED / PROFILE_SAMPLE_RATE / X-PMO-Profile)
+    if profiling.should_profile(getattr(request, 'headers', None)):
+        with profiling.profile(getattr(request, 'path', '/').strip('/').replace('/', '-') or 'chat'):
+            return _route_request(request)
+    return _route_request(request)
+
+
+def _route_request(request: Request):
+    """Route a request by path"""
+    # Cloud Tasks delivers deferred work to the same function
+    path = getattr(request, 'path', '/').rstrip('/')
+    if path == '/tasks':
+        return handle_task(request)
+    
+    # Read-only JSON API for the docs dashboard
+    if path.startswith('/api/'):
+        return handle_api(request, path[len('/api/'):])
+    
+    # Cache prewarming: scheduler / min-instance pings and sheet-change notifications
+    if path == '/warmup':
+        return handle_warmup(request)
+    if path == '/notify':
+        return handle_sheet_change(request)
+    
+    # Nightly per-vendor batch analysis (Cloud Scheduler)
+    if path in ('/jobs/vendor-analysis', '/jobs/vendor-analysis/collect'):
+        return handle_vendor_batch(request, collect=path.endswith('/collect'))
+    
+    headers = getattr(request, 'headers', None) or {}
+    with tracing.trace("chat_message", trace_header=headers.get('X-Cloud-Trace-Context')):
+        return _dispatch_chat_message(request)
+
+
+def _dispatch_chat_message(request: Request):
+    """Parse the Chat event and route it (runs inside the request trace)"""
     # Parse request
     request_json = request.get_json(silent=True)
     
@@ -60,50 +181,119 @@ def handle_chat_message(request: Request):
     if not message_text:
         return {"text": "No message received"}
     
-    # Route commands
+    # Name an active profile after the command (never the message text)
+    profiling.tag(message_text.split()[0].lstrip('/') if message_text.startswith('/') else 'chat')
+    
+    # Google Chat redelivers slow events with the same message name
+    event_key = get_event_key(request_json)
+    if idempotency_cache is not None and event_key:
+        return idempotency_cache.run(event_key, lambda: _handle_event(message_text, request_json))
+    
+    return _handle_event(message_text, request_json)
+
+
+def _handle_event(message_text: str, request_json: dict):
+    """Run (or defer) the command of a new Chat event"""
+    if ASYNC_MODE and message_text.startswith(ASYNC_COMMANDS):
+        deferred = defer_command(message_text, request_json)
+        if deferred is not None:
+            return deferred
+    
+    return route_command(message_text, get_space_name(request_json), get_thread_name(request_json))
+
+
+def get_space_name(request_json: dict):
+    """Extract the Chat space resource name from an event (None if absent)"""
+    message = request_json.get("message", {})
+    return request_json.get("space", {}).get("name") or message.get("space", {}).get("name")
+
+
+def get_event_key(request_json: dict):
+    """Idempotency key of a Chat event: the message resource name (None if absent)"""
+    return request_json.get("message", {}).get("name")
+
+
+def get_thread_name(request_json: dict):
+    """Extract the Chat thread resource name from an event (None if absent)"""
+    return request_json.get("message", {}).get("thread", {}).get("name")
+
+
+def route_command(message_text: str, space_name: str = None, thread_name: str = None):
+    """Dispatch a chat command to its handler"""
+    tracing.current_trace().set(command=message_text.split(" ", 1)[0], space=space_name)
+    
     if message_text.startswith("/ask"):
-        return handle_ask_command(message_text)
+        return handle_ask_command(message_text, space_name, thread_name)
     
     elif message_text.startswith("/update-issue"):
-        return handle_update_issue_command(message_text)
+        return handle_update_issue_command(message_text, space_name)
     
     elif message_text.startswith("/risk-alert"):
-        return handle_risk_alert_command()
+        return handle_risk_alert_command(space_name)
+    
+    elif message_text.startswith("/vendor-report"):
+        return handle_vendor_report_command(message_text, space_name)
     
     else:
         return {
             "text": "使用可能なコマンド:\n"
                    "• `/ask [質問]` - Sheetsデータを参照して回答\n"
                    "• `/update-issue [内容]` - Issue Logに追記\n"
-                   "• `/risk-alert` - リスク検出"
+                   "• `/risk-alert` - リスク検出\n"
+                   "• `/vendor-report [ベンダー名]` - 夜間のベンダー別分析結果"
         }
 
 
-def handle_ask_command(message_text: str):
+def handle_ask_command(message_text: str, space_name: str = None, thread_name: str = None):
     """Handle /ask command"""
     query = message_text.replace("/ask", "").strip()
     
     if not query:
         return {"text": "質問を入力してください。例: `/ask 期限が近いタスクは？`"}
     
+    tenant = tenant_registry.resolve(space_name) if tenant_registry is not None else None
+    if tenant is not None and not tenant_registry.consume_quota(tenant):
+        return {"text": f"❌ エラー: プロジェクト「{tenant.tenant_id}」の本日のリクエスト上限（{tenant.daily_limit}件）に達しました"}
+    
     try:
-        # Get data from sheets
-        issues = sheets_client.get_all_issues()
-        tasks = sheets_client.get_all_schedule_tasks()
+        # Get data from sheets (shared snapshot, kept warm by /warmup and /notify)
+        sheets = get_sheets_client(space_name)
+        snapshot = snapshot_cache_for(sheets).get()
+        issues, tasks = snapshot.issues, snapshot.tasks
+        
+        # Questions about change over time also get the archived trends
+        archive = snapshot_archive_for(sheets) if wants_trends(query) else None
+        trends = trend_summary(archive) if archive is not None else None
+        
+        # Follow-ups in the same Chat thread reuse its conversation memory
+        key = thread_key(space_name, thread_name)
+        conversation = conversation_memory.load(key) if conversation_memory is not None and key else None
         
         # Query Gemini AI
-        result = gemini_client.analyze_with_context(
+        result = get_gemini_client().analyze_with_context(
             user_query=query,
             issues_data=issues,
-            schedule_data=tasks
+            schedule_data=tasks,
+            conversation=conversation,
+            trends=trends
         )
         
         # Check for errors
         if "error" in result:
+            if tenant is not None:
+                tenant_registry.refund_quota(tenant)
             return {"text": f"❌ エラー: {result['error']}"}
         
+        # Rule-based fallback answers do not count against the project quota
+        if result.get("degraded") and tenant is not None:
+            tenant_registry.refund_quota(tenant)
+        
+        if conversation is not None and not result.get("degraded"):
+            conversation_memory.save(conversation)
+        
         # Format response
-        response_text = f"""**📊 分析結果**
+        notice = "⚠️ AIが一時的に利用できないため、ルールベースの簡易分析を表示しています\n\n" if result.get("degraded") else ""
+        response_text = f"""{notice}**📊 分析結果**
 
 {result.get('analysis', 'N/A')}
 
@@ -122,10 +312,12 @@ _残りリクエスト: {result.get('remaining_requests', '?')}/250 (本日)_
         return {"text": response_text}
     
     except Exception as e:
+        if tenant is not None:
+            tenant_registry.refund_quota(tenant)
         return {"text": f"❌ システムエラー: {str(e)}"}
 
 
-def handle_update_issue_command(message_text: str):
+def handle_update_issue_command(message_text: str, space_name: str = None):
     """Handle /update-issue command"""
     # Parse command: /update-issue カテゴリ|内容|ベンダー名|担当者|優先度|期限
     parts = message_text.replace("/update-issue", "").strip().split("|")
@@ -140,7 +332,10 @@ def handle_update_issue_command(message_text: str):
     impact = parts[6] if len(parts) > 6 else ""
     
     try:
-        success = sheets_client.add_issue(
+        sheets = get_sheets_client(space_name)
+        duplicates = _find_duplicate_issues(sheets, content.strip())
+        
+        new_id = sheets.add_issue(
             category=category.strip(),
             content=content.strip(),
             vendor=vendor.strip(),
@@ -150,8 +345,19 @@ def handle_update_issue_command(message_text: str):
             impact=impact.strip()
         )
         
-        if success:
-            return {"text": f"✅ Issue Logに追加しました:\n{content}"}
+        if new_id is not None:
+            # The data API must not serve the pre-write snapshot
+            snapshot_cache_for(sheets).invalidate()
+            _index_new_issue(sheets, {'ID': new_id, '内容': content.strip(), 'ベンダー名': vendor.strip(),
+                                      '担当者': assignee.strip(), '優先度': priority.strip(),
+                                      '期限': deadline.strip(), 'ステータス': '新規'})
+            text = f"✅ Issue Logに追加しました:\n{content}"
+            if duplicates:
+                text += "\n\n⚠️ 重複の可能性がある既存課題:\n" + "\n".join(
+                    f"• #{issue.get('ID')} {issue.get('内容')}（{issue.get('ステータス', '')}、類似度 {score:.0%}）"
+                    for issue, score in duplicates
+                )
+            return {"text": text}
         else:
             return {"text": "❌ Issue追加に失敗しました"}
     
@@ -159,14 +365,36 @@ def handle_update_issue_command(message_text: str):
         return {"text": f"❌ エラー: {str(e)}"}
 
 
-def handle_risk_alert_command():
+def _index_new_issue(sheets: SheetsClient, issue: dict):
+    """Add the new issue to the duplicate index without re-syncing every row"""
+    try:
+        duplicate_checker_for(sheets).added(issue)
+    except Exception as e:
+        print(f"Duplicate index not updated: {e}")
+
+
+def _find_duplicate_issues(sheets: SheetsClient, content: str):
+    """Similar existing issues; the check never blocks adding the issue"""
+    try:
+        return duplicate_checker_for(sheets).find_duplicates(content)
+    except Exception as e:
+        print(f"Duplicate check skipped: {e}")
+        return []
+
+
+def handle_risk_alert_command(space_name: str = None):
     """Handle /risk-alert command"""
     try:
+        sheets = get_sheets_client(space_name)
+        
         # Get overdue issues
-        overdue = sheets_client.get_overdue_issues()
+        overdue = sheets.get_overdue_issues()
         
         # Get stalled tasks
-        stalled = sheets_client.get_stalled_tasks()
+        stalled = sheets.get_stalled_tasks()
+        
+        # Get tasks behind their planned end date
+        slipped = sheets.get_slipped_tasks()
         
         # Build alert message
         alerts = []
@@ -186,6 +414,13 @@ def handle_risk_alert_command():
                     f"• {task.get('タスク')} (担当: {task.get('担当者')})"
                 )
         
+        if slipped:
+            alerts.append(f"\n**⏰ 終了予定超過タスク: {len(slipped)}件**")
+            for task in slipped[:5]:
+                alerts.append(
+                    f"• {task.get('タスク')} ({task.get('遅延日数')}日遅延, 担当: {task.get('担当者')})"
+                )
+        
         if not alerts:
             return {"text": "✅ リスクは検出されませんでした"}
         
@@ -195,6 +430,307 @@ def handle_risk_alert_command():
         return {"text": f"❌ エラー: {str(e)}"}
 
 
+def handle_vendor_report_command(message_text: str, space_name: str = None):
+    """Handle /vendor-report command (stored nightly results; no AI call)"""
+    vendor = message_text.replace("/vendor-report", "").strip()
+    
+    try:
+        project = get_sheets_client(space_name).spreadsheet_id
+        finished_at, results = _get_batch_result_store().latest_results(project)
+        
+        if not results:
+            return {"text": "ベンダー別分析の結果はまだありません（夜間バッチの完了後に利用できます）"}
+        
+        if not vendor:
+            lines = [f"**🏢 ベンダー別分析（{finished_at}）**"]
+            for name, result in results.items():
+                lines.append(f"• {name}: {result.get('next_action', result.get('error', ''))}")
+            lines.append("\n詳細: `/vendor-report ベンダー名`")
+            return {"text": "\n".join(lines)}
+        
+        result = results.get(vendor)
+        if result is None:
+            return {"text": f"「{vendor}」の分析結果はありません。対象: {', '.join(results)}"}
+        if "error" in result:
+            return {"text": f"❌ 「{vendor}」の分析に失敗しました: {result['error']}"}
+        
+        return {"text": f"""**🏢 {vendor} 分析結果（{finished_at}）**
+
+{result.get('analysis', 'N/A')}
+
+**💡 推奨アクション**
+{result.get('recommendation', 'N/A')}
+
+**🎯 次の一手**
+{result.get('next_action', 'N/A')}"""}
+    
+    except Exception as e:
+        return {"text": f"❌ エラー: {str(e)}"}
+
+
+def _get_chat_client() -> ChatClient:
+    """Lazily create the Chat API client (only needed in async mode)"""
+    global _chat_client
+    if _chat_client is None:
+        _chat_client = ChatClient(
+            service_account_key_path=service_account_key if service_account_key and os.path.exists(service_account_key) else None
+        )
+    return _chat_client
+
+
+def _get_task_queue():
+    """Lazily create the background task queue"""
+    global _task_queue
+    if _task_queue is None:
+        _task_queue = create_task_queue(process_deferred_task)
+    return _task_queue
+
+
+def defer_command(message_text: str, request_json: dict):
+    """
+    Post an acknowledgement and run the command on the task queue
+    
+    Returns:
+        Empty response (the acknowledgement is already posted),
+        or None to fall back to synchronous handling
+    """
+    space_name = get_space_name(request_json)
+    thread_name = get_thread_name(request_json)
+    
+    # Requests without a Chat space (e.g. the web dashboard) stay synchronous
+    if not space_name:
+        return None
+    
+    try:
+        with tracing.span("chat.create_message"):
+            ack_name = _get_chat_client().create_message(space_name, ACK_TEXT, thread_name)
+        payload = {
+            "message_text": message_text,
+            "space_name": space_name,
+            "thread_name": thread_name,
+            "reply_message_name": ack_name
+        }
+        # A profiled request also profiles the work it defers
+        if profiling.is_profiling():
+            payload["profile"] = True
+        _get_task_queue().enqueue(payload)
+    except Exception as e:
+        print(f"Async dispatch failed, handling synchronously: {e}")
+        return None
+    
+    return {}
+
+
+def process_deferred_task(payload: dict):
+    """Run a deferred command and replace the acknowledgement with its result"""
+    if payload.get("profile"):
+        command = payload["message_text"].split()[0].lstrip('/')
+        with profiling.profile(f"deferred-{command}"):
+            _run_deferred_task(payload)
+    else:
+        _run_deferred_task(payload)
+
+
+def _run_deferred_task(payload: dict):
+    with tracing.trace("deferred_task"):
+        response = route_command(payload["message_text"], payload.get("space_name"),
+                                 payload.get("thread_name"))
+        with tracing.span("chat.update_message"):
+            _get_chat_client().update_message(payload["reply_message_name"], response.get("text", ""))
+
+
+def handle_task(request: Request):
+    """
+    HTTP handler for Cloud Tasks deliveries (routed from /tasks)
+    
+    Args:
+        request: Flask request object with the task payload as JSON body
+        
+    Returns:
+        Tuple of (body, status code)
+    """
+    # Fail closed: without a configured token anyone could run commands here
+    expected_token = os.getenv('TASK_AUTH_TOKEN')
+    if not expected_token or not hmac.compare_digest(request.headers.get('X-PMO-Task-Token', ''), expected_token):
+        return {"error": "Forbidden"}, 403
+    
+    payload = request.get_json(silent=True)
+    if not payload or "message_text" not in payload or "reply_message_name" not in payload:
+        return {"error": "Invalid task payload"}, 400
+    
+    # Only commands that are ever deferred; write commands never arrive here
+    if not str(payload["message_text"]).startswith(ASYNC_COMMANDS):
+        return {"error": "Command not allowed"}, 400
+    
+    def run():
+        process_deferred_task(payload)
+        return {"status": "done"}
+    
+    # Cloud Tasks retries deliveries too; the reply message identifies the task
+    if idempotency_cache is not None:
+        return idempotency_cache.run(f"task:{payload['reply_message_name']}", run), 200
+    return run(), 200
+
+
+def handle_api(request: Request, resource: str):
+    """
+    HTTP handler for the read-only data API (routed from /api/<resource>)
+    
+    Args:
+        request: Flask request object (?space= selects the project in multi-project mode)
+        resource: issues, schedule, risks or rollups
+        
+    Returns:
+        Tuple of (body, status code, headers)
+    """
+    # CORS preflight from the GitHub Pages dashboard
+    if request.method == 'OPTIONS':
+        return '', 204, cors_headers()
+    
+    # Fail closed: the API serves raw Issue Log and Schedule rows
+    expected_token = os.getenv('DATA_API_TOKEN')
+    if not expected_token or not hmac.compare_digest(request.headers.get('Authorization', ''),
+                                                     f"Bearer {expected_token}"):
+        return {"error": "Unauthorized"}, 401, cors_headers()
+    
+    space = request.args.get('space')
+    with tracing.trace("data_api", trace_header=request.headers.get('X-Cloud-Trace-Context')):
+        # A mistyped space must not return the default project's data
+        if tenant_registry is not None and space and tenant_registry.resolve(space, fallback=False) is None:
+            return {"error": f"Unknown space: {space}"}, 404, cors_headers()
+        try:
+            sheets = get_sheets_client(space)
+        except LookupError as e:
+            return {"error": str(e)}, 404, cors_headers()
+        return handle_data_request(resource, request.args, request.headers, snapshot_cache_for(sheets))
+
+
+def _all_sheets_clients(spreadsheet_id: str = None):
+    """SheetsClients serving a spreadsheet (every project when spreadsheet_id is None)"""
+    if tenant_registry is None:
+        sheets = get_sheets_client()
+        return [sheets] if spreadsheet_id in (None, sheets.spreadsheet_id) else []
+    
+    # The pool keeps at most max_clients; warm the first ones
+    tenants = [t for t in tenant_registry.tenants.values()
+               if spreadsheet_id in (None, t.spreadsheet_id)][:tenant_registry.max_clients]
+    return [tenant_registry.get_sheets_client(t) for t in tenants]
+
+
+def _token_matches(provided: str, expected: str) -> bool:
+    """Shared-secret check that fails closed when the secret is not configured"""
+    return bool(expected) and hmac.compare_digest(provided or '', expected)
+
+
+def handle_warmup(request: Request):
+    """
+    HTTP handler for warm-up pings (routed from /warmup)
+    
+    Creates both clients and fills the snapshot, reports and duplicate index,
+    so the first interactive request after a cold start finds warm caches.
+    Point Cloud Scheduler (or the min-instances startup probe) here.
+    
+    Returns:
+        Tuple of (body, status code)
+    """
+    if not _token_matches(request.headers.get('X-PMO-Notify-Token'), os.getenv('NOTIFY_TOKEN')):
+        return {"error": "Forbidden"}, 403
+    
+    with tracing.trace("warmup", trace_header=request.headers.get('X-Cloud-Trace-Context')):
+        with tracing.span("warmup.gemini"):
+            get_gemini_client().warm_up()
+        projects = [prewarm_sheets(sheets) for sheets in _all_sheets_clients()]
+    
+    return {"status": "warm", "projects": projects}, 200
+
+
+def handle_sheet_change(request: Request):
+    """
+    HTTP handler for sheet-change notifications (routed from /notify)
+    
+    Accepts an Apps Script onEdit POST or a Drive push notification and
+    refreshes the changed spreadsheet's caches before answering.
+    
+    Returns:
+        Tuple of (body, status code)
+    """
+    # Drive echoes the channel token it was registered with
+    token = request.headers.get('X-PMO-Notify-Token') or request.headers.get('X-Goog-Channel-Token')
+    if not _token_matches(token, os.getenv('NOTIFY_TOKEN')):
+        return {"error": "Forbidden"}, 403
+    
+    change = parse_change_notification(request.headers, request.get_json(silent=True))
+    if change is None:
+        return {"status": "ignored"}, 200
+    
+    spreadsheet_id, sheet, header_changed = change
+    with tracing.trace("sheet_change", trace_header=request.headers.get('X-Cloud-Trace-Context')):
+        # Refresh now: Cloud Functions throttles CPU once the response is sent
+        projects = [prewarm_sheets(sheets, changed=True, changed_sheet=sheet, header_changed=header_changed)
+                    for sheets in _all_sheets_clients(spreadsheet_id)]
+    
+    if not projects:
+        return {"error": f"Unknown spreadsheet: {spreadsheet_id}"}, 404
+    return {"status": "refreshed", "projects": projects}, 200
+
+
+_batch_result_store = None
+_vendor_batch_job = None
+
+
+def _get_batch_result_store():
+    """Shared store of nightly results (/vendor-report reads it without a batch backend)"""
+    global _batch_result_store
+    if _batch_result_store is None:
+        _batch_result_store = create_batch_result_store()
+    return _batch_result_store
+
+
+def _get_vendor_batch_job():
+    global _vendor_batch_job
+    if _vendor_batch_job is None:
+        _vendor_batch_job = create_vendor_batch_job(get_gemini_client(), _get_batch_result_store())
+    return _vendor_batch_job
+
+
+def handle_vendor_batch(request: Request, collect: bool = False):
+    """
+    HTTP handler for the nightly vendor analysis (routed from /jobs/vendor-analysis)
+    
+    /jobs/vendor-analysis submits one batch job per project from the current
+    snapshot; /jobs/vendor-analysis/collect stores the results of finished
+    jobs. Schedule the submit nightly and the collect every few minutes.
+    
+    Returns:
+        Tuple of (body, status code)
+    """
+    # Fail closed: the submit starts paid Vertex AI batch jobs
+    if not _token_matches(request.headers.get('X-PMO-Task-Token'), os.getenv('TASK_AUTH_TOKEN')):
+        return {"error": "Forbidden"}, 403
+    
+    try:
+        job = _get_vendor_batch_job()
+    except ValueError as e:
+        # e.g. BATCH_BACKEND=vertex without BATCH_GCS_PREFIX
+        return {"error": f"Vendor batch is not configured: {e}"}, 500
+    gemini = get_gemini_client()
+    
+    with tracing.trace("vendor_batch", trace_header=request.headers.get('X-Cloud-Trace-Context')):
+        if collect:
+            return {"runs": job.collect(gemini)}, 200
+        
+        runs = []
+        for sheets in _all_sheets_clients():
+            snapshot = snapshot_cache_for(sheets).get(max_age=0)
+            runs.append(job.submit(sheets.spreadsheet_id, snapshot, gemini))
+            # The nightly run also guarantees one history capture per day
+            archive = snapshot_archive_for(sheets)
+            if archive is not None:
+                archive.archive(snapshot)
+    
+    return {"runs": runs}, 200
+
+
 if __name__ == "__main__":
     # Local testing
     print("myPMO Agent - Local Test Mode")
@@ -0,0 +1,86 @@
+"""
+Google Chat API Client for myPMO Agent
+Posts and updates bot messages outside the webhook response
+"""
+
+import os
+from typing import Optional
+from googleapiclient.errors import HttpError
+
+from tools.credentials import get_credentials
+from tools.transport import build_service
+
+
+class ChatClient:
+    """Google Chat API wrapper for asynchronous replies"""
+
+    def __init__(self, service_account_key_path: Optional[str] = None):
+        """
+        Initialize Chat API client
+
+        Args:
+            service_account_key_path: Path to service account JSON key (optional, uses default credentials if None)
+        """
+        credentials = get_credentials(service_account_key_path)
+        self.service = build_service('chat', 'v1', credentials)
+
+    def create_message(self, space_name: str, text: str,
+                       thread_name: Optional[str] = None) -> str:
+        """
+        Post a new message to a space
+
+        Args:
+            space_name: Space resource name (e.g., "spaces/AAAA")
+            text: Message text
+            thread_name: Thread resource name to reply in (optional)
+
+        Returns:
+            Resource name of the created message
+        """
+        body = {'text': text}
+        kwargs = {}
+
+        if thread_name:
+            body['thread'] = {'name': thread_name}
+            kwargs['messageReplyOption'] = 'REPLY_MESSAGE_FALLBACK_TO_NEW_THREAD'
+
+        try:
+            message = self.service.spaces().messages().create(
+                parent=space_name, body=body, **kwargs
+            ).execute()
+            return message['name']
+
+        except HttpError as error:
+            print(f"Error creating message in {space_name}: {error}")
+            raise
+
+    def update_message(self, message_name: str, text: str) -> bool:
+        """
+        Replace the text of an existing message
+
+        Args:
+            message_name: Message resource name (e.g., "spaces/AAAA/messages/BBBB")
+            text: New message text
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            self.service.spaces().messages().patch(
+                name=message_name,
+                updateMask='text',
+                body={'text': text}
+            ).execute()
+            return True
+
+        except HttpError as error:
+            print(f"Error updating message {message_name}: {error}")
+            return False
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    client = ChatClient(service_account_key_path=os.getenv('SERVICE_ACCOUNT_KEY_PATH'))
+    print("✓ Chat API client initialized")
@@ -0,0 +1,136 @@
+"""
+Shared Credentials Provider for myPMO Agent
+Loads Google credentials once per process and keeps the access token fresh
+in the background so requests never wait on an OAuth refresh
+"""
+
+import os
+import threading
+import datetime
+from typing import Dict, Optional
+
+import google.auth
+from google.auth.transport.requests import Request as AuthRequest
+from google.oauth2 import service_account
+
+
+# One token covers every API the agent talks to
+SCOPES = [
+    'https://www.googleapis.com/auth/cloud-platform',
+    'https://www.googleapis.com/auth/spreadsheets',
+    'https://www.googleapis.com/auth/chat.bot'
+]
+
+# Refresh this long before expiry (must exceed google-auth's 3m45s threshold,
+# otherwise before_request would refresh synchronously first)
+REFRESH_MARGIN = datetime.timedelta(seconds=int(os.getenv('TOKEN_REFRESH_MARGIN', '600')))
+RETRY_INTERVAL = 10.0
+
+
+class CredentialsProvider:
+    """Process-wide credentials with proactive background token refresh"""
+
+    def __init__(self, service_account_key_path: Optional[str] = None,
+                 refresh_margin: datetime.timedelta = REFRESH_MARGIN):
+        """
+        Args:
+            service_account_key_path: Path to service account JSON key (optional, uses default credentials if None)
+            refresh_margin: How long before expiry to refresh the token
+        """
+        self.service_account_key_path = service_account_key_path
+        self.refresh_margin = refresh_margin
+        self.project_id = None
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    def _load(self):
+        if self.service_account_key_path:
+            credentials = service_account.Credentials.from_service_account_file(
+                self.service_account_key_path, scopes=SCOPES
+            )
+            self.project_id = credentials.project_id
+        else:
+            # Use default credentials (for Cloud Functions)
+            credentials, self.project_id = google.auth.default(scopes=SCOPES)
+        return credentials
+
+    def get(self):
+        """
+        Get the shared credentials, loading and refreshing them on first use
+
+        Returns:
+            google.auth credentials with a valid token
+        """
+        if self._credentials is not None:
+            return self._credentials
+
+        with self._lock:
+            if self._credentials is None:
+                credentials = self._load()
+                self._refresh(credentials)
+                self._credentials = credentials
+                self._start_refresher()
+
+        return self._credentials
+
+    def _refresh(self, credentials):
+        credentials.refresh(AuthRequest())
+
+    def seconds_until_refresh(self) -> float:
+        """Seconds until the token should be refreshed (0 if due now)"""
+        expiry = getattr(self._credentials, 'expiry', None)
+        if expiry is None:
+            return RETRY_INTERVAL
+
+        # google-auth stores expiry as naive UTC
+        now = datetime.datetime.utcnow()
+        return max(0.0, (expiry - self.refresh_margin - now).total_seconds())
+
+    def _start_refresher(self):
+        self._refresher = threading.Thread(
+            target=self._refresh_loop, name="pmo-token-refresher", daemon=True
+        )
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.seconds_until_refresh()):
+            try:
+                self._refresh(self._credentials)
+            except Exception as e:
+                print(f"Background token refresh failed: {e}")
+                if self._stop.wait(RETRY_INTERVAL):
+                    return
+
+    def stop(self):
+        """Stop the background refresher"""
+        self._stop.set()
+
+
+_providers: Dict[Optional[str], CredentialsProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(service_account_key_path: Optional[str] = None) -> CredentialsProvider:
+    """Get the shared provider for a key file (None = default credentials)"""
+    provider = _providers.get(service_account_key_path)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.setdefault(
+                service_account_key_path, CredentialsProvider(service_account_key_path)
+            )
+    return provider
+
+
+def get_credentials(service_account_key_path: Optional[str] = None):
+    """
+    Get process-wide credentials shared by Sheets, Vertex AI and Chat clients
+
+    Args:
+        service_account_key_path: Path to service account JSON key (optional, uses default credentials if None)
+
+    Returns:
+        google.auth credentials kept fresh in the background
+    """
+    return get_provider(service_account_key_path).get()
@@ -0,0 +1,151 @@
+"""
+Read-only JSON Data API for myPMO Agent
+Serves snapshot data to the dashboard with strong ETags, If-None-Match (304),
+pagination and field selection
+
+    GET /api/issues?page=1&page_size=100&fields=ID,内容,期限
+    GET /api/schedule
+    GET /api/risks
+    GET /api/rollups
+"""
+
+import os
+import json
+from datetime import date
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from tools.snapshot import Snapshot, rollups, risk_report
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# The dashboard origin allowed to call the API (no CORS headers when unset)
+CORS_ORIGIN = os.getenv('DATA_API_CORS_ORIGIN', '')
+
+RESOURCES = ('issues', 'schedule', 'risks', 'rollups')
+
+Response = Tuple[Any, int, Dict[str, str]]
+
+
+def cors_headers() -> Dict[str, str]:
+    """Headers that let the GitHub Pages dashboard call the API and read its ETag"""
+    if not CORS_ORIGIN:
+        return {}
+    return {
+        'Access-Control-Allow-Origin': CORS_ORIGIN,
+        'Access-Control-Allow-Methods': 'GET, OPTIONS',
+        'Access-Control-Allow-Headers': 'Authorization, If-None-Match',
+        'Access-Control-Expose-Headers': 'ETag'
+    }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return etag in (t[2:] if t.startswith('W/') else t for t in tags)
+
+
+def _error(message: str, status: int) -> Response:
+    return {'error': message}, status, cors_headers()
+
+
+def _int_arg(args: Mapping[str, str], name: str, default: int) -> int:
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    number = int(value)
+    if number < 1:
+        raise ValueError(f"{name} must be >= 1")
+    return number
+
+
+def _project(records: List[Dict[str, Any]], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    if not fields:
+        return records
+    return [{f: r.get(f, '') for f in fields} for r in records]
+
+
+def _page(records: List[Dict[str, Any]], args: Mapping[str, str]) -> Dict[str, Any]:
+    page = _int_arg(args, 'page', 1)
+    page_size = min(_int_arg(args, 'page_size', DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+    fields = [f for f in (args.get('fields') or '').split(',') if f] or None
+
+    start = (page - 1) * page_size
+    return {
+        'total': len(records),
+        'page': page,
+        'page_size': page_size,
+        'has_next': start + page_size < len(records),
+        'items': _project(records[start:start + page_size], fields)
+    }
+
+
+def build_resource(resource: str, snapshot: Snapshot, args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Build the JSON body of a resource
+
+    issues/schedule are paged lists; risks pages each risk list (fields apply
+    to their items); rollups is a single object.
+    """
+    if resource == 'issues':
+        return _page(snapshot.issues, args)
+
+    if resource == 'schedule':
+        return _page(snapshot.tasks, args)
+
+    if resource == 'risks':
+        risks = snapshot.derived('risks', risk_report)
+        return {name: _page(items, args) for name, items in risks.items()}
+
+    return snapshot.derived('rollups', rollups)
+
+
+def resource_etag(resource: str, snapshot: Snapshot) -> str:
+    """
+    Strong ETag of a resource
+
+    Records depend only on the snapshot; risks and rollups also depend on
+    today's date (overdue/due soon), so the date is part of their tag.
+    """
+    if resource in ('risks', 'rollups'):
+        return f'"{snapshot.version}.{date.today():%Y%m%d}"'
+    return snapshot.etag
+
+
+def handle_data_request(resource: str, args: Mapping[str, str], headers: Mapping[str, str],
+                        snapshot_cache) -> Response:
+    """
+    Serve one data API request
+
+    Args:
+        resource: Path segment after /api/ (issues, schedule, risks, rollups)
+        args: Query parameters (page, page_size, fields)
+        headers: Request headers (If-None-Match)
+        snapshot_cache: SnapshotCache of the project's SheetsClient
+
+    Returns:
+        Tuple of (body, status code, headers)
+    """
+    if resource not in RESOURCES:
+        return _error(f"Unknown resource '{resource}'. Use one of: {', '.join(RESOURCES)}", 404)
+
+    snapshot = snapshot_cache.get()
+    etag = resource_etag(resource, snapshot)
+    response_headers = {**cors_headers(), 'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    # Unchanged since the client's copy: no body, no serialization
+    if etag_matches(headers.get('If-None-Match'), etag):
+        return '', 304, response_headers
+
+    try:
+        body = build_resource(resource, snapshot, args)
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    body = {'resource': resource, 'version': snapshot.version, 'taken_at': snapshot.taken_at, **body}
+    response_headers['Content-Type'] = 'application/json; charset=utf-8'
+    return json.dumps(body, ensure_ascii=False, default=str), 200, response_headers
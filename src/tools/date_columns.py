@@ -0,0 +1,182 @@
+"""
+Vectorized Date Columns for myPMO Agent
+Parses whole sheet columns into NumPy datetime64 arrays once and answers
+deadline questions (overdue, due soon, slip days) with array operations
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+NAT = np.datetime64('NaT', 'D')
+
+# Google Sheets serial dates count days from 1899-12-30
+SHEETS_EPOCH = date(1899, 12, 30)
+
+# 2025-12-15, 2025/12/15, 2025.12.15, 2025年12月15日 (optionally followed by a time)
+_DATE_PATTERN = re.compile(r'^\s*(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})')
+
+# Cells NumPy may convert itself: NumPy also accepts '2025-12', '2025' and
+# 'today', which the tolerant parser rejects, so only exact dates qualify
+_ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def parse_date(value: Any) -> np.datetime64:
+    """
+    Parse one cell value tolerantly
+
+    Accepts ISO and slash/dot/kanji separated dates, datetimes (time is
+    dropped) and Sheets serial numbers. Anything else becomes NaT.
+    """
+    if isinstance(value, bool) or value is None:
+        return NAT
+
+    if isinstance(value, (int, float)):
+        return np.datetime64(SHEETS_EPOCH + timedelta(days=int(value)), 'D')
+
+    match = _DATE_PATTERN.match(str(value))
+    if not match:
+        return NAT
+
+    year, month, day = (int(g) for g in match.groups())
+    try:
+        return np.datetime64(date(year, month, day), 'D')
+    except ValueError:
+        return NAT
+
+
+def parse_date_column(values: List[Any], memo: Optional[Dict[Any, np.datetime64]] = None) -> np.ndarray:
+    """
+    Parse a column of cell values into a datetime64[D] array
+
+    Fast path: a column of exact YYYY-MM-DD strings (blanks allowed) is
+    converted by NumPy in one call. Otherwise each distinct value is parsed once and looked up.
+
+    Args:
+        values: Cell values of one column
+        memo: Distinct value -> parsed date cache to reuse across reads (optional)
+
+    Returns:
+        datetime64[D] array with NaT for blank or unparseable cells
+    """
+    if not values:
+        return np.array([], dtype='datetime64[D]')
+
+    if all(type(v) is str and (v == '' or _ISO_DATE.fullmatch(v)) for v in values):
+        try:
+            return np.array(values, dtype='datetime64[D]')
+        except (ValueError, TypeError):
+            pass
+
+    memo = memo if memo is not None else {}
+    parsed = np.empty(len(values), dtype='datetime64[D]')
+    for i, value in enumerate(values):
+        key = (type(value), value)
+        result = memo.get(key)
+        if result is None:
+            result = memo[key] = parse_date(value)
+        parsed[i] = result
+    return parsed
+
+
+def to_day(today: Optional[date] = None) -> np.datetime64:
+    """Today (or the given date) as datetime64[D]"""
+    return np.datetime64(today or date.today(), 'D')
+
+
+def overdue_mask(dates: np.ndarray, today: Optional[date] = None) -> np.ndarray:
+    """True where the date is before today (NaT is never overdue)"""
+    return dates < to_day(today)
+
+
+def due_within_mask(dates: np.ndarray, days: int, today: Optional[date] = None) -> np.ndarray:
+    """True where the date falls between today and today + days (inclusive)"""
+    start = to_day(today)
+    return (dates >= start) & (dates <= start + np.timedelta64(days, 'D'))
+
+
+def slip_days(dates: np.ndarray, today: Optional[date] = None) -> np.ndarray:
+    """Days each date lies behind today (0 for future, today and NaT)"""
+    delta = (to_day(today) - dates).astype('timedelta64[D]').astype('int64')
+    return np.where(np.isnat(dates) | (delta < 0), 0, delta)
+
+
+class DateColumnEngine:
+    """
+    Per-column parse cache over record lists
+
+    A column is parsed once per records list (the list returned by a sheet
+    read), so several predicates over the same read share one parse. Distinct
+    value memos per field survive across reads, so non-ISO dates are only
+    parsed the first time they are seen.
+    """
+
+    def __init__(self, max_columns: int = 16, max_memo: int = 50000):
+        """
+        Args:
+            max_columns: Parsed columns kept (least recently used are dropped)
+            max_memo: Distinct values remembered per field before the memo is reset
+        """
+        self.max_columns = max_columns
+        self.max_memo = max_memo
+        self._columns: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._memos: Dict[str, Dict[Any, np.datetime64]] = {}
+        self._lock = threading.Lock()
+
+    def column(self, records: List[Dict[str, Any]], field: str) -> np.ndarray:
+        """
+        Get the parsed datetime64[D] array of a field
+
+        Args:
+            records: Rows as returned by SheetsClient
+            field: Date column header (e.g. 期限, 終了予定)
+        """
+        key = (id(records), len(records), field)
+        with self._lock:
+            entry = self._columns.get(key)
+            # id() can be reused once a list is freed, so compare identity too
+            if entry is not None and entry[0] is records:
+                self._columns.move_to_end(key)
+                return entry[1]
+
+            memo = self._memos.setdefault(field, {})
+            if len(memo) > self.max_memo:
+                memo.clear()
+
+        parsed = parse_date_column([r.get(field, '') for r in records], memo)
+
+        with self._lock:
+            self._columns[key] = (records, parsed)
+            while len(self._columns) > self.max_columns:
+                self._columns.popitem(last=False)
+        return parsed
+
+    def overdue(self, records, field: str, today: Optional[date] = None) -> np.ndarray:
+        return overdue_mask(self.column(records, field), today)
+
+    def due_within(self, records, field: str, days: int, today: Optional[date] = None) -> np.ndarray:
+        return due_within_mask(self.column(records, field), days, today)
+
+    def slip_days(self, records, field: str, today: Optional[date] = None) -> np.ndarray:
+        return slip_days(self.column(records, field), today)
+
+    def clear(self):
+        """Drop all cached columns and memos"""
+        with self._lock:
+            self._columns.clear()
+            self._memos.clear()
+
+
+def select(records: List[Dict[str, Any]], mask: np.ndarray) -> List[Dict[str, Any]]:
+    """Records where mask is True, in sheet order"""
+    return [records[i] for i in np.flatnonzero(mask)]
+
+
+def field_mask(records: List[Dict[str, Any]], field: str, excluded: Any) -> np.ndarray:
+    """True where record[field] differs from excluded (e.g. status != 完了)"""
+    return np.fromiter((r.get(field) != excluded for r in records), dtype=bool, count=len(records))
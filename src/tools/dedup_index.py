@@ -0,0 +1,360 @@
+"""
+Near-Duplicate Issue Index for myPMO Agent
+MinHash-LSH over character shingles of Issue Log 内容, so a new issue can be
+checked against every existing one without comparing them one by one
+"""
+
+import os
+import re
+import atexit
+import zlib
+import threading
+import unicodedata
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from tools import tracing
+from tools.snapshot import snapshot_cache_for
+
+
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.5'))
+DEDUP_INDEX_DIR = os.getenv('DEDUP_INDEX_DIR', '')
+
+# Bigrams: Japanese has no word boundaries and short reports share few trigrams
+SHINGLE_SIZE = 2
+NUM_PERM = 128
+BANDS = 32
+# Mersenne prime for the universal hashes; (a * x + b) stays below 2**64
+_PRIME = np.uint64((1 << 31) - 1)
+_SEED = 20251201
+
+_NOISE = re.compile(r'[\s\W_]+', re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    """NFKC, lower case, drop whitespace and punctuation (全角/半角 and spacing differences vanish)"""
+    return _NOISE.sub('', unicodedata.normalize('NFKC', str(text or '')).lower())
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Character n-grams of the normalized text (the whole text if shorter)"""
+    text = normalize(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: str, b: str) -> float:
+    """Exact Jaccard similarity of two texts' shingle sets"""
+    sa, sb = shingles(a), shingles(b)
+    if not sa or not sb:
+        return 0.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def content_digest(text: str) -> int:
+    """Cheap change detector for a row's content"""
+    return zlib.crc32(normalize(text).encode('utf-8'))
+
+
+class MinHasher:
+    """Fixed hash family; signatures stay comparable across processes and saves"""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = _SEED):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.seed = seed
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of a text (None when it has no shingles)"""
+        grams = shingles(text)
+        if not grams:
+            return None
+        x = np.fromiter((zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams))
+        x %= _PRIME
+        # (num_perm, n_shingles) hash matrix, min over shingles
+        return ((np.outer(self._a, x) + self._b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+class DuplicateIndex:
+    """
+    MinHash-LSH index of issue contents keyed by issue ID
+
+    Signatures are split into bands; issues sharing any band bucket become
+    candidates, and candidates are ranked by signature agreement (an estimate
+    of Jaccard similarity). A lookup touches only the matching buckets.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = NUM_PERM, bands: int = BANDS,
+                 path: Optional[str] = None):
+        """
+        Args:
+            threshold: Minimum estimated similarity reported as a duplicate
+            num_perm: Signature length
+            bands: LSH bands (num_perm must be divisible by it)
+            path: .npz file to persist the index to (None = memory only)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.path = path
+        self.hasher = MinHasher(num_perm)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.digests: Dict[str, int] = {}
+        self._buckets: List[Dict[bytes, set]] = [{} for _ in range(bands)]
+        self._lock = threading.RLock()
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _insert(self, key: str, signature: np.ndarray, digest: int):
+        self.signatures[key] = signature
+        self.digests[key] = digest
+        for band, bucket_key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(bucket_key, set()).add(key)
+
+    def add(self, key: str, text: str):
+        """Index (or re-index) one issue"""
+        with self._lock:
+            self.remove(key)
+            signature = self.hasher.signature(text)
+            if signature is not None:
+                self._insert(key, signature, content_digest(text))
+            else:
+                # Nothing to compare (blank 内容), but remember it was seen
+                self.digests[key] = content_digest(text)
+            self.dirty = True
+
+    def remove(self, key: str):
+        with self._lock:
+            signature = self.signatures.pop(key, None)
+            self.digests.pop(key, None)
+            if signature is None:
+                return
+            for band, bucket_key in zip(self._buckets, self._band_keys(signature)):
+                members = band.get(bucket_key)
+                if members is not None:
+                    members.discard(key)
+                    if not members:
+                        del band[bucket_key]
+            self.dirty = True
+
+    def query(self, text: str, threshold: Optional[float] = None, limit: int = 5) -> List[Tuple[str, float]]:
+        """
+        Find indexed issues similar to a text
+
+        Returns:
+            List of (issue ID, estimated similarity), most similar first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        signature = self.hasher.signature(text)
+        if signature is None:
+            return []
+
+        with self._lock:
+            candidates = set()
+            for band, bucket_key in zip(self._buckets, self._band_keys(signature)):
+                candidates |= band.get(bucket_key, set())
+            scored = [(key, float(np.mean(self.signatures[key] == signature))) for key in candidates]
+
+        matches = sorted((m for m in scored if m[1] >= threshold), key=lambda m: -m[1])
+        return matches[:limit]
+
+    def sync(self, issues: Iterable[Dict[str, Any]], key_field: str = 'ID', text_field: str = '内容') -> int:
+        """
+        Bring the index in line with the Issue Log
+
+        Only new or edited rows are re-hashed; rows that disappeared are dropped.
+
+        Returns:
+            Number of rows (re)indexed
+        """
+        with self._lock:
+            seen = set()
+            changed = 0
+            for issue in issues:
+                key = str(issue.get(key_field, ''))
+                if not key:
+                    continue
+                seen.add(key)
+                text = issue.get(text_field, '')
+                if self.digests.get(key) != content_digest(text):
+                    self.add(key, text)
+                    changed += 1
+            for key in [k for k in self.digests if k not in seen]:
+                self.remove(key)
+            return changed
+
+    def check_many(self, texts: List[str], threshold: Optional[float] = None) -> List[List[Tuple[str, float]]]:
+        """
+        Bulk ingest check: each text against the index and the texts before it
+
+        Earlier texts of the batch are reported as '#<position>' (1-based).
+        The index itself is left unchanged.
+        """
+        pending = DuplicateIndex(self.threshold, self.hasher.num_perm, self.bands)
+        results = []
+        for position, text in enumerate(texts, 1):
+            matches = self.query(text, threshold) + pending.query(text, threshold)
+            results.append(sorted(matches, key=lambda m: -m[1]))
+            pending.add(f"#{position}", text)
+        return results
+
+    def save(self, path: Optional[str] = None):
+        """Write signatures to an .npz file (buckets are rebuilt on load)"""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            keys = list(self.signatures)
+            matrix = (np.stack([self.signatures[k] for k in keys]) if keys
+                      else np.zeros((0, self.hasher.num_perm), dtype=np.uint32))
+            digests = np.array([self.digests[k] for k in keys], dtype=np.uint32)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez_compressed(tmp_path, keys=np.array(keys, dtype=str), signatures=matrix, digests=digests,
+                                params=np.array([self.hasher.num_perm, self.hasher.seed, self.bands, SHINGLE_SIZE]))
+            os.replace(tmp_path, path)
+            self.dirty = False
+
+    @classmethod
+    def load(cls, path: str, threshold: float = DEDUP_THRESHOLD) -> "DuplicateIndex":
+        """
+        Load a saved index, or start an empty one if the file is missing or
+        was written with different hashing parameters
+        """
+        index = cls(threshold=threshold, path=path)
+        if not os.path.exists(path):
+            return index
+
+        try:
+            with np.load(path) as data:
+                if list(data['params']) != [index.hasher.num_perm, index.hasher.seed, index.bands, SHINGLE_SIZE]:
+                    return index
+                for key, signature, digest in zip(data['keys'], data['signatures'], data['digests']):
+                    index._insert(str(key), signature, int(digest))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable duplicate index {path}: {e}")
+            return cls(threshold=threshold, path=path)
+
+        return index
+
+
+class IssueDuplicateChecker:
+    """
+    DuplicateIndex kept in sync with one SheetsClient's Issue Log
+
+    The index follows the shared snapshot instead of reading the sheets
+    itself: it is synced when another path (warm-up, /notify, /ask, data API)
+    has read a new snapshot version. Issues added through this process are
+    indexed one by one in memory (added()), and the index file is written at
+    the next sync or at exit, never on the insert path.
+    """
+
+    def __init__(self, sheets_client, index: DuplicateIndex):
+        self.sheets_client = sheets_client
+        self.index = index
+        self._synced_version: Optional[str] = None
+        # Issues indexed by added() since the last full sync, by ID
+        self._added: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False):
+        """
+        Sync the index with the latest snapshot already read (reads the sheets only before the first one)
+
+        Args:
+            force: Use a fresh snapshot (the sheet was edited outside this process)
+        """
+        cache = snapshot_cache_for(self.sheets_client)
+        snapshot = None if force else cache.peek()
+        if snapshot is None:
+            snapshot = cache.get()
+        if snapshot.version == self._synced_version:
+            return
+        with self._lock:
+            with tracing.span("dedup.sync"):
+                self.index.sync(snapshot.issues)
+            self._synced_version = snapshot.version
+            self._added.clear()
+        self.flush()
+
+    def added(self, issue: Dict[str, Any]):
+        """Index an issue just appended to the Issue Log (record with at least ID and 内容; memory only)"""
+        key = str(issue.get('ID', ''))
+        if not key:
+            return
+        with self._lock:
+            self.index.add(key, issue.get('内容', ''))
+            self._added[key] = issue
+
+    def flush(self):
+        """Write the index file if it changed since the last save"""
+        if self.index.path and self.index.dirty:
+            with tracing.span("dedup.save"):
+                self.index.save()
+
+    def find_duplicates(self, content: str) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Existing issues similar to a new issue's 内容
+
+        Returns:
+            List of (issue record, estimated similarity), most similar first
+        """
+        self.refresh()
+        with tracing.span("dedup.query"):
+            matches = self.index.query(content)
+        # The synced snapshot, even if a write has invalidated it since
+        snapshot = snapshot_cache_for(self.sheets_client).peek()
+        issues = snapshot.derived(
+            'issues_by_id', lambda snapshot: {str(i.get('ID', '')): i for i in snapshot.issues})
+        with self._lock:
+            issues = {**issues, **self._added} if self._added else issues
+        return [(issues[key], score) for key, score in matches if key in issues]
+
+    def check_many(self, contents: List[str]) -> List[List[Tuple[str, float]]]:
+        """Bulk ingest variant of find_duplicates (also compares the batch with itself)"""
+        self.refresh()
+        return self.index.check_many(contents)
+
+
+_checkers: "weakref.WeakKeyDictionary[Any, IssueDuplicateChecker]" = weakref.WeakKeyDictionary()
+_checkers_lock = threading.Lock()
+
+
+@atexit.register
+def _flush_checkers():
+    """Persist indexes changed by inserts since their last sync"""
+    for checker in list(_checkers.values()):
+        try:
+            checker.flush()
+        except Exception as e:
+            print(f"Duplicate index not saved: {e}")
+
+
+def duplicate_checker_for(sheets_client) -> IssueDuplicateChecker:
+    """
+    Get the duplicate checker of a SheetsClient (one per client)
+
+    With DEDUP_INDEX_DIR set, the index is persisted per spreadsheet there and
+    reloaded on cold start, so only rows added since are hashed again.
+    """
+    with _checkers_lock:
+        checker = _checkers.get(sheets_client)
+        if checker is None:
+            path = None
+            if DEDUP_INDEX_DIR:
+                spreadsheet_id = getattr(sheets_client, 'spreadsheet_id', None) or 'default'
+                path = os.path.join(DEDUP_INDEX_DIR, f"dedup_{spreadsheet_id}.npz")
+            index = DuplicateIndex.load(path) if path else DuplicateIndex()
+            checker = _checkers[sheets_client] = IssueDuplicateChecker(sheets_client, index)
+        return checker
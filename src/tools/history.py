@@ -0,0 +1,251 @@
+"""
+Snapshot History for myPMO Agent
+Archives Issues/Schedule snapshots as zstd-compressed Arrow (Feather v2)
+files, skipping sheets that did not change since the previous capture
+
+HISTORY_DIR is a local directory. On Cloud Functions it is per-instance and
+lost on scale-down, so set HISTORY_GCS_PREFIX to keep the archive in Cloud
+Storage; the local directory then only caches files read from the bucket.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tools import tracing
+from tools.date_columns import parse_date_column
+from tools.sheets_client import DATE_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # optional: only needed when history is enabled
+    pa = None
+    feather = None
+
+
+HISTORY_DIR = os.getenv('HISTORY_DIR', '')
+HISTORY_GCS_PREFIX = os.getenv('HISTORY_GCS_PREFIX', '')
+
+SHEETS = ('issues', 'tasks')
+
+
+def records_to_table(records: List[Dict[str, Any]]) -> "pa.Table":
+    """
+    Convert sheet records to an Arrow table
+
+    Date columns become date32 (unparsable or blank cells are null) so trend
+    queries compare them without parsing; every other column is a string.
+    """
+    fields = list(dict.fromkeys(k for r in records[:1] for k in r))
+    columns = {}
+    for field in fields:
+        values = [r.get(field, '') for r in records]
+        if field in DATE_FIELDS:
+            parsed = parse_date_column(values)
+            columns[field] = pa.array(parsed, type=pa.date32(), mask=np.isnat(parsed))
+        else:
+            columns[field] = pa.array(['' if v is None else str(v) for v in values], type=pa.string())
+    return pa.table(columns)
+
+
+def _sheet_digest(records: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(
+        json.dumps(records, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    ).hexdigest()[:16]
+
+
+class GcsMirror:
+    """
+    Durable copy of one archive under a gs://bucket/path prefix
+
+    Sheet files are content-addressed, so uploading them never conflicts.
+    The manifest is appended with a generation precondition so captures from
+    several instances are all kept.
+    """
+
+    def __init__(self, prefix: str, project: str, bucket=None):
+        bucket_name, _, path = prefix[len('gs://'):].partition('/')
+        if bucket is None:
+            from google.cloud import storage
+            bucket = storage.Client().bucket(bucket_name)
+        self.bucket = bucket
+        self.path = '/'.join(p for p in (path.strip('/'), project) if p)
+
+    def blob(self, name: str):
+        return self.bucket.blob(f"{self.path}/{name}")
+
+    def exists(self, name: str) -> bool:
+        return self.blob(name).exists()
+
+    def upload(self, name: str, path: str):
+        self.blob(name).upload_from_filename(path)
+
+    def download(self, name: str, path: str) -> bool:
+        """Copy an object to a local file; False when it does not exist"""
+        from google.api_core.exceptions import NotFound
+        tmp_path = f"{path}.tmp"
+        try:
+            self.blob(name).download_to_filename(tmp_path)
+        except NotFound:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, path)
+        return True
+
+    def append(self, name: str, line: str, attempts: int = 5):
+        """Append a line to an object, retrying when another instance wrote first"""
+        from google.api_core.exceptions import NotFound, PreconditionFailed
+        blob = self.blob(name)
+        for _ in range(attempts):
+            try:
+                blob.reload()
+                generation = blob.generation
+                data = blob.download_as_bytes(if_generation_match=generation)
+            except NotFound:
+                generation, data = 0, b''
+            except PreconditionFailed:
+                continue
+            try:
+                blob.upload_from_string(data + line.encode('utf-8'), if_generation_match=generation)
+                return
+            except PreconditionFailed:
+                continue
+        raise RuntimeError(f"Could not append to gs://{self.bucket.name}/{self.path}/{name}")
+
+
+class SnapshotArchive:
+    """
+    Capture history of one spreadsheet
+
+    Layout under <directory>/<project>/:
+        issues/<digest>.arrow, tasks/<digest>.arrow  - one file per distinct sheet state
+        manifest.jsonl                                - one line per capture, naming both files
+
+    An unchanged sheet is not written again; its capture points at the
+    previous file, so stable Schedules cost one line per capture. With a
+    GcsMirror the same layout lives in the bucket and the local directory
+    is a read cache.
+    """
+
+    def __init__(self, directory: str, project: str, mirror: Optional[GcsMirror] = None):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for snapshot history (pip install pyarrow)")
+        self.root = os.path.join(directory, project)
+        self.manifest_path = os.path.join(self.root, "manifest.jsonl")
+        self.mirror = mirror
+        self._last_version: Optional[str] = None
+        self._lock = threading.Lock()
+        for sheet in SHEETS:
+            os.makedirs(os.path.join(self.root, sheet), exist_ok=True)
+
+    def path(self, sheet: str, digest: str) -> str:
+        return os.path.join(self.root, sheet, f"{digest}.arrow")
+
+    def captures(self) -> List[Dict[str, str]]:
+        """Manifest entries, oldest first: {taken_at, version, issues, tasks}"""
+        if self.mirror is not None:
+            self.mirror.download("manifest.jsonl", self.manifest_path)
+        if not os.path.exists(self.manifest_path):
+            return []
+        with open(self.manifest_path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def archive(self, snapshot) -> Optional[Dict[str, str]]:
+        """
+        Record a snapshot
+
+        Returns:
+            The new manifest entry, or None when nothing changed since the last capture
+        """
+        # Warmups and change notifications often re-deliver the same data;
+        # skip them without reading the manifest (or the bucket) again
+        if snapshot.version == self._last_version:
+            return None
+        with self._lock:
+            captures = self.captures()
+            last = captures[-1] if captures else None
+            if last is not None and last["version"] == snapshot.version:
+                self._last_version = snapshot.version
+                return None
+
+            entry = {"taken_at": snapshot.taken_at, "version": snapshot.version}
+            with tracing.span("history.archive") as span:
+                written = 0
+                for sheet, records in (("issues", snapshot.issues), ("tasks", snapshot.tasks)):
+                    digest = _sheet_digest(records)
+                    path = self.path(sheet, digest)
+                    if not os.path.exists(path) and not self._mirrored(sheet, digest):
+                        tmp_path = f"{path}.tmp"
+                        feather.write_feather(records_to_table(records), tmp_path, compression="zstd")
+                        os.replace(tmp_path, path)
+                        if self.mirror is not None:
+                            self.mirror.upload(f"{sheet}/{digest}.arrow", path)
+                        written += 1
+                    entry[sheet] = digest
+                span.set(files_written=written)
+
+            line = json.dumps(entry) + "\n"
+            if self.mirror is not None:
+                self.mirror.append("manifest.jsonl", line)
+            else:
+                with open(self.manifest_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            self._last_version = snapshot.version
+            return entry
+
+    def _mirrored(self, sheet: str, digest: str) -> bool:
+        return self.mirror is not None and self.mirror.exists(f"{sheet}/{digest}.arrow")
+
+    def read(self, sheet: str, digest: str, columns: Optional[List[str]] = None) -> "pa.Table":
+        """
+        Memory-map one archived sheet, decompressing only the requested columns
+
+        Columns the sheet did not have at that time are skipped.
+        """
+        path = self.path(sheet, digest)
+        if self.mirror is not None and not os.path.exists(path):
+            self.mirror.download(f"{sheet}/{digest}.arrow", path)
+        if columns is not None:
+            with pa.memory_map(path) as source:
+                names = set(pa.ipc.open_file(source).schema.names)
+            columns = [c for c in columns if c in names]
+        return feather.read_table(path, columns=columns, memory_map=True)
+
+
+_archives: Dict[str, SnapshotArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def create_snapshot_archive(project: str) -> Optional[SnapshotArchive]:
+    """
+    Create the archive of a spreadsheet from environment configuration
+
+    Returns:
+        SnapshotArchive under HISTORY_DIR (kept in HISTORY_GCS_PREFIX when set;
+        HISTORY_DIR then defaults to the temp directory), or None when history is disabled
+    """
+    if HISTORY_GCS_PREFIX:
+        directory = HISTORY_DIR or os.path.join(tempfile.gettempdir(), 'pmo-history')
+        return SnapshotArchive(directory, project, GcsMirror(HISTORY_GCS_PREFIX, project))
+    if not HISTORY_DIR:
+        return None
+    return SnapshotArchive(HISTORY_DIR, project)
+
+
+def snapshot_archive_for(sheets_client) -> Optional[SnapshotArchive]:
+    """Get the archive of a SheetsClient's spreadsheet (one per spreadsheet), or None when disabled"""
+    if not (HISTORY_DIR or HISTORY_GCS_PREFIX):
+        return None
+    project = getattr(sheets_client, 'spreadsheet_id', None) or 'default'
+    with _archives_lock:
+        archive = _archives.get(project)
+        if archive is None:
+            archive = _archives[project] = create_snapshot_archive(project)
+        return archive
@@ -0,0 +1,323 @@
+"""
+Idempotency Cache for myPMO Agent
+Google Chat redelivers events when the webhook is slow; duplicates get the
+first delivery's response instead of appending rows or calling Gemini again
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from tools import tracing
+
+
+IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', '600'))
+# How long a duplicate waits for the first delivery to finish
+IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', '25'))
+
+# Returned to a duplicate whose original is still running elsewhere
+IN_PROGRESS_RESPONSE: Dict[str, Any] = {}
+
+
+class IdempotencyStore:
+    """Base interface for completed/in-progress response storage"""
+
+    def claim(self, key: str) -> bool:
+        """
+        Mark a key as in progress
+
+        Returns:
+            True if this caller owns the key, False if it is already claimed or done
+        """
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Completed response for a key (None if unknown or still in progress)"""
+        raise NotImplementedError
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """Store the completed response"""
+        raise NotImplementedError
+
+    def release(self, key: str):
+        """Drop an in-progress claim (the handler failed; a redelivery may retry)"""
+        raise NotImplementedError
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """Process-local LRU store with TTL"""
+
+    def __init__(self, max_entries: int = 2000, ttl: float = IDEMPOTENCY_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (created_at, response or None while in progress)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str):
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[0] > self.ttl:
+            del self._entries[key]
+            return None
+        return entry
+
+    def claim(self, key: str) -> bool:
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._entries[key] = (time.time(), None)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._live(key)
+            return entry[1] if entry is not None else None
+
+    def put(self, key: str, response: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+
+    def release(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is None:
+                del self._entries[key]
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """
+    SQLite store for the processes of a single host
+
+    Not shared between Cloud Functions / Cloud Run instances: a redelivery
+    routed to another instance misses it. Use FirestoreIdempotencyStore there.
+    """
+
+    def __init__(self, db_path: str = "pmo_idempotency.db", ttl: float = IDEMPOTENCY_TTL):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT,"
+                " created_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def claim(self, key: str) -> bool:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM idempotency WHERE created_at <= ?", (time.time() - self.ttl,))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO idempotency (key, response, created_at) VALUES (?, NULL, ?)",
+                (key, time.time())
+            )
+            return cursor.rowcount == 1
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT response FROM idempotency WHERE key = ? AND created_at > ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def put(self, key: str, response: Dict[str, Any]):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency (key, response, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(response, ensure_ascii=False), time.time())
+            )
+
+    def release(self, key: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM idempotency WHERE key = ? AND response IS NULL", (key,))
+
+
+class FirestoreIdempotencyStore(IdempotencyStore):
+    """
+    Firestore store shared by every instance
+
+    claim() is a create-if-absent of the key's document, so exactly one
+    instance wins a redelivered event. Documents carry expires_at for a
+    Firestore TTL policy; expired ones are also ignored and reclaimed here.
+    """
+
+    def __init__(self, collection: str = "pmo_idempotency", ttl: float = IDEMPOTENCY_TTL,
+                 client=None):
+        if client is None:
+            from google.cloud import firestore
+            client = firestore.Client()
+        self.client = client
+        self.collection = client.collection(collection)
+        self.ttl = ttl
+
+    def _doc(self, key: str):
+        # Document IDs may not contain '/', which Chat message names do
+        return self.collection.document(key.replace('/', '|'))
+
+    def _expired(self, snapshot) -> bool:
+        return time.time() - snapshot.to_dict().get('created_at', 0) > self.ttl
+
+    def _create(self, key: str) -> bool:
+        from google.api_core.exceptions import AlreadyExists
+        now = time.time()
+        try:
+            self._doc(key).create({'response': None, 'created_at': now,
+                                   'expires_at': datetime.fromtimestamp(now + self.ttl, timezone.utc)})
+            return True
+        except AlreadyExists:
+            return False
+
+    def claim(self, key: str) -> bool:
+        from google.api_core.exceptions import FailedPrecondition, NotFound
+        if self._create(key):
+            return True
+
+        snapshot = self._doc(key).get()
+        if snapshot.exists and not self._expired(snapshot):
+            return False
+        if snapshot.exists:
+            # Delete only the expired document we read, not a newer claim
+            try:
+                self._doc(key).delete(option=self.client.write_option(last_update_time=snapshot.update_time))
+            except (FailedPrecondition, NotFound):
+                return False
+        return self._create(key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        snapshot = self._doc(key).get()
+        if not snapshot.exists or self._expired(snapshot):
+            return None
+        response = snapshot.to_dict().get('response')
+        return json.loads(response) if response is not None else None
+
+    def put(self, key: str, response: Dict[str, Any]):
+        now = time.time()
+        self._doc(key).set({'response': json.dumps(response, ensure_ascii=False), 'created_at': now,
+                            'expires_at': datetime.fromtimestamp(now + self.ttl, timezone.utc)})
+
+    def release(self, key: str):
+        from google.api_core.exceptions import FailedPrecondition, NotFound
+        snapshot = self._doc(key).get()
+        if not snapshot.exists or snapshot.to_dict().get('response') is not None:
+            return
+        try:
+            self._doc(key).delete(option=self.client.write_option(last_update_time=snapshot.update_time))
+        except (FailedPrecondition, NotFound):
+            pass
+
+
+class IdempotencyCache:
+    """
+    Run a handler at most once per key
+
+    Duplicates arriving while the first delivery is still running wait for its
+    response (up to wait_timeout) instead of starting a second run.
+    """
+
+    def __init__(self, store: IdempotencyStore, wait_timeout: float = IDEMPOTENCY_WAIT,
+                 poll_interval: float = 0.2):
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, handler: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return the cached response for key, or run handler and cache its response
+
+        Exceptions from handler are not cached; the claim is released so a
+        later redelivery can try again.
+        """
+        cached = self.store.get(key)
+        if cached is not None:
+            tracing.record_cache("idempotency", hit=True)
+            return cached
+
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None and self.store.claim(key)
+            if owner:
+                event = self._inflight[key] = threading.Event()
+
+        if not owner:
+            tracing.record_cache("idempotency", hit=True)
+            return self._wait_for(key, event)
+
+        tracing.record_cache("idempotency", hit=False)
+        try:
+            response = handler()
+            self.store.put(key, response)
+            return response
+        except Exception:
+            self.store.release(key)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _wait_for(self, key: str, event: Optional[threading.Event]) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.wait_timeout
+
+        # Same process: wake up as soon as the first delivery finishes
+        if event is not None:
+            event.wait(self.wait_timeout)
+
+        # Other processes or instances (shared store): poll until the response appears
+        while True:
+            response = self.store.get(key)
+            if response is not None:
+                return response
+            if time.monotonic() >= deadline:
+                return IN_PROGRESS_RESPONSE
+            time.sleep(self.poll_interval)
+
+
+def create_idempotency_cache() -> Optional[IdempotencyCache]:
+    """
+    Create the idempotency cache from environment configuration
+
+    IDEMPOTENCY_BACKEND selects 'memory' (default, per process), 'sqlite'
+    (per host), 'firestore' (shared by all instances) or 'none'.
+
+    Returns:
+        IdempotencyCache, or None when disabled
+    """
+    backend = os.getenv('IDEMPOTENCY_BACKEND', 'memory').lower()
+
+    if backend == 'none':
+        return None
+
+    if backend == 'firestore':
+        return IdempotencyCache(FirestoreIdempotencyStore(
+            collection=os.getenv('IDEMPOTENCY_COLLECTION', 'pmo_idempotency')
+        ))
+
+    if backend == 'sqlite':
+        return IdempotencyCache(SQLiteIdempotencyStore(
+            db_path=os.getenv('IDEMPOTENCY_DB', 'pmo_idempotency.db')
+        ))
+
+    return IdempotencyCache(InMemoryIdempotencyStore())
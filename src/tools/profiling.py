@@ -0,0 +1,217 @@
+"""
+On-demand Request Profiling for myPMO Agent
+Runs selected requests under cProfile and stores the compressed stats
+
+A request is profiled when PROFILE_ENABLED is set, when it is sampled at
+PROFILE_SAMPLE_RATE, or when it carries the X-PMO-Profile debug header equal
+to PROFILE_TOKEN. Profiles are gzip-compressed pstats dumps (readable by
+`python -m pstats` after gunzip) and are aggregated by
+scripts/profile_hotspots.py.
+"""
+
+import os
+import re
+import gzip
+import time
+import uuid
+import random
+import marshal
+import pstats
+import cProfile
+import contextvars
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Mapping, Optional, Tuple
+
+from tools import tracing
+
+
+PROFILE_ENABLED = os.getenv('PROFILE_ENABLED', 'false').lower() == 'true'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_GCS_PREFIX = os.getenv('PROFILE_GCS_PREFIX', '')
+
+PROFILE_HEADER = 'X-PMO-Profile'
+PROFILE_SUFFIX = '.prof.gz'
+
+_current_capture = contextvars.ContextVar('pmo_profile', default=None)
+
+# <stamp>_<label>_<ms>ms_<id>.prof.gz
+_FILE_NAME = re.compile(r'^(?P<stamp>\d{8}T\d{6})_(?P<label>[\w-]+)_(?P<ms>\d+)ms_(?P<id>[0-9a-f]+)\.prof\.gz$')
+
+
+def should_profile(headers: Optional[Mapping[str, str]] = None) -> bool:
+    """
+    Decide whether to profile a request
+
+    Args:
+        headers: Request headers (the debug header needs PROFILE_TOKEN to be set)
+    """
+    if PROFILE_TOKEN and headers is not None and headers.get(PROFILE_HEADER) == PROFILE_TOKEN:
+        return True
+    if PROFILE_ENABLED:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def local_sink(directory: str) -> Callable[[str, bytes], None]:
+    """Sink writing each profile to a file in a directory"""
+    def write(name: str, data: bytes):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    return write
+
+
+def gcs_sink(prefix: str) -> Callable[[str, bytes], None]:
+    """Sink uploading each profile under a gs://bucket/path prefix"""
+    from google.cloud import storage
+
+    bucket_name, _, path = prefix[len('gs://'):].partition('/')
+    bucket = storage.Client().bucket(bucket_name)
+
+    def write(name: str, data: bytes):
+        blob = bucket.blob(f"{path.rstrip('/')}/{name}" if path else name)
+        blob.upload_from_string(data, content_type='application/gzip')
+    return write
+
+
+_sink: Optional[Callable[[str, bytes], None]] = None
+
+
+def _get_sink() -> Callable[[str, bytes], None]:
+    global _sink
+    if _sink is None:
+        _sink = gcs_sink(PROFILE_GCS_PREFIX) if PROFILE_GCS_PREFIX else local_sink(PROFILE_DIR)
+    return _sink
+
+
+def set_sink(sink: Optional[Callable[[str, bytes], None]]):
+    """
+    Replace the profile sink
+
+    Args:
+        sink: Callable receiving (file name, compressed bytes); None restores
+            the configured default (PROFILE_GCS_PREFIX, else PROFILE_DIR)
+    """
+    global _sink
+    _sink = sink
+
+
+class Capture:
+    """cProfile run of one request; nested captures in the same context are no-ops"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.capture_id = uuid.uuid4().hex[:12]
+        self.name: Optional[str] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._token = None
+
+    def __enter__(self):
+        if _current_capture.get() is not None:
+            return self
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiler (or debugger) owns this thread
+            return self
+        self._profiler = profiler
+        self._token = _current_capture.set(self)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler is None:
+            return False
+        self._profiler.disable()
+        _current_capture.reset(self._token)
+        elapsed_ms = (time.perf_counter() - self._started) * 1000
+
+        self._profiler.create_stats()
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        label = re.sub(r'[^\w-]', '', self.label) or 'request'
+        self.name = f"{stamp}_{label}_{int(elapsed_ms)}ms_{self.capture_id}{PROFILE_SUFFIX}"
+        try:
+            _get_sink()(self.name, gzip.compress(marshal.dumps(self._profiler.stats)))
+        except Exception as e:
+            print(f"Profile not stored: {e}")
+        return False
+
+
+def profile(label: str) -> Capture:
+    """
+    Profile the enclosed block
+
+    Args:
+        label: Short name stored in the file name (e.g., "chat", "ask")
+    """
+    return Capture(label)
+
+
+def is_profiling() -> bool:
+    """True inside a capture (deferred work inherits the flag through its payload)"""
+    return _current_capture.get() is not None
+
+
+def tag(label: str):
+    """Rename the active capture (e.g., to the Chat command) and link it from the trace"""
+    capture = _current_capture.get()
+    if capture is not None:
+        capture.label = label
+        tracing.current_trace().set(profile_id=capture.capture_id)
+
+
+class _LoadedProfile:
+    """Adapter so pstats.Stats accepts already-unmarshalled stats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def load_stats(path: str) -> pstats.Stats:
+    """Load one compressed profile"""
+    with open(path, 'rb') as f:
+        return pstats.Stats(_LoadedProfile(marshal.loads(gzip.decompress(f.read()))))
+
+
+def parse_name(name: str) -> Optional[dict]:
+    """Metadata of a profile file name: stamp, label, ms and id (None if not a profile)"""
+    match = _FILE_NAME.match(os.path.basename(name))
+    if match is None:
+        return None
+    meta = match.groupdict()
+    meta['ms'] = int(meta['ms'])
+    return meta
+
+
+def hot_spots(paths: Iterable[str], top: int = 20,
+              sort: str = 'tottime') -> Tuple[int, List[Tuple[str, int, float, float]]]:
+    """
+    Aggregate profiles and rank functions
+
+    Args:
+        paths: Profile files
+        top: Number of functions to return
+        sort: 'tottime' (own time) or 'cumtime' (including callees)
+
+    Returns:
+        (number of profiles, [(function, calls, tottime s, cumtime s)])
+    """
+    combined = None
+    count = 0
+    for path in paths:
+        stats = load_stats(path)
+        combined = stats if combined is None else combined.add(stats)
+        count += 1
+    if combined is None:
+        return 0, []
+
+    column = {'tottime': 2, 'cumtime': 3}[sort]
+    rows = sorted(combined.stats.items(), key=lambda kv: -kv[1][column])[:top]
+    return count, [(pstats.func_std_string(func), nc, tt, ct) for func, (cc, nc, tt, ct, _) in rows]
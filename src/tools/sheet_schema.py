@@ -0,0 +1,168 @@
+"""
+Header-driven Sheet Schema for myPMO Agent
+Caches each sheet's header row and column letters so reads cover exactly the
+header width and writes are built by column name instead of position
+"""
+
+import os
+import time
+import threading
+from typing import Dict, List, Any, Optional
+
+from tools import tracing
+
+
+SCHEMA_TTL = float(os.getenv('SCHEMA_TTL', '300'))
+
+
+def column_letter(index: int) -> str:
+    """Convert a 0-based column index to letters (0 -> A, 26 -> AA)"""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def quote_sheet(sheet_name: str) -> str:
+    """Quote a sheet name for A1 notation when needed"""
+    if sheet_name.replace('_', '').isalnum() and sheet_name.isascii():
+        return sheet_name
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+
+class SheetSchema:
+    """Header row of one sheet and the column position of every field"""
+
+    def __init__(self, sheet_name: str, headers: List[str]):
+        self.sheet_name = sheet_name
+        self.headers = list(headers)
+        self.positions = {h: i for i, h in enumerate(self.headers) if h}
+        self.fetched_at = time.monotonic()
+
+    @property
+    def width(self) -> int:
+        return len(self.headers)
+
+    @property
+    def last_letter(self) -> str:
+        return column_letter(max(self.width, 1) - 1)
+
+    def letter(self, field: str) -> str:
+        """Column letters for a header name (KeyError if absent)"""
+        return column_letter(self.positions[field])
+
+    def full_range(self) -> str:
+        """A1 range covering the header row and all data within the header width"""
+        return f"{quote_sheet(self.sheet_name)}!A:{self.last_letter}"
+
+    def row_range(self, first_row: int, last_row: int) -> str:
+        """A1 range of rows first_row..last_row (1-based, inclusive) within the header width"""
+        return f"{quote_sheet(self.sheet_name)}!A{first_row}:{self.last_letter}{last_row}"
+
+    def to_records(self, rows: List[List[Any]]) -> List[Dict[str, Any]]:
+        """Convert data rows (without header) to dicts keyed by header"""
+        width = self.width
+        headers = self.headers
+        records = []
+        for row in rows:
+            # Pad row if it has fewer columns than headers
+            row_padded = row + [''] * (width - len(row))
+            records.append(dict(zip(headers, row_padded)))
+        return records
+
+    def build_row(self, values: Dict[str, Any]) -> List[Any]:
+        """
+        Build a row in sheet column order from values keyed by header name
+
+        Fields the sheet does not have are dropped; columns without a value are blank.
+        """
+        unknown = [k for k in values if k not in self.positions]
+        if unknown:
+            print(f"Warning: {self.sheet_name} has no column for {unknown}")
+
+        row = [''] * self.width
+        for field, value in values.items():
+            if field in self.positions:
+                row[self.positions[field]] = value
+
+        # Trailing blanks are not needed for append
+        while row and row[-1] == '':
+            row.pop()
+        return row
+
+
+class SchemaResolver:
+    """
+    Per-spreadsheet cache of SheetSchema objects
+
+    Schemas are re-validated cheaply: full reads include the header row and
+    replace the cached schema when it changed, and a schema older than the
+    TTL is re-checked by reading row 1 only.
+    """
+
+    def __init__(self, service, spreadsheet_id: str, ttl: float = SCHEMA_TTL):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.ttl = ttl
+        self._schemas: Dict[str, SheetSchema] = {}
+        self._lock = threading.Lock()
+
+    def _fetch_headers(self, sheet_name: str) -> List[str]:
+        with tracing.span("sheets.read_header", sheet=sheet_name):
+            result = self.service.spreadsheets().values().get(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{quote_sheet(sheet_name)}!1:1",
+                fields='values'
+            ).execute()
+        values = result.get('values', [])
+        return values[0] if values else []
+
+    def get(self, sheet_name: str, refresh: bool = False) -> SheetSchema:
+        """
+        Get the schema for a sheet
+
+        Args:
+            sheet_name: Sheet name
+            refresh: Re-read the header row even if the cached schema is fresh
+
+        Returns:
+            SheetSchema
+        """
+        schema = self._schemas.get(sheet_name)
+        if schema is not None and not refresh and time.monotonic() - schema.fetched_at < self.ttl:
+            tracing.record_cache("schema", hit=True)
+            return schema
+
+        tracing.record_cache("schema", hit=False)
+        headers = self._fetch_headers(sheet_name)
+        return self.update(sheet_name, headers)
+
+    def peek(self, sheet_name: str) -> Optional[SheetSchema]:
+        """Cached schema without any freshness check (None if not cached)"""
+        return self._schemas.get(sheet_name)
+
+    def update(self, sheet_name: str, headers: List[str]) -> SheetSchema:
+        """
+        Record the header row observed in a read
+
+        Returns:
+            The cached schema (a new one if the headers changed)
+        """
+        with self._lock:
+            schema = self._schemas.get(sheet_name)
+            if schema is not None and schema.headers == list(headers):
+                schema.fetched_at = time.monotonic()
+                return schema
+
+            schema = self._schemas[sheet_name] = SheetSchema(sheet_name, headers)
+            return schema
+
+    def invalidate(self, sheet_name: Optional[str] = None):
+        """Drop one cached schema (or all of them)"""
+        with self._lock:
+            if sheet_name is None:
+                self._schemas.clear()
+            else:
+                self._schemas.pop(sheet_name, None)
@@ -4,23 +4,48 @@ Handles reading/writing to Issue Log and Schedule sheets
 """
 
 import os
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import json
+import contextvars
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional
+from datetime import datetime, timedelta
+import numpy as np
 from googleapiclient.errors import HttpError
 
+from tools import tracing
+from tools.credentials import get_credentials
+from tools.date_columns import DateColumnEngine, SHEETS_EPOCH, field_mask, select
+from tools.sheet_schema import SchemaResolver, column_letter, quote_sheet
+from tools.transport import build_service
+
+# Columns holding dates in the PMO sheets
+DATE_FIELDS = ('起票日', '期限', '更新日', '開始予定', '終了予定')
+
+# Data rows per page for the streaming iterators
+PAGE_ROWS = int(os.getenv('SHEETS_PAGE_ROWS', '1000'))
+
+# Background reads of the next page (shared; the transport is thread-safe)
+_prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sheets-prefetch")
+
 
 class SheetsClient:
     """Google Sheets API wrapper for PMO data management"""
     
     SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
     
+    # Columns needed by the risk scans (predicate + display fields)
+    OVERDUE_FIELDS = ['ID', '優先度', '内容', '担当者', '期限', 'ステータス']
+    STALLED_FIELDS = ['ID', 'タスク', '担当者', 'ステータス']
+    SLIPPED_FIELDS = ['ID', 'タスク', '担当者', '終了予定', 'ステータス']
+    
     def __init__(self, 
                  service_account_key_path: Optional[str] = None,
                  spreadsheet_id: str = None,
                  issue_sheet_name: str = "Issues",
-                 schedule_sheet_name: str = "Schedule"):
+                 schedule_sheet_name: str = "Schedule",
+                 service=None,
+                 read_mode: Optional[str] = None):
         """
         Initialize Sheets API client
         
@@ -29,23 +54,65 @@ class SheetsClient:
             spreadsheet_id: Google Spreadsheet ID
             issue_sheet_name: Name of Issue Log sheet
             schedule_sheet_name: Name of Schedule sheet
+            service: Pre-built Sheets service (optional, skips authentication; used by benchmarks)
+            read_mode: 'formatted' (display strings) or 'raw' (unformatted values,
+                dates as serial numbers); default from SHEETS_READ_MODE
         """
         self.spreadsheet_id = spreadsheet_id
         self.issue_sheet_name = issue_sheet_name
         self.schedule_sheet_name = schedule_sheet_name
+        self.read_mode = (read_mode or os.getenv('SHEETS_READ_MODE', 'formatted')).lower()
+        
+        if service is None:
+            # Authenticate (credentials and token are shared process-wide)
+            credentials = get_credentials(service_account_key_path)
+            service = build_service('sheets', 'v4', credentials)
+        
+        self.service = service
+        
+        # Header rows and column letters, cached per sheet
+        self.schema = SchemaResolver(self.service, spreadsheet_id)
+        
+        # Parsed date columns, shared by every deadline predicate on a read
+        self.dates = DateColumnEngine()
+    
+    def _render_options(self, fields: str) -> Dict[str, str]:
+        """
+        Request options for value reads
+        
+        Responses are always field-masked to the values; raw mode also asks
+        for unformatted values with dates as serial numbers.
+        """
+        options = {'fields': fields}
+        if self.read_mode == 'raw':
+            options['valueRenderOption'] = 'UNFORMATTED_VALUE'
+            options['dateTimeRenderOption'] = 'SERIAL_NUMBER'
+        return options
+    
+    def _normalize_dates(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Convert serial-number dates to YYYY-MM-DD in bulk (raw mode only)
         
-        # Authenticate
-        if service_account_key_path:
-            # Use service account key file
-            credentials = service_account.Credentials.from_service_account_file(
-                service_account_key_path, scopes=self.SCOPES
-            )
-        else:
-            # Use default credentials (for Cloud Functions)
-            import google.auth
-            credentials, project = google.auth.default(scopes=self.SCOPES)
+        Each distinct serial is converted once per column, so the cost grows
+        with the number of distinct dates rather than rows.
+        """
+        if self.read_mode != 'raw' or not records:
+            return records
         
-        self.service = build('sheets', 'v4', credentials=credentials)
+        for field in DATE_FIELDS:
+            if field not in records[0]:
+                continue
+            
+            converted = {}
+            for record in records:
+                value = record[field]
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    iso = converted.get(value)
+                    if iso is None:
+                        iso = converted[value] = (SHEETS_EPOCH + timedelta(days=int(value))).isoformat()
+                    record[field] = iso
+        
+        return records
         
     def _read_range(self, range_name: str) -> List[List[Any]]:
         """
@@ -58,17 +125,53 @@ class SheetsClient:
             List of rows (each row is a list of cell values)
         """
         try:
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name
-            ).execute()
+            with tracing.span("sheets.read", range=range_name) as span:
+                result = self.service.spreadsheets().values().get(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=range_name,
+                    **self._render_options('values')
+                ).execute()
+                
+                values = result.get('values', [])
+                if span.active:
+                    span.set(rows=len(values),
+                             bytes=len(json.dumps(result, ensure_ascii=False).encode('utf-8')))
             
-            return result.get('values', [])
+            return values
         
         except HttpError as error:
             print(f"Error reading range {range_name}: {error}")
             raise
     
+    def _batch_read(self, ranges: List[str]) -> List[List[List[Any]]]:
+        """
+        Read several ranges in one request
+        
+        Args:
+            ranges: A1 notation ranges
+            
+        Returns:
+            List of row lists, one per requested range
+        """
+        try:
+            with tracing.span("sheets.batch_read", ranges=len(ranges)) as span:
+                result = self.service.spreadsheets().values().batchGet(
+                    spreadsheetId=self.spreadsheet_id,
+                    ranges=ranges,
+                    **self._render_options('valueRanges(values)')
+                ).execute()
+                
+                value_ranges = [vr.get('values', []) for vr in result.get('valueRanges', [])]
+                if span.active:
+                    span.set(rows=max((len(v) for v in value_ranges), default=0),
+                             bytes=len(json.dumps(result, ensure_ascii=False).encode('utf-8')))
+            
+            return value_ranges
+        
+        except HttpError as error:
+            print(f"Error reading ranges {ranges}: {error}")
+            raise
+    
     def _append_row(self, range_name: str, values: List[Any]) -> bool:
         """
         Append a new row to the sheet
@@ -83,13 +186,14 @@ class SheetsClient:
         try:
             body = {'values': [values]}
             
-            self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='USER_ENTERED',
-                insertDataOption='INSERT_ROWS',
-                body=body
-            ).execute()
+            with tracing.span("sheets.append", range=range_name, rows=1):
+                self.service.spreadsheets().values().append(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=range_name,
+                    valueInputOption='USER_ENTERED',
+                    insertDataOption='INSERT_ROWS',
+                    body=body
+                ).execute()
             
             return True
         
@@ -97,35 +201,186 @@ class SheetsClient:
             print(f"Error appending to {range_name}: {error}")
             return False
     
-    def get_all_issues(self) -> List[Dict[str, Any]]:
+    def _read_records(self, sheet_name: str, first_row: int = 1,
+                      last_row: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Get all issues from Issue Log
+        Read rows of a sheet as dicts keyed by the header row
         
-        Returns:
-            List of issue dictionaries with column headers as keys
+        Only the columns covered by the cached header are fetched. If the
+        header row in the response differs from the cache (columns inserted
+        or reordered), the schema is refreshed and the read repeated.
+        
+        Args:
+            sheet_name: Sheet to read
+            first_row, last_row: 1-based row bounds for paged reads (default:
+                the whole sheet). The header is only checked when first_row is 1.
         """
-        range_name = f"{self.issue_sheet_name}!A:L"  # A-L covers all columns
-        rows = self._read_range(range_name)
+        with_header = first_row == 1
         
-        if not rows:
-            return []
+        def read(schema):
+            if last_row is None:
+                return self._read_range(schema.full_range())
+            return self._read_range(schema.row_range(first_row, last_row))
         
-        # First row is header
-        headers = rows[0]
-        issues = []
+        schema = self.schema.get(sheet_name)
+        rows = read(schema)
         
-        for row in rows[1:]:  # Skip header
-            # Pad row if it has fewer columns than headers
-            row_padded = row + [''] * (len(headers) - len(row))
-            issue = dict(zip(headers, row_padded))
-            issues.append(issue)
+        if with_header and rows and rows[0] != schema.headers:
+            schema = self.schema.get(sheet_name, refresh=True)
+            rows = read(schema)
         
-        return issues
+        if with_header:
+            rows = rows[1:]
+        return self._normalize_dates(schema.to_records(rows))
+    
+    def _read_projection(self, sheet_name: str, fields: List[str], first_row: int = 1,
+                         last_row: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Read only the given columns of a sheet with one batchGet
+        
+        Adjacent columns are merged into a single range. Each range includes
+        the header row so a moved column is detected (schema refreshed, read
+        repeated). Fields the sheet does not have come back as ''.
+        
+        Args:
+            sheet_name: Sheet to read
+            fields: Columns to fetch
+            first_row, last_row: 1-based row bounds for paged reads (default:
+                the whole sheet). The header is only checked when first_row is 1.
+        """
+        with_header = first_row == 1
+        rows_a1 = (first_row, last_row) if last_row is not None else ('', '')
+        
+        for attempt in range(2):
+            schema = self.schema.get(sheet_name, refresh=attempt > 0)
+            indices = sorted({schema.positions[f] for f in fields if f in schema.positions})
+            if not indices:
+                return []
+            
+            # Group contiguous column indices: [0, 1, 2, 5, 6] -> [(0, 2), (5, 6)]
+            groups = []
+            for index in indices:
+                if groups and index == groups[-1][1] + 1:
+                    groups[-1][1] = index
+                else:
+                    groups.append([index, index])
+            
+            sheet = quote_sheet(sheet_name)
+            ranges = [f"{sheet}!{column_letter(a)}{rows_a1[0]}:{column_letter(b)}{rows_a1[1]}"
+                      for a, b in groups]
+            columns = self._batch_read(ranges)
+            
+            if not with_header or all((rows[0] if rows else []) == schema.headers[a:b + 1]
+                                      for rows, (a, b) in zip(columns, groups)):
+                break
+        
+        skip = 1 if with_header else 0
+        row_count = max((len(rows) for rows in columns), default=0) - skip
+        records = [{f: '' for f in fields} for _ in range(max(row_count, 0))]
+        
+        for rows, (a, b) in zip(columns, groups):
+            names = schema.headers[a:b + 1]
+            for record, row in zip(records, rows[skip:]):
+                for name, value in zip(names, row):
+                    if name in record:
+                        record[name] = value
+        
+        return self._normalize_dates(records)
+    
+    def _iter_pages(self, sheet_name: str, fields: Optional[List[str]] = None,
+                    page_rows: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Read a sheet in row-range pages (A1:L1001, A1002:L2001, ...)
+        
+        The next page is requested in the background while the caller works
+        on the current one. Reading stops at the first short page, so a fully
+        blank block of page_rows rows inside the data ends the scan early.
+        Closing the generator early (break) skips the remaining pages.
+        
+        Args:
+            sheet_name: Sheet to read
+            fields: Only fetch these columns (optional, all columns if None)
+            page_rows: Data rows per page (default: SHEETS_PAGE_ROWS)
+            
+        Yields:
+            Lists of record dicts, one per page
+        """
+        page_rows = page_rows or PAGE_ROWS
+        
+        def read(first_row, last_row):
+            if fields:
+                return self._read_projection(sheet_name, fields, first_row, last_row)
+            return self._read_records(sheet_name, first_row, last_row)
+        
+        def prefetch(first_row):
+            # Run in the request's context so the read shows up in its trace
+            context = contextvars.copy_context()
+            return _prefetch_executor.submit(context.run, read, first_row, first_row + page_rows - 1)
+        
+        # Page 1 also carries the header row (schema check)
+        page = read(1, page_rows + 1)
+        next_first = page_rows + 2
+        pending = prefetch(next_first) if len(page) == page_rows else None
+        
+        try:
+            while True:
+                if page:
+                    yield page
+                if pending is None:
+                    return
+                page = pending.result()
+                next_first += page_rows
+                pending = prefetch(next_first) if len(page) == page_rows else None
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    def iter_issues(self, fields: Optional[List[str]] = None,
+                    page_rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream issues from Issue Log page by page
+        
+        Memory stays bounded by the page size, and a consumer that stops
+        early (e.g. after the first 5 matches) reads only the pages it used.
+        
+        Args:
+            fields: Only fetch these columns (optional, all columns if None)
+            page_rows: Data rows per page (default: SHEETS_PAGE_ROWS)
+        """
+        for page in self._iter_pages(self.issue_sheet_name, fields, page_rows):
+            yield from page
+    
+    def iter_schedule_tasks(self, fields: Optional[List[str]] = None,
+                            page_rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream tasks from Schedule page by page (see iter_issues)
+        
+        Args:
+            fields: Only fetch these columns (optional, all columns if None)
+            page_rows: Data rows per page (default: SHEETS_PAGE_ROWS)
+        """
+        for page in self._iter_pages(self.schedule_sheet_name, fields, page_rows):
+            yield from page
+    
+    def get_all_issues(self, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get all issues from Issue Log
+        
+        Args:
+            fields: Only fetch these columns (optional, all columns if None)
+            
+        Returns:
+            List of issue dictionaries with column headers as keys
+        """
+        if fields:
+            return self._read_projection(self.issue_sheet_name, fields)
+        return self._read_records(self.issue_sheet_name)
     
     def get_issues_by_filter(self, 
                             vendor: Optional[str] = None,
                             priority: Optional[str] = None,
-                            status: Optional[str] = None) -> List[Dict[str, Any]]:
+                            status: Optional[str] = None,
+                            limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Filter issues by criteria
         
@@ -133,49 +388,76 @@ class SheetsClient:
             vendor: Filter by vendor name (ベンダー名)
             priority: Filter by priority (優先度)
             status: Filter by status (ステータス)
+            limit: Stop reading once this many issues matched (optional)
             
         Returns:
             Filtered list of issues
         """
-        all_issues = self.get_all_issues()
-        filtered = all_issues
-        
-        if vendor:
-            filtered = [i for i in filtered if i.get('ベンダー名', '') == vendor]
-        
-        if priority:
-            filtered = [i for i in filtered if i.get('優先度', '') == priority]
-        
-        if status:
-            filtered = [i for i in filtered if i.get('ステータス', '') == status]
+        criteria = [(k, v) for k, v in (('ベンダー名', vendor), ('優先度', priority), ('ステータス', status)) if v]
+        matches = (i for i in self.iter_issues() if all(i.get(k, '') == v for k, v in criteria))
+        return list(islice(matches, limit))
+    
+    def _scan(self, pages: Iterator[List[Dict[str, Any]]], predicate,
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Collect matching records page by page
         
-        return filtered
+        predicate(page) returns a boolean mask over the page, so date
+        comparisons stay vectorized while only matches are kept in memory.
+        Stops reading pages once limit matches were found.
+        """
+        matches = []
+        for page in pages:
+            matches.extend(select(page, predicate(page)))
+            if limit is not None and len(matches) >= limit:
+                pages.close()
+                return matches[:limit]
+        return matches
     
-    def get_overdue_issues(self) -> List[Dict[str, Any]]:
+    def get_overdue_issues(self, fields: Optional[List[str]] = OVERDUE_FIELDS,
+                           limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Get issues past their deadline
         
+        Args:
+            fields: Columns to fetch (default: OVERDUE_FIELDS; None for full rows)
+            limit: Stop reading once this many overdue issues were found (optional)
+            
         Returns:
-            List of overdue issues
+            List of overdue issues in sheet order
         """
-        all_issues = self.get_all_issues()
-        today = datetime.now().date()
-        overdue = []
+        if fields is not None:
+            fields = list(dict.fromkeys(list(fields) + ['期限', 'ステータス']))
+        
+        # Deadlines in any common format (2025-12-15, 2025/12/15, serials) are compared vectorized
+        return self._scan(
+            self._iter_pages(self.issue_sheet_name, fields),
+            lambda page: self.dates.overdue(page, '期限') & field_mask(page, 'ステータス', '完了'),
+            limit
+        )
+    
+    def get_due_soon_issues(self, days: int = 7,
+                            fields: Optional[List[str]] = OVERDUE_FIELDS,
+                            limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get open issues whose deadline falls within the next N days
         
-        for issue in all_issues:
-            deadline_str = issue.get('期限', '')
-            if not deadline_str:
-                continue
+        Args:
+            days: Look-ahead window in days (today included)
+            fields: Columns to fetch (default: OVERDUE_FIELDS; None for full rows)
+            limit: Stop reading once this many issues were found (optional)
             
-            try:
-                # Assume YYYY-MM-DD format
-                deadline = datetime.strptime(deadline_str, '%Y-%m-%d').date()
-                if deadline < today and issue.get('ステータス') != '完了':
-                    overdue.append(issue)
-            except ValueError:
-                continue
-        
-        return overdue
+        Returns:
+            List of issues due soon
+        """
+        if fields is not None:
+            fields = list(dict.fromkeys(list(fields) + ['期限', 'ステータス']))
+        
+        return self._scan(
+            self._iter_pages(self.issue_sheet_name, fields),
+            lambda page: self.dates.due_within(page, '期限', days) & field_mask(page, 'ステータス', '完了'),
+            limit
+        )
     
     def add_issue(self, 
                   category: str,
@@ -185,7 +467,7 @@ class SheetsClient:
                   priority: str,
                   deadline: str,
                   status: str = "新規",
-                  impact: str = "") -> bool:
+                  impact: str = "") -> Optional[int]:
         """
         Add a new issue to Issue Log
         
@@ -200,77 +482,107 @@ class SheetsClient:
             impact: 影響範囲
             
         Returns:
-            True if successful
+            ID of the new issue, or None if the append failed
         """
         today = datetime.now().strftime('%Y-%m-%d')
         
-        # Auto-generate ID by counting existing rows
-        all_issues = self.get_all_issues()
+        # Auto-generate ID by counting existing rows (only the ID column is fetched)
+        all_issues = self.get_all_issues(fields=['ID'])
         new_id = len(all_issues) + 1
         
-        values = [
-            new_id,          # ID
-            today,           # 起票日
-            category,        # カテゴリ
-            content,         # 内容
-            vendor,          # ベンダー名
-            assignee,        # 担当者
-            priority,        # 優先度
-            deadline,        # 期限
-            status,          # ステータス
-            impact,          # 影響範囲
-            today            # 更新日
-        ]
-        
-        return self._append_row(self.issue_sheet_name, values)
+        # Build the row by header name so column order in the sheet doesn't matter;
+        # re-read row 1 first, since a cached header may predate a column move
+        schema = self.schema.get(self.issue_sheet_name, refresh=True)
+        values = schema.build_row({
+            'ID': new_id,
+            '起票日': today,
+            'カテゴリ': category,
+            '内容': content,
+            'ベンダー名': vendor,
+            '担当者': assignee,
+            '優先度': priority,
+            '期限': deadline,
+            'ステータス': status,
+            '影響範囲': impact,
+            '更新日': today
+        })
+        
+        return new_id if self._append_row(self.issue_sheet_name, values) else None
     
-    def get_all_schedule_tasks(self) -> List[Dict[str, Any]]:
+    def get_all_schedule_tasks(self, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Get all tasks from Schedule
         
+        Args:
+            fields: Only fetch these columns (optional, all columns if None)
+            
         Returns:
             List of task dictionaries
         """
-        range_name = f"{self.schedule_sheet_name}!A:J"
-        rows = self._read_range(range_name)
-        
-        if not rows:
-            return []
-        
-        headers = rows[0]
-        tasks = []
-        
-        for row in rows[1:]:
-            row_padded = row + [''] * (len(headers) - len(row))
-            task = dict(zip(headers, row_padded))
-            tasks.append(task)
-        
-        return tasks
+        if fields:
+            return self._read_projection(self.schedule_sheet_name, fields)
+        return self._read_records(self.schedule_sheet_name)
     
-    def get_stalled_tasks(self, days_threshold: int = 7) -> List[Dict[str, Any]]:
+    def get_stalled_tasks(self, days_threshold: int = 7,
+                          fields: Optional[List[str]] = STALLED_FIELDS,
+                          limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Get tasks marked as '停滞' for more than threshold days
         
         Args:
             days_threshold: Number of days to consider stalled
+            fields: Columns to fetch (default: STALLED_FIELDS; None for full rows)
+            limit: Stop reading once this many stalled tasks were found (optional)
             
         Returns:
             List of stalled tasks
         """
-        all_tasks = self.get_all_schedule_tasks()
+        if fields is not None:
+            fields = list(dict.fromkeys(list(fields) + ['ステータス']))
         # Note: This is a simplified version
         # Full implementation would require tracking status change dates
-        return [t for t in all_tasks if t.get('ステータス') == '停滞']
+        stalled = (t for t in self.iter_schedule_tasks(fields) if t.get('ステータス') == '停滞')
+        return list(islice(stalled, limit))
     
-    def get_critical_path_tasks(self) -> List[Dict[str, Any]]:
+    def get_slipped_tasks(self, fields: Optional[List[str]] = SLIPPED_FIELDS) -> List[Dict[str, Any]]:
+        """
+        Get unfinished tasks past their planned end date
+        
+        Every page is scanned (the result is ordered by delay), but only the
+        slipped tasks are kept.
+        
+        Args:
+            fields: Columns to fetch (default: SLIPPED_FIELDS; None for full rows)
+            
+        Returns:
+            List of tasks with '遅延日数' (days behind 終了予定), most delayed first
+        """
+        if fields is not None:
+            fields = list(dict.fromkeys(list(fields) + ['終了予定', 'ステータス']))
+        
+        slipped = []
+        for page in self._iter_pages(self.schedule_sheet_name, fields):
+            slip = self.dates.slip_days(page, '終了予定')
+            mask = (slip > 0) & field_mask(page, 'ステータス', '完了')
+            slipped.extend({**page[i], '遅延日数': int(slip[i])} for i in np.flatnonzero(mask))
+        
+        # Stable: equal delays keep sheet order
+        slipped.sort(key=lambda t: -t['遅延日数'])
+        return slipped
+    
+    def get_critical_path_tasks(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Get tasks marked as critical path
         
+        Args:
+            limit: Stop reading once this many tasks were found (optional)
+            
         Returns:
             List of critical path tasks
         """
-        all_tasks = self.get_all_schedule_tasks()
-        return [t for t in all_tasks if t.get('クリティカルパス') == 'TRUE']
+        # Checkboxes read as 'TRUE' when formatted and True in raw mode
+        critical = (t for t in self.iter_schedule_tasks() if t.get('クリティカルパス') in ('TRUE', True))
+        return list(islice(critical, limit))
 
 
 if __name__ == "__main__":
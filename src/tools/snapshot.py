@@ -0,0 +1,159 @@
+"""
+Data Snapshots for myPMO Agent
+One consistent read of the Issue Log and Schedule, identified by a content
+hash, with the risk report and rollups derived from it computed once
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import weakref
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from tools import tracing
+from tools.date_columns import DateColumnEngine, field_mask, select
+
+
+SNAPSHOT_TTL = float(os.getenv('SNAPSHOT_TTL', '30'))
+
+
+class Snapshot:
+    """Issue and schedule records read together, plus lazily derived views"""
+
+    def __init__(self, issues: List[Dict[str, Any]], tasks: List[Dict[str, Any]]):
+        self.issues = issues
+        self.tasks = tasks
+        self.taken_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.version = hashlib.sha256(
+            json.dumps([issues, tasks], ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        ).hexdigest()[:32]
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self) -> str:
+        """Strong ETag: identical snapshots produce identical representations"""
+        return f'"{self.version}"'
+
+    def derived(self, name: str, build: Callable[["Snapshot"], Any]) -> Any:
+        """Compute a view of this snapshot once and reuse it"""
+        with self._lock:
+            if name in self._derived:
+                return self._derived[name]
+        value = build(self)
+        with self._lock:
+            return self._derived.setdefault(name, value)
+
+
+class SnapshotCache:
+    """
+    Latest snapshot of one spreadsheet
+
+    Reads are shared: within the TTL (or until invalidated) every caller gets
+    the same snapshot, and concurrent refreshes wait for a single read.
+    """
+
+    def __init__(self, sheets_client, ttl: float = SNAPSHOT_TTL):
+        self.sheets_client = sheets_client
+        self.ttl = ttl
+        self._snapshot: Optional[Snapshot] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, max_age: Optional[float] = None) -> Snapshot:
+        """
+        Get the current snapshot, reading the sheets when it is stale
+
+        Args:
+            max_age: Override the TTL for this call (0 forces a read)
+        """
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._fetched_at < max_age:
+            tracing.record_cache("snapshot", hit=True)
+            return snapshot
+
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            if self._snapshot is not None and time.monotonic() - self._fetched_at < max_age:
+                tracing.record_cache("snapshot", hit=True)
+                return self._snapshot
+
+            tracing.record_cache("snapshot", hit=False)
+            with tracing.span("snapshot.read"):
+                snapshot = Snapshot(self.sheets_client.get_all_issues(),
+                                    self.sheets_client.get_all_schedule_tasks())
+            self._snapshot, self._fetched_at = snapshot, time.monotonic()
+            return snapshot
+
+    def peek(self) -> Optional[Snapshot]:
+        """Cached snapshot regardless of age (None before the first read)"""
+        return self._snapshot
+
+    def invalidate(self):
+        """Force the next get() to read the sheets (e.g. after a write)"""
+        self._fetched_at = 0.0
+
+
+_caches: "weakref.WeakKeyDictionary[Any, SnapshotCache]" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def snapshot_cache_for(sheets_client) -> SnapshotCache:
+    """Get the SnapshotCache of a SheetsClient (one per client)"""
+    with _caches_lock:
+        cache = _caches.get(sheets_client)
+        if cache is None:
+            cache = _caches[sheets_client] = SnapshotCache(sheets_client)
+        return cache
+
+
+def risk_report(snapshot: Snapshot, due_days: int = 7) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Risk lists of a snapshot (same rules as /risk-alert)
+
+    Returns:
+        Dict with 'overdue', 'due_soon', 'stalled' and 'slipped' (slipped tasks carry 遅延日数)
+    """
+    dates = DateColumnEngine()
+    issues, tasks = snapshot.issues, snapshot.tasks
+
+    open_issues = field_mask(issues, 'ステータス', '完了')
+    slip = dates.slip_days(tasks, '終了予定')
+    slipped_mask = (slip > 0) & field_mask(tasks, 'ステータス', '完了')
+
+    return {
+        'overdue': select(issues, dates.overdue(issues, '期限') & open_issues),
+        'due_soon': select(issues, dates.due_within(issues, '期限', due_days) & open_issues),
+        'stalled': [t for t in tasks if t.get('ステータス') == '停滞'],
+        'slipped': sorted(
+            ({**t, '遅延日数': int(d)} for t, d, m in zip(tasks, slip, slipped_mask) if m),
+            key=lambda t: -t['遅延日数']
+        )
+    }
+
+
+def rollups(snapshot: Snapshot) -> Dict[str, Any]:
+    """Counts by status, priority and vendor for the dashboard"""
+    risks = snapshot.derived('risks', risk_report)
+    issues, tasks = snapshot.issues, snapshot.tasks
+
+    return {
+        'issues': {
+            'total': len(issues),
+            'by_status': dict(Counter(i.get('ステータス') or '不明' for i in issues)),
+            'by_priority': dict(Counter(i.get('優先度') or '不明' for i in issues)),
+            'by_vendor': dict(Counter(i.get('ベンダー名') or '不明' for i in issues)),
+            'overdue_by_vendor': dict(Counter(i.get('ベンダー名') or '不明' for i in risks['overdue']))
+        },
+        'schedule': {
+            'total': len(tasks),
+            'by_status': dict(Counter(t.get('ステータス') or '不明' for t in tasks)),
+            'critical_path': sum(1 for t in tasks if t.get('クリティカルパス') in ('TRUE', True))
+        },
+        'risks': {name: len(items) for name, items in risks.items()}
+    }
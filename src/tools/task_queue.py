@@ -0,0 +1,243 @@
+"""
+Background Task Queue for myPMO Agent
+Runs slow chat commands outside the webhook request (acknowledge-then-respond)
+"""
+
+import os
+import json
+import base64
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+
+
+TaskHandler = Callable[[Dict[str, Any]], None]
+
+
+class TaskQueue:
+    """Base interface for deferred task execution"""
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        """
+        Schedule a task for background execution
+
+        Args:
+            payload: JSON-serializable task payload
+
+        Returns:
+            Task ID
+        """
+        raise NotImplementedError
+
+
+class InMemoryTaskQueue(TaskQueue):
+    """
+    Thread pool backed queue for local development
+
+    Note: On Cloud Functions, CPU may be throttled once the response is sent,
+    so production deployments should use CloudTasksQueue instead.
+    """
+
+    def __init__(self, handler: TaskHandler, max_workers: int = 2):
+        self.handler = handler
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="pmo-task")
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        task_id = uuid.uuid4().hex
+        self._executor.submit(self._run, payload)
+        return task_id
+
+    def _run(self, payload: Dict[str, Any]):
+        try:
+            self.handler(payload)
+        except Exception as e:
+            print(f"Task failed: {e}")
+
+
+class SQLiteTaskQueue(TaskQueue):
+    """
+    SQLite backed queue that survives process restarts
+
+    Pending tasks left over from a previous process are resumed on start.
+    """
+
+    def __init__(self, handler: TaskHandler, db_path: str = "pmo_tasks.db",
+                 max_workers: int = 2):
+        self.handler = handler
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="pmo-task")
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id TEXT PRIMARY KEY,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'pending',"
+                " error TEXT)"
+            )
+            pending = conn.execute(
+                "SELECT id FROM tasks WHERE status = 'pending'"
+            ).fetchall()
+
+        for (task_id,) in pending:
+            self._executor.submit(self._run, task_id)
+
+    @contextmanager
+    def _connect(self):
+        """Connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        task_id = uuid.uuid4().hex
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO tasks (id, payload) VALUES (?, ?)",
+                (task_id, json.dumps(payload, ensure_ascii=False))
+            )
+
+        self._executor.submit(self._run, task_id)
+        return task_id
+
+    def get_status(self, task_id: str) -> Optional[str]:
+        """Get task status ('pending', 'done', 'failed') or None if unknown"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _run(self, task_id: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT payload FROM tasks WHERE id = ? AND status = 'pending'",
+                (task_id,)
+            ).fetchone()
+
+        if not row:
+            return
+
+        status, error = 'done', None
+        try:
+            self.handler(json.loads(row[0]))
+        except Exception as e:
+            print(f"Task {task_id} failed: {e}")
+            status, error = 'failed', str(e)
+
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = ?, error = ? WHERE id = ?",
+                (status, error, task_id)
+            )
+
+
+class CloudTasksQueue(TaskQueue):
+    """
+    Google Cloud Tasks queue that POSTs each payload back to this function
+
+    The target URL should route to `handle_task` (e.g. <function-url>/tasks).
+    """
+
+    def __init__(self,
+                 project_id: str,
+                 location: str,
+                 queue_name: str,
+                 target_url: str,
+                 service_account_email: Optional[str] = None,
+                 auth_token: Optional[str] = None,
+                 credentials=None):
+        """
+        Initialize Cloud Tasks client
+
+        Args:
+            project_id: GCP project ID
+            location: Cloud Tasks queue location
+            queue_name: Cloud Tasks queue name
+            target_url: URL that Cloud Tasks delivers the task to
+            service_account_email: Service account used for the OIDC token (optional)
+            auth_token: Shared secret sent as X-PMO-Task-Token header (optional)
+            credentials: Google credentials (uses default credentials if None)
+        """
+        from tools.credentials import get_credentials
+        from tools.transport import build_service
+
+        if credentials is None:
+            credentials = get_credentials()
+
+        self.parent = f"projects/{project_id}/locations/{location}/queues/{queue_name}"
+        self.target_url = target_url
+        self.service_account_email = service_account_email
+        self.auth_token = auth_token
+        self.service = build_service('cloudtasks', 'v2', credentials)
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        headers = {'Content-Type': 'application/json'}
+        if self.auth_token:
+            headers['X-PMO-Task-Token'] = self.auth_token
+
+        http_request = {
+            'httpMethod': 'POST',
+            'url': self.target_url,
+            'headers': headers,
+            'body': base64.b64encode(
+                json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            ).decode('ascii')
+        }
+
+        if self.service_account_email:
+            http_request['oidcToken'] = {
+                'serviceAccountEmail': self.service_account_email
+            }
+
+        task = self.service.projects().locations().queues().tasks().create(
+            parent=self.parent,
+            body={'task': {'httpRequest': http_request}}
+        ).execute()
+
+        return task.get('name', '')
+
+
+def create_task_queue(handler: TaskHandler) -> TaskQueue:
+    """
+    Create a task queue from environment configuration
+
+    TASK_QUEUE_BACKEND selects 'memory' (default), 'sqlite' or 'cloudtasks'.
+
+    Args:
+        handler: Function that executes a task payload (used by local backends)
+
+    Returns:
+        TaskQueue instance
+    """
+    backend = os.getenv('TASK_QUEUE_BACKEND', 'memory').lower()
+
+    if backend == 'cloudtasks':
+        if not os.getenv('TASK_AUTH_TOKEN'):
+            raise ValueError("TASK_AUTH_TOKEN is required for the cloudtasks backend (/tasks rejects unauthenticated deliveries)")
+        return CloudTasksQueue(
+            project_id=os.getenv('GCP_PROJECT_ID'),
+            location=os.getenv('TASK_QUEUE_LOCATION', 'us-central1'),
+            queue_name=os.getenv('TASK_QUEUE_NAME', 'pmo-agent-tasks'),
+            target_url=os.getenv('TASK_TARGET_URL'),
+            service_account_email=os.getenv('TASK_SERVICE_ACCOUNT'),
+            auth_token=os.getenv('TASK_AUTH_TOKEN')
+        )
+
+    if backend == 'sqlite':
+        return SQLiteTaskQueue(
+            handler,
+            db_path=os.getenv('TASK_QUEUE_DB', 'pmo_tasks.db')
+        )
+
+    return InMemoryTaskQueue(handler)
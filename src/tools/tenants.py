@@ -0,0 +1,191 @@
+"""
+Multi-project Tenant Registry for myPMO Agent
+Maps Google Chat spaces to spreadsheets and keeps an LRU pool of per-tenant SheetsClients
+"""
+
+import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Any, Optional
+
+from tools import tracing
+
+
+class Tenant:
+    """One project: its spreadsheet, sheet names and daily AI quota"""
+
+    def __init__(self,
+                 tenant_id: str,
+                 spreadsheet_id: str,
+                 issue_sheet_name: str = "Issues",
+                 schedule_sheet_name: str = "Schedule",
+                 daily_limit: Optional[int] = None,
+                 spaces: Optional[list] = None):
+        """
+        Args:
+            tenant_id: Project identifier
+            spreadsheet_id: Google Spreadsheet ID
+            issue_sheet_name: Name of Issue Log sheet
+            schedule_sheet_name: Name of Schedule sheet
+            daily_limit: Max /ask requests per day for this project (None = no per-project limit)
+            spaces: Chat space names (e.g., "spaces/AAAA") served by this project
+        """
+        self.tenant_id = tenant_id
+        self.spreadsheet_id = spreadsheet_id
+        self.issue_sheet_name = issue_sheet_name
+        self.schedule_sheet_name = schedule_sheet_name
+        self.daily_limit = daily_limit
+        self.spaces = spaces or []
+
+    @classmethod
+    def from_dict(cls, tenant_id: str, config: Dict[str, Any]) -> "Tenant":
+        return cls(
+            tenant_id=tenant_id,
+            spreadsheet_id=config['spreadsheet_id'],
+            issue_sheet_name=config.get('issue_sheet_name', 'Issues'),
+            schedule_sheet_name=config.get('schedule_sheet_name', 'Schedule'),
+            daily_limit=config.get('daily_limit'),
+            spaces=config.get('spaces', [])
+        )
+
+
+class TenantRegistry:
+    """
+    Resolve tenants by Chat space and pool their SheetsClients
+
+    Clients (and the caches they own) are created lazily and evicted
+    least-recently-used once more than max_clients are alive.
+    """
+
+    def __init__(self,
+                 tenants: Dict[str, Tenant],
+                 default_tenant_id: Optional[str] = None,
+                 max_clients: int = 8,
+                 client_factory: Optional[Callable[[Tenant], Any]] = None):
+        """
+        Args:
+            tenants: Mapping of tenant ID to Tenant
+            default_tenant_id: Tenant used for unknown spaces (None = reject)
+            max_clients: Maximum number of live SheetsClients
+            client_factory: Creates a SheetsClient for a tenant
+        """
+        self.tenants = tenants
+        self.default_tenant_id = default_tenant_id
+        self.max_clients = max_clients
+        self.client_factory = client_factory
+        self._space_index = {
+            space: tenant.tenant_id
+            for tenant in tenants.values() for space in tenant.spaces
+        }
+        self._clients: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._usage: Dict[str, int] = {}
+        self._usage_date = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **kwargs) -> "TenantRegistry":
+        """
+        Build a registry from a config dict
+
+        Format:
+            {"default": "project-a",
+             "max_clients": 8,
+             "tenants": {"project-a": {"spreadsheet_id": "...", "spaces": ["spaces/AAAA"],
+                                       "issue_sheet_name": "Issues", "daily_limit": 100}}}
+        """
+        tenants = {
+            tenant_id: Tenant.from_dict(tenant_id, tenant_config)
+            for tenant_id, tenant_config in config.get('tenants', {}).items()
+        }
+        kwargs.setdefault('max_clients', config.get('max_clients', 8))
+        return cls(tenants, default_tenant_id=config.get('default'), **kwargs)
+
+    def resolve(self, space_name: Optional[str], fallback: bool = True) -> Optional[Tenant]:
+        """
+        Find the tenant serving a Chat space
+
+        Args:
+            space_name: Space resource name from the Chat event (may be None)
+            fallback: Serve unknown spaces from the default tenant (False: None
+                for a named space that is not mapped)
+
+        Returns:
+            Tenant, the default tenant for unknown spaces, or None
+        """
+        tenant_id = self._space_index.get(space_name) if space_name else None
+        if tenant_id is None and space_name and not fallback:
+            return None
+        tenant_id = tenant_id or self.default_tenant_id
+        return self.tenants.get(tenant_id) if tenant_id else None
+
+    def get_sheets_client(self, tenant: Tenant):
+        """Get (or lazily create) the SheetsClient for a tenant"""
+        with self._lock:
+            client = self._clients.get(tenant.tenant_id)
+            if client is not None:
+                self._clients.move_to_end(tenant.tenant_id)
+                tracing.record_cache("tenant_client", hit=True)
+                return client
+
+        tracing.record_cache("tenant_client", hit=False)
+        client = self.client_factory(tenant)
+
+        with self._lock:
+            # Another thread may have created it meanwhile; keep the first one
+            existing = self._clients.get(tenant.tenant_id)
+            if existing is not None:
+                return existing
+
+            self._clients[tenant.tenant_id] = client
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+        return client
+
+    def consume_quota(self, tenant: Tenant) -> bool:
+        """
+        Count one AI request against the tenant's daily limit
+
+        Returns:
+            True if allowed, False if the tenant's limit is exhausted
+        """
+        with self._lock:
+            today = datetime.now().date()
+            if self._usage_date != today:
+                self._usage = {}
+                self._usage_date = today
+
+            used = self._usage.get(tenant.tenant_id, 0)
+            if tenant.daily_limit is not None and used >= tenant.daily_limit:
+                return False
+
+            self._usage[tenant.tenant_id] = used + 1
+            return True
+
+    def refund_quota(self, tenant: Tenant):
+        """Give back one request (e.g. when the AI call failed)"""
+        with self._lock:
+            used = self._usage.get(tenant.tenant_id, 0)
+            if used:
+                self._usage[tenant.tenant_id] = used - 1
+
+
+def load_tenant_config() -> Optional[Dict[str, Any]]:
+    """
+    Load tenant config from TENANTS_CONFIG (JSON file path) or TENANTS_JSON (inline JSON)
+
+    Returns:
+        Config dict, or None when single-project mode is used
+    """
+    path = os.getenv('TENANTS_CONFIG')
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    inline = os.getenv('TENANTS_JSON')
+    if inline:
+        return json.loads(inline)
+
+    return None
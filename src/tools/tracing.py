@@ -0,0 +1,213 @@
+"""
+Request-scoped Tracing for myPMO Agent
+Collects per-stage timings and emits one structured JSON log line per request
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import contextvars
+from typing import Callable, Dict, Any, Optional
+
+
+TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+
+_current_trace = contextvars.ContextVar('pmo_trace', default=None)
+
+
+def _stdout_sink(record: Dict[str, Any]):
+    """Write a Cloud Logging compatible JSON line to stdout"""
+    sys.stdout.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    sys.stdout.flush()
+
+
+_sink: Callable[[Dict[str, Any]], None] = _stdout_sink
+
+
+class _NoopSpan:
+    """Shared span returned when tracing is off (no allocation per call)"""
+
+    active = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key: str, amount: float = 1):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Timed stage within a trace"""
+
+    active = True
+
+    def __init__(self, trace: "Trace", name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration_ms = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self.start) * 1000
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.trace.spans.append(self)
+        return False
+
+    def set(self, **attrs):
+        """Attach attributes (row counts, bytes, token counts...)"""
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float = 1):
+        """Increment a numeric attribute"""
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        record = {
+            'name': self.name,
+            'start_ms': round((self.start - self.trace.start) * 1000, 3),
+            'duration_ms': round(self.duration_ms, 3)
+        }
+        record.update(self.attrs)
+        return record
+
+
+class Trace:
+    """All spans recorded for one request"""
+
+    active = True
+
+    def __init__(self, name: str, trace_id: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.spans = []
+        self.counters: Dict[str, float] = {}
+        self.start = 0.0
+        self._token = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        total_ms = (time.perf_counter() - self.start) * 1000
+        _current_trace.reset(self._token)
+
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+
+        _sink(self.to_record(total_ms))
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float = 1):
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def to_record(self, total_ms: float) -> Dict[str, Any]:
+        """Build the structured log entry"""
+        record = {
+            'severity': 'ERROR' if 'error' in self.attrs else 'INFO',
+            'message': f"trace {self.name} {total_ms:.1f}ms",
+            'trace_name': self.name,
+            'trace_id': self.trace_id,
+            'total_ms': round(total_ms, 3),
+            'spans': [s.to_dict() for s in self.spans],
+            'counters': self.counters
+        }
+
+        project_id = os.getenv('GCP_PROJECT_ID')
+        if project_id:
+            record['logging.googleapis.com/trace'] = f"projects/{project_id}/traces/{self.trace_id}"
+
+        record.update(self.attrs)
+        return record
+
+
+def trace(name: str, trace_header: Optional[str] = None, **attrs):
+    """
+    Start a request-scoped trace
+
+    Args:
+        name: Trace name (e.g., "chat_message")
+        trace_header: X-Cloud-Trace-Context header value (optional)
+        **attrs: Extra attributes for the log entry
+
+    Returns:
+        Context manager; a shared no-op object when tracing is disabled
+    """
+    if not TRACING_ENABLED:
+        return _NOOP_SPAN
+
+    trace_id = trace_header.split('/')[0] if trace_header else uuid.uuid4().hex
+    return Trace(name, trace_id, attrs)
+
+
+def span(name: str, **attrs):
+    """
+    Time a stage of the current trace
+
+    Args:
+        name: Stage name (e.g., "sheets.read")
+        **attrs: Initial attributes
+
+    Returns:
+        Context manager; a shared no-op object outside an active trace
+    """
+    current = _current_trace.get()
+    if current is None:
+        return _NOOP_SPAN
+    return Span(current, name, attrs)
+
+
+def current_trace():
+    """Get the active trace (or the no-op object)"""
+    return _current_trace.get() or _NOOP_SPAN
+
+
+def record_cache(cache_name: str, hit: bool):
+    """Count a cache hit or miss on the active trace"""
+    current = _current_trace.get()
+    if current is not None:
+        current.add(f"cache.{cache_name}.{'hit' if hit else 'miss'}")
+
+
+def emit(record: Dict[str, Any]):
+    """Write a structured log record that is not tied to a request (e.g. periodic reports)"""
+    _sink(record)
+
+
+def set_enabled(enabled: bool):
+    """Toggle tracing at runtime (benchmarks, load tests)"""
+    global TRACING_ENABLED
+    TRACING_ENABLED = enabled
+
+
+def set_sink(sink: Optional[Callable[[Dict[str, Any]], None]]):
+    """
+    Replace the log sink
+
+    Args:
+        sink: Callable receiving each trace record (None restores stdout)
+    """
+    global _sink
+    _sink = sink or _stdout_sink
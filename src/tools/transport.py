@@ -0,0 +1,196 @@
+"""
+Shared HTTP Transport for Google API clients
+Pooled keep-alive connections reused by every googleapiclient service in the process
+"""
+
+import os
+import threading
+from typing import Dict, Any, Tuple
+
+import httplib2
+import requests
+from google.auth.transport.requests import AuthorizedSession, Request as AuthRequest
+from googleapiclient.discovery import build
+
+from tools import tracing
+
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))
+HTTP2_ENABLED = os.getenv('HTTP2_ENABLED', 'false').lower() == 'true'
+
+USER_AGENT = 'my-pmo-agent'
+
+# Same policy as AuthorizedSession: refresh the token and retry once on these
+_REFRESH_STATUS_CODES = (401,)
+_MAX_REFRESH_ATTEMPTS = 2
+
+# Hop-by-hop / already-decoded headers that must not be passed to googleapiclient
+_DROP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+_lock = threading.Lock()
+_transports: Dict[int, "PooledHttp"] = {}
+
+
+def _to_httplib2_response(status: int, reason: str, headers) -> httplib2.Response:
+    """Convert a status and header mapping to the response type googleapiclient expects"""
+    info = {k.lower(): v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+    info['status'] = str(status)
+    response = httplib2.Response(info)
+    response.reason = reason or ''
+    return response
+
+
+def _prepare_headers(headers) -> Dict[str, str]:
+    """
+    Copy request headers, keeping our User-Agent in front of googleapiclient's
+
+    googleapiclient already asks for gzip (accept-encoding plus the "(gzip)"
+    User-Agent suffix Google APIs require); both are preserved here.
+    """
+    headers = dict(headers or {})
+    for key in list(headers):
+        if key.lower() == 'user-agent' and USER_AGENT not in headers[key]:
+            headers[key] = f"{USER_AGENT} {headers[key]}"
+    return headers
+
+
+def _record_wire_bytes(headers, content: bytes):
+    """Count response bytes on the wire (compressed size when gzip was used)"""
+    trace = tracing.current_trace()
+    wire = headers.get('content-length') if headers.get('content-encoding') else None
+    trace.add('http.wire_bytes', int(wire) if wire else len(content))
+    trace.add('http.body_bytes', len(content))
+
+
+class PooledHttp:
+    """
+    httplib2.Http compatible adapter over a pooled requests AuthorizedSession
+
+    Unlike httplib2.Http, a single instance is safe to share between threads,
+    so one set of keep-alive TLS connections serves every concurrent request.
+    """
+
+    def __init__(self, credentials, pool_size: int = HTTP_POOL_SIZE,
+                 timeout: float = HTTP_TIMEOUT):
+        """
+        Args:
+            credentials: google.auth credentials used to authorize requests
+            pool_size: Maximum keep-alive connections per host
+            timeout: Per-request timeout in seconds
+        """
+        self.credentials = credentials
+        self.timeout = timeout
+        self.session = AuthorizedSession(credentials)
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False
+        )
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+
+    def request(self, uri: str, method: str = 'GET', body=None, headers=None,
+                redirections: int = 5, connection_type=None) -> Tuple[httplib2.Response, bytes]:
+        """Perform a request (httplib2.Http.request signature)"""
+        response = self.session.request(
+            method, uri, data=body, headers=_prepare_headers(headers),
+            timeout=self.timeout, allow_redirects=redirections > 0
+        )
+        _record_wire_bytes(response.headers, response.content)
+        return _to_httplib2_response(response.status_code, response.reason, response.headers), response.content
+
+    def close(self):
+        """No-op: the pool is shared and lives for the whole process"""
+
+
+class Http2Http(PooledHttp):
+    """
+    HTTP/2 variant backed by httpx (opt-in: HTTP2_ENABLED=true and httpx[http2] installed)
+
+    All requests to a host are multiplexed over one connection. Like
+    AuthorizedSession, a 401 refreshes the credentials and retries.
+    """
+
+    def __init__(self, credentials, pool_size: int = HTTP_POOL_SIZE,
+                 timeout: float = HTTP_TIMEOUT):
+        import httpx
+
+        self.credentials = credentials
+        self.timeout = timeout
+        self._auth_request = AuthRequest()
+        self._refresh_lock = threading.Lock()
+        self.client = httpx.Client(
+            http2=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            headers={'User-Agent': USER_AGENT}
+        )
+
+    def request(self, uri: str, method: str = 'GET', body=None, headers=None,
+                redirections: int = 5, connection_type=None) -> Tuple[httplib2.Response, bytes]:
+        for attempt in range(1, _MAX_REFRESH_ATTEMPTS + 1):
+            request_headers = _prepare_headers(headers)
+            with self._refresh_lock:
+                self.credentials.before_request(self._auth_request, method, uri, request_headers)
+
+            response = self.client.request(
+                method, uri, content=body, headers=request_headers,
+                follow_redirects=redirections > 0
+            )
+            if response.status_code not in _REFRESH_STATUS_CODES or attempt == _MAX_REFRESH_ATTEMPTS:
+                break
+
+            # The token was rejected before its recorded expiry (revoked, clock skew)
+            with self._refresh_lock:
+                self.credentials.refresh(self._auth_request)
+        _record_wire_bytes(response.headers, response.content)
+        return _to_httplib2_response(response.status_code, response.reason_phrase, response.headers), response.content
+
+
+def _http2_available() -> bool:
+    try:
+        import httpx  # noqa: F401
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http(credentials) -> PooledHttp:
+    """
+    Get the process-wide pooled transport for a set of credentials
+
+    Args:
+        credentials: google.auth credentials
+
+    Returns:
+        Shared PooledHttp (or Http2Http when HTTP/2 is enabled and available)
+    """
+    key = id(credentials)
+    http = _transports.get(key)
+    if http is not None:
+        return http
+
+    with _lock:
+        http = _transports.get(key)
+        if http is None:
+            transport_class = Http2Http if HTTP2_ENABLED and _http2_available() else PooledHttp
+            http = _transports[key] = transport_class(credentials)
+    return http
+
+
+def build_service(service_name: str, version: str, credentials, **kwargs: Any):
+    """
+    Build a googleapiclient service on the shared pooled transport
+
+    Args:
+        service_name: API name (e.g., "sheets")
+        version: API version (e.g., "v4")
+        credentials: google.auth credentials
+        **kwargs: Extra arguments for googleapiclient.discovery.build
+
+    Returns:
+        Service resource
+    """
+    return build(service_name, version, http=get_http(credentials),
+                 cache_discovery=False, **kwargs)
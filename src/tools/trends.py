@@ -0,0 +1,175 @@
+"""
+Trend Queries for myPMO Agent
+Time-series metrics over archived snapshots (see tools/history.py)
+
+Each distinct sheet file is memory-mapped once, however many captures share
+it; the per-capture counts are then computed in one vectorized pass over
+(capture, row) pairs instead of a Python loop per snapshot.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools import tracing
+
+
+# Questions that ask how things changed over time
+TREND_KEYWORDS = ('推移', '傾向', 'トレンド', '増え', '減っ', '悪化', '改善', '先週', '先月', '週次', '月次')
+
+
+def wants_trends(query: str) -> bool:
+    """True when an /ask question is about change over time"""
+    return any(keyword in query for keyword in TREND_KEYWORDS)
+
+
+def daily_captures(captures: List[Dict[str, str]], days: Optional[int] = None,
+                   today: Optional[date] = None) -> List[Tuple[date, Dict[str, str]]]:
+    """
+    Keep the last capture of each day
+
+    Args:
+        captures: Manifest entries, oldest first
+        days: Only the last N days (None = all)
+        today: Reference date (default: today, UTC)
+
+    Returns:
+        [(day, entry)] oldest first
+    """
+    by_day: Dict[date, Dict[str, str]] = {}
+    for entry in captures:
+        by_day[datetime.fromisoformat(entry['taken_at']).astimezone(timezone.utc).date()] = entry
+    if days is not None:
+        start = (today or datetime.now(timezone.utc).date()) - timedelta(days=days - 1)
+        by_day = {day: entry for day, entry in by_day.items() if day >= start}
+    return sorted(by_day.items())
+
+
+class TrendQuery:
+    """
+    Vectorized time-series metrics over a SnapshotArchive
+
+    Series are returned as {'dates': [ISO dates], 'series': {label: [counts]}},
+    one point per day with a capture.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def _expand(self, sheet: str, captures: List[Tuple[date, Dict[str, str]]],
+                columns: List[str]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Rows of every capture, repeated per capture
+
+        Returns:
+            (capture index per row, {column: values per row}); string columns are
+            object arrays ('' for blanks), date columns datetime64[D] (NaT for blanks)
+        """
+        digests = list(dict.fromkeys(entry[sheet] for _, entry in captures))
+        file_index = {digest: i for i, digest in enumerate(digests)}
+
+        tables = [self.archive.read(sheet, digest, columns) for digest in digests]
+        lengths = np.array([t.num_rows for t in tables], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+
+        merged: Dict[str, np.ndarray] = {}
+        for column in columns:
+            parts = [None] * len(tables)
+            for i, table in enumerate(tables):
+                if column in table.column_names:
+                    values = table.column(column).to_numpy(zero_copy_only=False)
+                    if values.dtype.kind == 'M':
+                        parts[i] = values.astype('datetime64[D]')
+                    else:
+                        parts[i] = np.array(['' if v is None else v for v in values], dtype=object)
+            # Files from before a column existed get blanks of the column's type
+            is_date = any(p is not None and p.dtype.kind == 'M' for p in parts)
+            parts = [p if p is not None else
+                     np.full(n, np.datetime64('NaT'), dtype='datetime64[D]') if is_date else
+                     np.full(n, '', dtype=object)
+                     for p, n in zip(parts, lengths)]
+            merged[column] = np.concatenate(parts)
+
+        # Row ranges of each capture's file, laid end to end
+        files = np.array([file_index[entry[sheet]] for _, entry in captures], dtype=np.int64)
+        counts = lengths[files]
+        capture_of_row = np.repeat(np.arange(len(captures)), counts)
+        starts = np.repeat(offsets[files] - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts)
+        rows = starts + np.arange(counts.sum())
+
+        return capture_of_row, {column: values[rows] for column, values in merged.items()}
+
+    @staticmethod
+    def _series(captures, capture_of_row: np.ndarray, labels: np.ndarray) -> Dict[str, Any]:
+        labels = np.where(labels == '', '不明', labels)
+        names, codes = np.unique(labels.astype(str), return_inverse=True)
+        grid = np.bincount(capture_of_row * len(names) + codes,
+                           minlength=len(captures) * len(names)).reshape(len(captures), len(names))
+        return {
+            'dates': [day.isoformat() for day, _ in captures],
+            'series': {str(name): grid[:, i].tolist() for i, name in enumerate(names)}
+        }
+
+    def count_by(self, sheet: str, field: str, days: Optional[int] = 30,
+                 today: Optional[date] = None) -> Dict[str, Any]:
+        """Rows per value of a column, per day (e.g. issues by ステータス)"""
+        captures = daily_captures(self.archive.captures(), days, today)
+        with tracing.span("trends.count_by", sheet=sheet, captures=len(captures)):
+            if not captures:
+                return {'dates': [], 'series': {}}
+            capture_of_row, columns = self._expand(sheet, captures, [field])
+            return self._series(captures, capture_of_row, columns[field])
+
+    def overdue_by(self, field: str = 'ベンダー名', days: Optional[int] = 30,
+                   today: Optional[date] = None) -> Dict[str, Any]:
+        """
+        Open issues past their 期限 as of each capture day, per value of a column
+
+        Uses the same rule as /risk-alert: 期限 before the day and ステータス not 完了.
+        """
+        captures = daily_captures(self.archive.captures(), days, today)
+        with tracing.span("trends.overdue_by", captures=len(captures)):
+            if not captures:
+                return {'dates': [], 'series': {}}
+            capture_of_row, columns = self._expand('issues', captures, [field, '期限', 'ステータス'])
+            as_of = np.array([np.datetime64(day, 'D') for day, _ in captures])[capture_of_row]
+            deadline = columns['期限']
+            if deadline.dtype.kind != 'M':  # no capture had the column
+                deadline = np.full(len(deadline), np.datetime64('NaT'), dtype='datetime64[D]')
+            mask = (deadline < as_of) & (columns['ステータス'] != '完了')
+            return self._series(captures, capture_of_row[mask], columns[field][mask])
+
+
+def _describe(series: Dict[str, Any], limit: int = 8) -> str:
+    """'label first→last (max N)' for each label with any non-zero count"""
+    parts = []
+    for name, values in sorted(series['series'].items(), key=lambda kv: -kv[1][-1]):
+        if not any(values):
+            continue
+        part = f"{name} {values[0]}→{values[-1]}"
+        if max(values) > max(values[0], values[-1]):
+            part += f" (最大{max(values)})"
+        parts.append(part)
+    return '、'.join(parts[:limit]) or 'なし'
+
+
+def trend_summary(archive, days: int = 30, today: Optional[date] = None) -> str:
+    """
+    Compact text of the main trends, for the /ask prompt
+
+    Returns:
+        A few lines of 'first→last' counts, or '' when fewer than two days were captured
+    """
+    query = TrendQuery(archive)
+    overdue = query.overdue_by('ベンダー名', days, today)
+    if len(overdue['dates']) < 2:
+        return ''
+    status = query.count_by('issues', 'ステータス', days, today)
+    tasks = query.count_by('tasks', 'ステータス', days, today)
+    return (
+        f"期間: {overdue['dates'][0]}〜{overdue['dates'][-1]}（{len(overdue['dates'])}日分）\n"
+        f"期限超過の課題（ベンダー別）: {_describe(overdue)}\n"
+        f"課題ステータス: {_describe(status)}\n"
+        f"タスクステータス: {_describe(tasks)}"
+    )
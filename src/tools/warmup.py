@@ -0,0 +1,91 @@
+"""
+Cache Prewarming for myPMO Agent
+Fills the snapshot, derived reports and duplicate index of a spreadsheet
+ahead of interactive requests (warm-up pings and sheet-change notifications)
+"""
+
+import re
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from tools import tracing
+from tools.dedup_index import duplicate_checker_for
+from tools.history import snapshot_archive_for
+from tools.snapshot import risk_report, rollups, snapshot_cache_for
+
+
+# Drive push notifications identify the file only through this URI
+_DRIVE_FILE_ID = re.compile(r'/files/([A-Za-z0-9_-]+)')
+
+
+def prewarm_sheets(sheets_client, changed: bool = False, changed_sheet: Optional[str] = None,
+                   header_changed: bool = False) -> Dict[str, Any]:
+    """
+    Read a spreadsheet into every cache an interactive request would use
+
+    Args:
+        sheets_client: SheetsClient of the spreadsheet
+        changed: The spreadsheet changed; drop the cached snapshot first
+            (False = warm-up, an unexpired snapshot is kept)
+        changed_sheet: Sheet that changed, if known
+        header_changed: The header row was edited; re-read the column layout too
+
+    Returns:
+        Dict with the snapshot version, row counts and elapsed milliseconds
+    """
+    started = time.perf_counter()
+
+    with tracing.span("warmup.sheets", sheet=changed_sheet or ''):
+        if header_changed:
+            sheets_client.schema.invalidate(changed_sheet)
+
+        cache = snapshot_cache_for(sheets_client)
+        if changed or header_changed:
+            cache.invalidate()
+
+        snapshot = cache.get()
+        snapshot.derived('risks', risk_report)
+        snapshot.derived('rollups', rollups)
+        duplicate_checker_for(sheets_client).refresh(force=changed or header_changed)
+
+        # Each new sheet state is kept for trend queries (HISTORY_DIR)
+        archive = snapshot_archive_for(sheets_client)
+        if archive is not None:
+            archive.archive(snapshot)
+
+    return {
+        'version': snapshot.version,
+        'issues': len(snapshot.issues),
+        'tasks': len(snapshot.tasks),
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def parse_change_notification(headers: Mapping[str, str],
+                              body: Optional[Dict[str, Any]]) -> Optional[Tuple[Optional[str], Optional[str], bool]]:
+    """
+    Extract what changed from a sheet-change notification
+
+    Two senders are understood:
+      - Apps Script onEdit trigger: JSON {"spreadsheet_id", "sheet", "row"}
+      - Drive push notification (files.watch): X-Goog-Resource-State /
+        X-Goog-Resource-URI headers, no body
+
+    Returns:
+        (spreadsheet_id or None, sheet name or None, header row edited),
+        or None for notifications that carry no change (Drive 'sync' handshake)
+    """
+    state = headers.get('X-Goog-Resource-State')
+    if state is not None:
+        if state == 'sync':
+            return None
+        match = _DRIVE_FILE_ID.search(headers.get('X-Goog-Resource-URI', ''))
+        return (match.group(1) if match else None), None, False
+
+    body = body or {}
+    row = body.get('row')
+    try:
+        header_changed = row is not None and int(row) == 1
+    except (TypeError, ValueError):
+        header_changed = False
+    return body.get('spreadsheet_id'), body.get('sheet'), header_changed
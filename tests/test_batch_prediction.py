@@ -0,0 +1,151 @@
+"""
+Test the nightly per-vendor batch prediction job (offline, local backend, fake Firestore)
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+sys.path.append(os.path.dirname(__file__))
+
+from fakes import FakeFirestore, FakeGenerativeModel
+from brain import batch_prediction
+from brain.gemini_client import GeminiClient
+from brain.model_router import ModelEndpoint, ModelRouter
+from brain.batch_prediction import (FirestoreBatchResultStore, LocalBatchBackend, SQLiteBatchResultStore,
+                                    VendorBatchJob, create_vendor_batch_job, parse_output_line, request_key,
+                                    vendor_prompts)
+from brain.resilience import CircuitBreaker
+from tools.snapshot import SnapshotCache
+from test_offline_clients import make_sheets_client
+
+
+def _gemini(model=None):
+    return GeminiClient(project_id='test', model_name='fake', model=model or FakeGenerativeModel())
+
+
+def test_one_prompt_per_vendor():
+    """Each vendor's prompt only carries that vendor's rows"""
+    snapshot = SnapshotCache(make_sheets_client()).get()
+    prompts = vendor_prompts(snapshot.issues, snapshot.tasks, _gemini())
+
+    assert list(prompts) == ['ベンダーA', 'ベンダーB']
+    assert 'API連携エラー' in prompts['ベンダーA']
+    assert 'API連携エラー' not in prompts['ベンダーB']
+
+
+def test_submit_and_collect_store_results_per_vendor():
+    """One job for all vendors; results are matched back by request and stored"""
+    model = FakeGenerativeModel()
+    gemini = _gemini(model)
+    snapshot = SnapshotCache(make_sheets_client()).get()
+    remaining = gemini.get_remaining_requests()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        job = VendorBatchJob(LocalBatchBackend(gemini, tmp), SQLiteBatchResultStore(os.path.join(tmp, 'r.db')))
+        run = job.submit('sheet-1', snapshot, gemini)
+        assert run['vendors'] == 2 and model.calls == 2
+
+        assert job.collect(gemini) == {run['run_id']: 'done'}
+        assert job.collect(gemini) == {}
+
+        finished_at, results = job.store.latest_results('sheet-1')
+        assert finished_at is not None
+        assert results['ベンダーA']['next_action'] == FakeGenerativeModel.DEFAULT_ANSWER['next_action']
+        assert job.store.latest_results('other-sheet') == (None, {})
+
+        # Local calls are real model calls and count against the daily limit
+        assert gemini.get_remaining_requests() == remaining - 2
+
+
+def test_firestore_results_are_read_by_other_instances():
+    """A run submitted and collected on one instance is visible to another"""
+    db = FakeFirestore()
+    gemini = _gemini()
+    snapshot = SnapshotCache(make_sheets_client()).get()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        job = VendorBatchJob(LocalBatchBackend(gemini, tmp), FirestoreBatchResultStore(client=db))
+        run = job.submit('sheet-1', snapshot, gemini)
+        assert [r[0] for r in FirestoreBatchResultStore(client=db).running_runs()] == [run['run_id']]
+        assert job.collect(gemini) == {run['run_id']: 'done'}
+
+    other = FirestoreBatchResultStore(client=db)
+    finished_at, results = other.latest_results('sheet-1')
+    assert finished_at is not None and list(results) == ['ベンダーA', 'ベンダーB']
+    assert other.running_runs() == []
+    assert other.latest_results('other-sheet') == (None, {})
+
+
+def test_local_backend_respects_breaker_and_vertex_needs_a_bucket():
+    """An open breaker fails the lines without calling the model; vertex fails clearly without a bucket"""
+    model = FakeGenerativeModel()
+    gemini = _gemini(model)
+    gemini.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    gemini.breaker.record_failure()
+    snapshot = SnapshotCache(make_sheets_client()).get()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        job = VendorBatchJob(LocalBatchBackend(gemini, tmp), SQLiteBatchResultStore(os.path.join(tmp, 'r.db')))
+        job.submit('sheet-1', snapshot, gemini)
+        job.collect(gemini)
+        _, results = job.store.latest_results('sheet-1')
+    assert model.calls == 0
+    assert all('circuit breaker' in r['error'] for r in results.values())
+
+    error = None
+    try:
+        create_vendor_batch_job(gemini, store=FirestoreBatchResultStore(client=FakeFirestore()))
+    except ValueError as e:
+        error = e
+    assert error is not None and 'BATCH_GCS_PREFIX' in str(error)
+
+
+def test_output_line_errors_are_kept_per_vendor():
+    """A failed line or unparsable answer becomes that vendor's error"""
+    line = {"request": {"contents": [{"role": "user", "parts": [{"text": "prompt"}]}]}, "status": "quota exceeded"}
+    assert parse_output_line(line) == (request_key("prompt"), None, "quota exceeded")
+
+    line = {**line, "status": "", "response": {"candidates": [{"content": {"parts": [{"text": "{\"a\": 1}"}]}}]}}
+    assert parse_output_line(line) == (request_key("prompt"), '{"a": 1}', None)
+
+    model = FakeGenerativeModel(fail_rate=1.0)
+    snapshot = SnapshotCache(make_sheets_client()).get()
+    with tempfile.TemporaryDirectory() as tmp:
+        gemini = _gemini(model)
+        job = VendorBatchJob(LocalBatchBackend(gemini, tmp), SQLiteBatchResultStore(os.path.join(tmp, 'r.db')))
+        job.submit('sheet-1', snapshot, gemini)
+        job.collect(gemini)
+        _, results = job.store.latest_results('sheet-1')
+        assert set(results) == {'ベンダーA', 'ベンダーB'}
+        assert all('error' in r for r in results.values())
+
+
+def test_both_backends_use_the_vendor_tier_model():
+    """The Vertex job and the local stand-in answer on the same tier's model"""
+    gemini = _gemini()
+    gemini.router = ModelRouter({'flash': [ModelEndpoint("gemini-2.5-flash@us-central1", FakeGenerativeModel())],
+                                 'pro': [ModelEndpoint("gemini-2.5-pro@us-central1", FakeGenerativeModel())]})
+    store = FirestoreBatchResultStore(client=FakeFirestore())
+
+    saved = batch_prediction.BATCH_BACKEND, batch_prediction.BATCH_GCS_PREFIX
+    try:
+        batch_prediction.BATCH_BACKEND, batch_prediction.BATCH_GCS_PREFIX = 'vertex', 'gs://bucket/batch'
+        vertex = create_vendor_batch_job(gemini, store).backend
+        batch_prediction.BATCH_BACKEND = 'local'
+        local = create_vendor_batch_job(gemini, store).backend
+    finally:
+        batch_prediction.BATCH_BACKEND, batch_prediction.BATCH_GCS_PREFIX = saved
+
+    assert vertex.model_name == gemini.router.model_name(local.tier) == 'gemini-2.5-pro'
+
+
+if __name__ == "__main__":
+    test_one_prompt_per_vendor()
+    test_submit_and_collect_store_results_per_vendor()
+    test_firestore_results_are_read_by_other_instances()
+    test_local_backend_respects_breaker_and_vertex_needs_a_bucket()
+    test_output_line_errors_are_kept_per_vendor()
+    test_both_backends_use_the_vendor_tier_model()
+    print("[SUCCESS] All tests passed!")
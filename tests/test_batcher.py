@@ -0,0 +1,68 @@
+"""
+Test micro-batching of concurrent /ask requests (offline, fake model)
+"""
+
+import os
+import sys
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+
+from brain.batcher import MicroBatcher
+from brain.gemini_client import GeminiClient
+from fakes import FakeGenerativeModel
+from test_offline_clients import make_sheets_client
+
+
+def _run_concurrently(fn, args_list):
+    results = [None] * len(args_list)
+
+    def run(i, args):
+        results[i] = fn(*args)
+
+    threads = [threading.Thread(target=run, args=(i, args)) for i, args in enumerate(args_list)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_batches_group_by_key():
+    """Submissions within the window share a batch per key and get their own results"""
+    sent = []
+
+    def send(key, items):
+        sent.append((key, list(items)))
+        return [f"{key}:{item}" for item in items]
+
+    batcher = MicroBatcher(send, window=0.2)
+    results = _run_concurrently(batcher.submit, [("a", 1), ("a", 2), ("b", 3)])
+
+    assert sorted(results) == [("a:1", 2), ("a:2", 2), ("b:3", 1)]
+    assert len(sent) == 2
+
+
+def test_concurrent_asks_share_one_model_call():
+    """Three questions on the same snapshot become one prompt; answers fan out by ID"""
+    answers = [{"id": f"Q{i}", "analysis": f"a{i}", "recommendation": "-", "next_action": f"n{i}"}
+               for i in (1, 2, 3)]
+    model = FakeGenerativeModel(answer={"answers": answers})
+    client = GeminiClient(project_id="test", model=model)
+    client.batcher = MicroBatcher(client._send_batch, window=0.3)
+    sheets = make_sheets_client()
+    issues, tasks = sheets.get_all_issues(), sheets.get_all_schedule_tasks()
+    remaining = client.get_remaining_requests()
+
+    results = _run_concurrently(client.analyze_with_context,
+                                [(q, issues, tasks) for q in ("緊急課題は？", "担当者は？", "期限は？")])
+
+    assert model.calls == 1
+    assert sorted(r['next_action'] for r in results) == ['n1', 'n2', 'n3']
+    assert client.get_remaining_requests() == remaining - 1
+
+
+if __name__ == "__main__":
+    test_batches_group_by_key()
+    test_concurrent_asks_share_one_model_call()
+    print("[SUCCESS] All tests passed!")
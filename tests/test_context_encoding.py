@@ -0,0 +1,74 @@
+"""
+Test prompt context encodings and their selection by token budget (offline)
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from brain.context_encoding import ContextSummary, encode_context, relative_date, render_bullets
+from brain.conversation import estimate_tokens
+
+
+TODAY = date(2025, 11, 10)
+
+
+def _data(n_issues=120, n_tasks=60):
+    issues = [{'ID': str(i), 'ベンダー名': f"ベンダー{'ABC'[i % 3]}", '内容': f'結合テスト不具合{i}',
+               '期限': (TODAY + timedelta(days=i % 10 - 5)).isoformat(), '担当者': ['鈴木', '田中'][i % 2],
+               '優先度': '高' if i % 2 else '中'} for i in range(n_issues)]
+    tasks = [{'タスク': f'タスク{i}', '担当者': '佐藤', 'ステータス': '停滞' if i % 3 == 0 else '進行中'}
+             for i in range(n_tasks)]
+    return ContextSummary.collect(iter(issues), iter(tasks))
+
+
+def test_bullets_keep_the_original_format():
+    """The bullet encoding renders exactly what the prompt used to contain"""
+    summary = ContextSummary.collect(
+        [{'ベンダー名': 'ベンダーA', '内容': 'API連携エラー', '期限': '2025-11-07', '担当者': '鈴木', '優先度': '緊急'},
+         {'優先度': '中'}],
+        [{'タスク': 'SIT環境準備', '担当者': '鈴木', 'ステータス': '停滞'}]
+    )
+    assert render_bullets(summary) == (
+        "## Issue Log (2件)\n優先度別: {'緊急': 1, '中': 1}\n"
+        "\n緊急・高優先度課題 (1件):\n- [ベンダーA] API連携エラー (期限: 2025-11-07, 担当: 鈴木)\n"
+        "\n## Schedule (1タスク)\nステータス別: {'停滞': 1}\n"
+        "\n停滞中タスク (1件):\n- SIT環境準備 (担当: 鈴木)"
+    )
+    assert render_bullets(ContextSummary.collect(None, None)) == "データなし"
+
+
+def test_compact_codes_names_and_dates():
+    """Repeated names get codes, dates become D±days, the header is written once"""
+    assert relative_date('2025/11/07', TODAY) == 'D-3'
+    assert relative_date('2025-11-10', TODAY) == 'D+0'
+    assert relative_date('未定', TODAY) == '未定'
+
+    text = encode_context(_data(), encoding='compact', budget=100000, today=TODAY)
+    assert '略号: V1=ベンダーB P1=田中' in text
+    assert text.count('ベンダー\t内容\t期限\t担当\t優先度') == 1
+    assert 'V1\t結合テスト不具合1\tD-4\tP1\t高' in text
+    assert 'ベンダーB\t' not in text
+
+
+def test_auto_picks_densest_encoding_within_budget():
+    """More rows fit with the compact encoding; small data keeps the cheapest one"""
+    summary = _data()
+    text = encode_context(summary, encoding='auto', budget=600, today=TODAY)
+    assert estimate_tokens(text) <= 600
+    assert text.startswith('基準日')
+    shown = sum(1 for line in text.splitlines() if line.startswith('V'))
+    assert shown > 5
+    assert shown > sum(1 for line in encode_context(summary, 'table', 600, TODAY).splitlines()
+                       if line.startswith('ベンダー') and '\t結合' in line)
+
+    small = ContextSummary.collect([{'ベンダー名': 'ベンダーA', '内容': '課題', '期限': '', '担当者': '鈴木', '優先度': '高'}], [])
+    assert encode_context(small, encoding='auto', budget=600, today=TODAY) == render_bullets(small)
+
+
+if __name__ == "__main__":
+    test_bullets_keep_the_original_format()
+    test_compact_codes_names_and_dates()
+    test_auto_picks_densest_encoding_within_budget()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,87 @@
+"""
+Test per-thread conversation memory (offline)
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+
+from brain.conversation import (
+    Conversation, ConversationMemory, InMemoryConversationStore, SQLiteConversationStore, estimate_tokens,
+    thread_key
+)
+from brain.gemini_client import GeminiClient
+from fakes import FakeGenerativeModel
+from test_offline_clients import make_sheets_client
+
+ANSWER = {"analysis": "緊急課題が2件", "recommendation": "-", "next_action": "担当者に確認"}
+
+
+def test_old_turns_fold_into_bounded_summary():
+    """Turns beyond max_turns move to the summary, which stays within its token budget"""
+    conversation = Conversation("spaces/A/threads/1")
+    for i in range(10):
+        conversation.record(f"質問{i}", ANSWER, "ctx", max_turns=2, summary_tokens=60)
+
+    assert [t['q'] for t in conversation.turns] == ['質問8', '質問9']
+    assert conversation.summary and estimate_tokens("\n".join(conversation.summary)) <= 60
+    assert conversation.summary[-1].startswith("- 質問7")
+
+
+def test_follow_up_sends_only_changed_lines():
+    """A follow-up context is the lines added since the last turn; a new thread has none to diff"""
+    conversation = Conversation("spaces/A/threads/1")
+    assert conversation.delta_context("a\nb") is None
+
+    conversation.record("q", ANSWER, "a\nb")
+    assert "変更はありません" in conversation.delta_context("a\nb")
+    assert conversation.delta_context("a\nc").endswith("\nc")
+    assert "a" not in conversation.delta_context("a\nc").splitlines()
+
+
+def test_only_threads_are_conversations():
+    """Unthreaded messages in a space do not share memory"""
+    assert thread_key("spaces/A", "spaces/A/threads/1") == "spaces/A/threads/1"
+    assert thread_key("spaces/A", None) is None
+
+
+def test_stores_round_trip():
+    """Both stores save and restore conversation state"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for store in (InMemoryConversationStore(), SQLiteConversationStore(os.path.join(tmp, "c.db"))):
+            memory = ConversationMemory(store)
+            conversation = memory.load("spaces/A/threads/1")
+            conversation.record("質問", ANSWER, "ctx")
+            memory.save(conversation)
+
+            assert memory.load("spaces/A/threads/1").turns == conversation.turns
+            assert not memory.load("spaces/B").is_follow_up
+
+
+def test_follow_up_prompt_is_smaller():
+    """The second /ask in a thread sends the memory and the delta, not the whole data context"""
+    model = FakeGenerativeModel()
+    client = GeminiClient(project_id="test", model=model)
+    sheets = make_sheets_client()
+    conversation = Conversation("spaces/A/threads/1")
+    context = client._build_context(sheets.get_all_issues(), sheets.get_all_schedule_tasks())
+
+    client.analyze_with_context("緊急課題は？", sheets.get_all_issues(), sheets.get_all_schedule_tasks(), conversation)
+    first = model.prompt_chars
+    assert context in model.last_prompt
+
+    client.analyze_with_context("それのベンダーは？", sheets.get_all_issues(), sheets.get_all_schedule_tasks(), conversation)
+    assert model.prompt_chars - first < first
+    assert len(conversation.turns) == 2
+    assert context not in model.last_prompt and "緊急課題は？" in model.last_prompt
+
+
+if __name__ == "__main__":
+    test_old_turns_fold_into_bounded_summary()
+    test_follow_up_sends_only_changed_lines()
+    test_only_threads_are_conversations()
+    test_stores_round_trip()
+    test_follow_up_prompt_is_smaller()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,73 @@
+"""
+Test the shared credentials provider (offline)
+"""
+
+import os
+import sys
+import time
+import datetime
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from tools.credentials import CredentialsProvider
+
+
+class _FakeCredentials:
+
+    def __init__(self, lifetime: datetime.timedelta):
+        self.lifetime = lifetime
+        self.expiry = None
+        self.token = None
+        self.refresh_count = 0
+
+    def refresh(self, request):
+        self.refresh_count += 1
+        self.token = f"token-{self.refresh_count}"
+        self.expiry = datetime.datetime.utcnow() + self.lifetime
+
+
+class _FakeProvider(CredentialsProvider):
+
+    def __init__(self, credentials, refresh_margin):
+        super().__init__(refresh_margin=refresh_margin)
+        self.fake = credentials
+
+    def _load(self):
+        return self.fake
+
+    def _refresh(self, credentials):
+        credentials.refresh(None)
+
+
+def test_credentials_loaded_once_with_token():
+    """get() loads and refreshes once, then returns the same object"""
+    fake = _FakeCredentials(datetime.timedelta(hours=1))
+    provider = _FakeProvider(fake, datetime.timedelta(minutes=10))
+
+    try:
+        assert provider.get() is fake
+        assert provider.get() is fake
+        assert fake.token == "token-1"
+        assert 2900 < provider.seconds_until_refresh() <= 3000
+    finally:
+        provider.stop()
+
+
+def test_token_refreshed_in_background_before_expiry():
+    """The refresher renews the token before it enters the refresh margin"""
+    fake = _FakeCredentials(datetime.timedelta(seconds=1.2))
+    provider = _FakeProvider(fake, datetime.timedelta(seconds=1))
+
+    try:
+        provider.get()
+        deadline = time.time() + 5
+        while fake.refresh_count < 3 and time.time() < deadline:
+            time.sleep(0.05)
+        assert fake.refresh_count >= 3
+    finally:
+        provider.stop()
+
+
+if __name__ == "__main__":
+    test_credentials_loaded_once_with_token()
+    test_token_refreshed_in_background_before_expiry()
+    print("[SUCCESS] All tests passed!")
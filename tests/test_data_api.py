@@ -0,0 +1,105 @@
+"""
+Test the snapshot cache and the read-only data API (offline)
+"""
+
+import os
+import sys
+import json
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.dirname(__file__))
+
+from tools.snapshot import Snapshot, SnapshotCache, risk_report, rollups
+from tools import data_api
+from tools.data_api import cors_headers, handle_data_request, etag_matches
+from test_offline_clients import make_sheets_client
+
+
+def test_snapshot_version_is_content_hash():
+    """Same data -> same strong ETag; any change -> a new one"""
+    client = make_sheets_client()
+    issues, tasks = client.get_all_issues(), client.get_all_schedule_tasks()
+
+    assert Snapshot(issues, tasks).etag == Snapshot(list(issues), list(tasks)).etag
+    changed = [dict(issues[0], ステータス='完了')] + issues[1:]
+    assert Snapshot(changed, tasks).etag != Snapshot(issues, tasks).etag
+
+
+def test_cache_shares_reads_until_invalidated():
+    """Within the TTL the sheets are read once; invalidate() forces a new read"""
+    client = make_sheets_client()
+    cache = SnapshotCache(client, ttl=60)
+
+    first = cache.get()
+    assert cache.get() is first
+    cache.invalidate()
+    assert cache.get() is not first
+
+
+def test_risk_report_and_rollups():
+    """Risks follow the /risk-alert rules and rollups count them"""
+    snapshot = SnapshotCache(make_sheets_client()).get()
+
+    risks = risk_report(snapshot)
+    assert [i['ID'] for i in risks['overdue']] == ['1']
+    assert [i['ID'] for i in risks['due_soon']] == ['2']
+    assert [t['ID'] for t in risks['stalled']] == ['1']
+
+    summary = rollups(snapshot)
+    assert summary['issues']['total'] == 3
+    assert summary['issues']['by_vendor'] == {'ベンダーA': 2, 'ベンダーB': 1}
+    assert summary['risks']['overdue'] == 1
+    assert summary['schedule']['critical_path'] == 1
+
+
+def test_conditional_get_returns_304():
+    """A client holding the current ETag gets 304 with no body"""
+    cache = SnapshotCache(make_sheets_client())
+
+    body, status, headers = handle_data_request('issues', {}, {}, cache)
+    assert status == 200
+    assert json.loads(body)['total'] == 3
+
+    body, status, again = handle_data_request('issues', {}, {'If-None-Match': headers['ETag']}, cache)
+    assert status == 304 and body == ''
+    assert again['ETag'] == headers['ETag']
+
+    assert etag_matches(f'W/{headers["ETag"]}, "other"', headers['ETag'])
+    assert not etag_matches('"other"', headers['ETag'])
+
+
+def test_pagination_and_field_selection():
+    """page/page_size slice the records and fields trims each item"""
+    cache = SnapshotCache(make_sheets_client())
+
+    body, status, _ = handle_data_request('issues', {'page': '2', 'page_size': '2', 'fields': 'ID,内容'}, {}, cache)
+    data = json.loads(body)
+    assert status == 200
+    assert data['total'] == 3 and data['has_next'] is False
+    assert data['items'] == [{'ID': '3', '内容': '性能劣化'}]
+
+    _, status, _ = handle_data_request('issues', {'page': '0'}, {}, cache)
+    assert status == 400
+    _, status, _ = handle_data_request('unknown', {}, {}, cache)
+    assert status == 404
+
+
+def test_cors_is_limited_to_the_dashboard_origin():
+    """No CORS headers unless a dashboard origin is configured, and then only that origin"""
+    saved = data_api.CORS_ORIGIN
+    try:
+        data_api.CORS_ORIGIN = ''
+        assert cors_headers() == {}
+        data_api.CORS_ORIGIN = 'https://example.github.io'
+        assert cors_headers()['Access-Control-Allow-Origin'] == 'https://example.github.io'
+    finally:
+        data_api.CORS_ORIGIN = saved
+
+
+if __name__ == "__main__":
+    test_snapshot_version_is_content_hash()
+    test_cache_shares_reads_until_invalidated()
+    test_risk_report_and_rollups()
+    test_conditional_get_returns_304()
+    test_pagination_and_field_selection()
+    test_cors_is_limited_to_the_dashboard_origin()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,116 @@
+"""
+Test the MinHash-LSH near-duplicate issue index (offline)
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.dirname(__file__))
+
+from tools.dedup_index import DuplicateIndex, IssueDuplicateChecker, jaccard, normalize
+from tools.snapshot import snapshot_cache_for
+from test_offline_clients import make_sheets_client
+
+
+ISSUES = [
+    {'ID': '1', '内容': 'ログイン画面でAPI連携エラーが発生する'},
+    {'ID': '2', '内容': '月次帳票のレイアウトが崩れる'},
+    {'ID': '3', '内容': '夜間バッチ処理が遅延する'},
+]
+
+
+def test_similar_content_is_found():
+    """Reworded reports match; unrelated ones don't"""
+    index = DuplicateIndex()
+    index.sync(ISSUES)
+
+    assert [key for key, _ in index.query('API連携エラーが発生（ログイン画面）')] == ['1']
+    assert index.query('ベンダー契約の更新手続き') == []
+    # Width, case and punctuation differences are ignored
+    assert normalize('ＡＰＩ 連携、エラー') == normalize('api連携エラー')
+    assert jaccard('月次帳票のレイアウトが崩れる', '月次帳票のレイアウトが崩れる') == 1.0
+
+
+def test_sync_only_rehashes_changed_rows():
+    """New and edited rows are indexed, deleted rows dropped, unchanged rows skipped"""
+    index = DuplicateIndex()
+    assert index.sync(ISSUES) == 3
+    assert index.sync(ISSUES) == 0
+
+    edited = [ISSUES[0], {'ID': '2', '内容': '権限設定の漏れ'}]
+    assert index.sync(edited) == 1
+    assert len(index) == 2
+    assert index.query('月次帳票のレイアウトが崩れる') == []
+
+
+def test_persisted_index_survives_reload():
+    """A saved index answers queries after load without re-reading the rows"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dedup.npz')
+        index = DuplicateIndex(path=path)
+        index.sync(ISSUES)
+        index.save()
+
+        loaded = DuplicateIndex.load(path)
+        assert len(loaded) == 3
+        assert loaded.sync(ISSUES) == 0
+        assert loaded.query('夜間バッチ処理の遅延')[0][0] == '3'
+
+
+def test_bulk_check_compares_batch_with_itself():
+    """Bulk ingest flags rows that repeat an earlier row of the same batch"""
+    index = DuplicateIndex()
+    index.sync(ISSUES)
+
+    results = index.check_many(['権限設定の漏れがある', '権限設定に漏れがある', '夜間バッチ処理が遅延'])
+    assert results[0] == []
+    assert [key for key, _ in results[1]] == ['#1']
+    assert [key for key, _ in results[2]] == ['3']
+    assert len(index) == 3
+
+
+def test_checker_returns_issue_records():
+    """The checker syncs from the sheet snapshot and returns the matching rows"""
+    checker = IssueDuplicateChecker(make_sheets_client(), DuplicateIndex())
+
+    matches = checker.find_duplicates('帳票のレイアウト')
+    assert [issue['ID'] for issue, _ in matches] == ['2']
+    assert matches[0][0]['ベンダー名'] == 'ベンダーB'
+
+
+def test_added_issue_is_indexed_without_full_sync():
+    """An insert is indexed in memory only; the next check neither rescans nor saves"""
+    sheets = make_sheets_client()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dedup.npz')
+        checker = IssueDuplicateChecker(sheets, DuplicateIndex(path=path))
+        checker.refresh()
+        os.remove(path)
+        syncs = []
+        sync = checker.index.sync
+        checker.index.sync = lambda issues: syncs.append(len(issues)) or sync(issues)
+
+        new_id = sheets.add_issue(category='品質', content='夜間バッチ処理の遅延が再発した', vendor='ベンダーC',
+                                  assignee='田中', priority='高', deadline='2025-12-15')
+        snapshot_cache_for(sheets).invalidate()
+        checker.added({'ID': new_id, '内容': '夜間バッチ処理の遅延が再発した', 'ステータス': '新規'})
+
+        matches = checker.find_duplicates('夜間バッチ処理の遅延が再発')
+        assert str(new_id) in [str(issue['ID']) for issue, _ in matches]
+        assert syncs == [] and not os.path.exists(path)
+
+        # A sheet-change notification syncs with a fresh snapshot and persists the index
+        checker.refresh(force=True)
+        assert len(syncs) == 1 and os.path.exists(path)
+        assert str(new_id) in DuplicateIndex.load(path).signatures
+
+
+if __name__ == "__main__":
+    test_similar_content_is_found()
+    test_sync_only_rehashes_changed_rows()
+    test_persisted_index_survives_reload()
+    test_bulk_check_compares_batch_with_itself()
+    test_checker_returns_issue_records()
+    test_added_issue_is_indexed_without_full_sync()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,166 @@
+"""
+Test the snapshot archive and trend queries (offline, temporary directory)
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+
+from tools.history import GcsMirror, SnapshotArchive
+from tools.snapshot import Snapshot
+from tools.trends import TrendQuery, trend_summary, wants_trends
+
+
+class _FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket, self.name = bucket, name
+        self.generation = None
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def reload(self):
+        if not self.exists():
+            raise NotFound(self.name)
+        self.generation = self.bucket.objects[self.name][0]
+
+    def _check(self, generation):
+        if self.bucket.objects.get(self.name, (0,))[0] != generation:
+            raise PreconditionFailed(self.name)
+
+    def download_as_bytes(self, if_generation_match=None):
+        self.reload()
+        if if_generation_match is not None:
+            self._check(if_generation_match)
+        return self.bucket.objects[self.name][1]
+
+    def download_to_filename(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.download_as_bytes())
+
+    def upload_from_string(self, data, if_generation_match=None):
+        if if_generation_match is not None:
+            self._check(if_generation_match)
+        self.bucket.uploads.append(self.name)
+        self.bucket.objects[self.name] = (self.bucket.objects.get(self.name, (0,))[0] + 1, data)
+
+    def upload_from_filename(self, path):
+        with open(path, 'rb') as f:
+            self.upload_from_string(f.read())
+
+
+class _FakeBucket:
+    name = 'bucket'
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = []
+
+    def blob(self, name):
+        return _FakeBlob(self, name)
+
+
+def _issue(id, vendor, deadline, status='対応中'):
+    return {'ID': id, '内容': f'課題{id}', 'ベンダー名': vendor, '期限': deadline, 'ステータス': status}
+
+
+TASKS = [{'ID': '1', 'タスク': 'SIT環境準備', '終了予定日': '2025-11-30', 'ステータス': '進行中'}]
+
+
+def _capture(archive, day, issues, tasks=TASKS):
+    snapshot = Snapshot(issues, tasks)
+    snapshot.taken_at = f"{day}T09:00:00+00:00"
+    return archive.archive(snapshot)
+
+
+def _archive_three_days(tmp):
+    archive = SnapshotArchive(tmp, 'sheet-1')
+    _capture(archive, '2025-11-01', [_issue('1', 'ベンダーA', '2025-11-02')])
+    _capture(archive, '2025-11-03', [_issue('1', 'ベンダーA', '2025-11-02'),
+                                     _issue('2', 'ベンダーB', '2025-10-31')])
+    _capture(archive, '2025-11-05', [_issue('1', 'ベンダーA', '2025-11-02', '完了'),
+                                     _issue('2', 'ベンダーB', '2025-10-31')])
+    return archive
+
+
+def test_unchanged_sheets_are_not_written_again():
+    """A capture only writes the sheets that changed; an identical snapshot is skipped"""
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = _archive_three_days(tmp)
+        captures = archive.captures()
+
+        assert len(captures) == 3
+        assert len({c['tasks'] for c in captures}) == 1
+        assert len(os.listdir(os.path.join(archive.root, 'tasks'))) == 1
+        assert len(os.listdir(os.path.join(archive.root, 'issues'))) == 3
+
+        last = captures[-1]
+        snapshot = Snapshot([_issue('1', 'ベンダーA', '2025-11-02', '完了'), _issue('2', 'ベンダーB', '2025-10-31')], TASKS)
+        assert snapshot.version == last['version']
+        assert archive.archive(snapshot) is None
+
+        table = archive.read('issues', last['issues'], ['期限', 'ステータス', '存在しない列'])
+        assert table.column_names == ['期限', 'ステータス']
+        assert str(table.schema.field('期限').type) == 'date32[day]'
+
+
+def test_overdue_and_status_series():
+    """Overdue counts use each capture's own date; one point per captured day"""
+    with tempfile.TemporaryDirectory() as tmp:
+        query = TrendQuery(_archive_three_days(tmp))
+
+        overdue = query.overdue_by('ベンダー名', days=None)
+        assert overdue['dates'] == ['2025-11-01', '2025-11-03', '2025-11-05']
+        assert overdue['series'] == {'ベンダーA': [0, 1, 0], 'ベンダーB': [0, 1, 1]}
+
+        status = query.count_by('issues', 'ステータス', days=7, today=date(2025, 11, 5))
+        assert status['series'] == {'完了': [0, 0, 1], '対応中': [1, 2, 1]}
+        assert query.count_by('issues', 'ステータス', days=3, today=date(2025, 11, 5))['dates'] == ['2025-11-03', '2025-11-05']
+
+
+def test_trend_summary_for_ask():
+    """The /ask context gets a compact first→last summary"""
+    assert wants_trends('先週からの期限超過の推移は？')
+    assert not wants_trends('現在の課題数は？')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = _archive_three_days(tmp)
+        summary = trend_summary(archive, days=30, today=date(2025, 11, 5))
+        assert 'ベンダーB 0→1' in summary
+        assert 'ベンダーA 0→0 (最大1)' in summary
+        assert trend_summary(SnapshotArchive(tmp, 'empty')) == ''
+
+
+def test_gcs_mirror_keeps_history_across_instances():
+    """Captures land in the bucket, so a fresh instance with an empty directory sees them"""
+    bucket = _FakeBucket()
+    with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+        archive = SnapshotArchive(first, 'sheet-1', GcsMirror('gs://bucket/history', 'sheet-1', bucket))
+        _capture(archive, '2025-11-01', [_issue('1', 'ベンダーA', '2025-11-02')])
+        _capture(archive, '2025-11-03', [_issue('1', 'ベンダーA', '2025-10-31')])
+        assert sorted(n for n in bucket.objects if n.endswith('.arrow'))[0].startswith('history/sheet-1/issues/')
+        assert sum(n.startswith('history/sheet-1/tasks/') for n in bucket.uploads) == 1
+
+        uploads = len(bucket.uploads)
+        assert _capture(archive, '2025-11-04', [_issue('1', 'ベンダーA', '2025-10-31')]) is None
+        assert len(bucket.uploads) == uploads
+
+        fresh = SnapshotArchive(second, 'sheet-1', GcsMirror('gs://bucket/history', 'sheet-1', bucket))
+        assert _capture(fresh, '2025-11-04', [_issue('1', 'ベンダーA', '2025-10-31')]) is None
+        _capture(fresh, '2025-11-05', [_issue('1', 'ベンダーA', '2025-10-31', '完了')])
+        assert [c['taken_at'][:10] for c in archive.captures()] == ['2025-11-01', '2025-11-03', '2025-11-05']
+
+        overdue = TrendQuery(fresh).overdue_by('ベンダー名', days=None)
+        assert overdue['series'] == {'ベンダーA': [0, 1, 0]}
+
+
+if __name__ == "__main__":
+    test_unchanged_sheets_are_not_written_again()
+    test_overdue_and_status_series()
+    test_trend_summary_for_ask()
+    test_gcs_mirror_keeps_history_across_instances()
+    print("[SUCCESS] All tests passed!")
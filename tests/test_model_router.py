@@ -0,0 +1,111 @@
+"""
+Test model tiering, fallback and hedging (offline, fake models)
+"""
+
+import os
+import sys
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+
+from brain.model_router import CallLimitError, ModelEndpoint, ModelRouter, classify_query
+from fakes import FakeGenerativeModel
+from tools import tracing
+
+
+class _BadRequestModel:
+    def generate_content(self, prompt):
+        raise ValueError("400 Invalid argument")
+
+
+def test_classify_query():
+    """Short lookups go to flash, analysis questions to pro"""
+    assert classify_query("緊急課題は？") == 'flash'
+    assert classify_query("SIT遅延の原因と対策は？") == 'pro'
+
+
+def test_falls_back_on_server_errors():
+    """A 5xx from the primary is answered by the next endpoint"""
+    primary = ModelEndpoint("flash@us-central1", FakeGenerativeModel(fail_rate=1.0))
+    secondary = ModelEndpoint("flash@us-east4", FakeGenerativeModel())
+    router = ModelRouter({'flash': [primary, secondary]}, hedge_after=0)
+
+    _, endpoint = router.generate("prompt", 'flash')
+
+    assert endpoint is secondary
+    assert router.stats()["flash@us-central1"]['errors'] == 1
+
+
+def test_hedges_slow_primary():
+    """A slow primary is hedged and the faster answer wins within the budget"""
+    slow = ModelEndpoint("slow", FakeGenerativeModel(latency_s=2.0))
+    fast = ModelEndpoint("fast", FakeGenerativeModel(latency_s=0.01))
+    router = ModelRouter({'flash': [slow, fast]}, hedge_after=0.1)
+
+    start = time.perf_counter()
+    _, endpoint = router.generate("prompt")
+
+    assert endpoint is fast
+    assert time.perf_counter() - start < 1.0
+
+
+def test_client_errors_do_not_fall_back():
+    """Invalid requests are raised immediately instead of trying other endpoints"""
+    fallback = FakeGenerativeModel()
+    router = ModelRouter({'flash': [ModelEndpoint("bad", _BadRequestModel()), ModelEndpoint("ok", fallback)]})
+
+    try:
+        router.generate("prompt")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert fallback.calls == 0
+
+
+def test_admit_limits_hedges_and_fallbacks():
+    """Every call asks for budget; a refused fallback keeps the endpoint's own error"""
+    backup_model = FakeGenerativeModel()
+    router = ModelRouter({'flash': [ModelEndpoint("down", FakeGenerativeModel(fail_rate=1.0)),
+                                    ModelEndpoint("backup", backup_model)]}, hedge_after=0)
+
+    asked = []
+    error = None
+    try:
+        router.generate("prompt", admit=lambda: asked.append(1) or len(asked) == 1)
+    except Exception as e:
+        error = e
+    assert error is not None and not isinstance(error, CallLimitError)
+    assert len(asked) == 2 and backup_model.calls == 0
+
+    try:
+        router.generate("prompt", admit=lambda: False)
+        raise AssertionError("expected CallLimitError")
+    except CallLimitError:
+        pass
+
+
+def test_stats_are_logged_periodically():
+    """The per-model report is written as a structured log line once the interval has passed"""
+    records = []
+    tracing.set_sink(records.append)
+    try:
+        router = ModelRouter({'flash': [ModelEndpoint("flash", FakeGenerativeModel())]}, stats_interval=0.05)
+        router.generate("質問")
+        assert records == []
+        time.sleep(0.06)
+        router.generate("質問")
+    finally:
+        tracing.set_sink(None)
+
+    assert [r['message'] for r in records] == ['model_stats']
+    assert records[0]['models']['flash']['calls'] == 2
+
+
+if __name__ == "__main__":
+    test_classify_query()
+    test_falls_back_on_server_errors()
+    test_hedges_slow_primary()
+    test_client_errors_do_not_fall_back()
+    test_admit_limits_hedges_and_fallbacks()
+    test_stats_are_logged_periodically()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,219 @@
+"""
+Test SheetsClient / GeminiClient against in-memory fakes (offline)
+"""
+
+import os
+import sys
+import json
+from datetime import date, timedelta
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+
+from brain.gemini_client import GeminiClient
+from tools.sheets_client import SheetsClient
+from fakes import FakeSheetsService, FakeGenerativeModel
+from datagen import ISSUE_HEADERS, SCHEDULE_HEADERS
+
+
+def _issue_rows():
+    today = date.today()
+    past = (today - timedelta(days=3)).strftime('%Y-%m-%d')
+    future = (today + timedelta(days=3)).strftime('%Y-%m-%d')
+    return [
+        list(ISSUE_HEADERS),
+        ['1', past, '技術課題', 'API連携エラー', 'ベンダーA', '鈴木', '緊急', past, '対応中', '全体', past],
+        ['2', past, '仕様確認', '帳票レイアウト', 'ベンダーB', '佐藤', '中', future, '新規', '限定的', past],
+        ['3', past, '品質', '性能劣化', 'ベンダーA', '高橋', '高', past, '完了', '特定ベンダー', past],
+    ]
+
+
+def _schedule_rows():
+    return [
+        list(SCHEDULE_HEADERS),
+        ['1', 'SIT環境準備', 'ベンダーA', '鈴木', '2025-11-01', '2025-11-30', '停滞', '40%', '', 'TRUE', ''],
+        ['2', '結合テスト', 'ベンダーB', '佐藤', '2025-12-01', '2025-12-20', '未着手', '0%', '1', 'FALSE', ''],
+    ]
+
+
+def make_sheets_client(service=None):
+    service = service or FakeSheetsService({'Issues': _issue_rows(), 'Schedule': _schedule_rows()})
+    return SheetsClient(spreadsheet_id='test', service=service)
+
+
+def test_read_and_filter_issues():
+    """Rows become dicts keyed by header and filters apply"""
+    client = make_sheets_client()
+
+    issues = client.get_all_issues()
+    assert len(issues) == 3
+    assert issues[0]['内容'] == 'API連携エラー'
+    assert [i['ID'] for i in client.get_issues_by_filter(vendor='ベンダーA')] == ['1', '3']
+
+
+def test_overdue_and_stalled():
+    """Only open issues past their deadline are overdue"""
+    client = make_sheets_client()
+
+    assert [i['ID'] for i in client.get_overdue_issues()] == ['1']
+    assert [t['ID'] for t in client.get_stalled_tasks()] == ['1']
+    assert [t['ID'] for t in client.get_critical_path_tasks()] == ['1']
+
+
+def test_date_formats_and_slip():
+    """Slash-formatted deadlines count as overdue and slipped tasks are ranked by delay"""
+    rows = _issue_rows()
+    rows[2][7] = (date.today() - timedelta(days=1)).strftime('%Y/%m/%d')
+    client = make_sheets_client(FakeSheetsService({'Issues': rows, 'Schedule': _schedule_rows()}))
+
+    assert [i['ID'] for i in client.get_overdue_issues()] == ['1', '2']
+    assert [i['ID'] for i in make_sheets_client().get_due_soon_issues(days=7)] == ['2']
+
+    slipped = client.get_slipped_tasks()
+    assert [t['ID'] for t in slipped] == ['1', '2']
+    assert slipped[0]['遅延日数'] > slipped[1]['遅延日数'] > 0
+
+
+def test_add_issue_appends_row():
+    """New issues are appended in header order with the next ID"""
+    service = FakeSheetsService({'Issues': _issue_rows(), 'Schedule': _schedule_rows()})
+    client = make_sheets_client(service)
+
+    assert client.add_issue(category='技術課題', content='新規課題', vendor='ベンダーC',
+                            assignee='田中', priority='高', deadline='2025-12-15') == 4
+
+    added = client.get_all_issues()[-1]
+    assert added['ID'] == 4
+    assert added['内容'] == '新規課題'
+    assert added['期限'] == '2025-12-15'
+
+
+def test_reordered_columns_are_read_and_written_by_name():
+    """Reads and appends follow the header even when columns are reordered"""
+    rows = _issue_rows()
+    order = [rows[0].index(h) for h in ['内容', 'ID', '期限', 'ステータス', '優先度', '担当者']]
+    service = FakeSheetsService({'Issues': [[r[i] for i in order] for r in rows], 'Schedule': _schedule_rows()})
+    client = make_sheets_client(service)
+
+    assert client.get_all_issues()[0]['内容'] == 'API連携エラー'
+    client.add_issue(category='品質', content='並べ替え後の課題', vendor='ベンダーD',
+                     assignee='伊藤', priority='低', deadline='2025-12-20')
+
+    assert service.sheets['Issues'][-1][:3] == ['並べ替え後の課題', 4, '2025-12-20']
+    assert service.sheets['Issues'][-1][5] == '伊藤'
+
+
+def test_columns_reordered_between_adds_are_written_by_name():
+    """A column move after the schema was cached does not shift the next appended row"""
+    service = FakeSheetsService({'Issues': _issue_rows(), 'Schedule': _schedule_rows()})
+    client = make_sheets_client(service)
+    client.add_issue(category='品質', content='最初の課題', vendor='ベンダーC',
+                     assignee='田中', priority='高', deadline='2025-12-15')
+
+    # Swap 内容 and ベンダー名 in every row (header included)
+    header = service.sheets['Issues'][0]
+    a, b = header.index('内容'), header.index('ベンダー名')
+    for row in service.sheets['Issues']:
+        row.extend([''] * (max(a, b) + 1 - len(row)))
+        row[a], row[b] = row[b], row[a]
+
+    client.add_issue(category='品質', content='列入れ替え後の課題', vendor='ベンダーD',
+                     assignee='伊藤', priority='低', deadline='2025-12-20')
+    added = client.get_all_issues()[-1]
+    assert added['内容'] == '列入れ替え後の課題'
+    assert added['ベンダー名'] == 'ベンダーD'
+
+
+def test_header_change_is_detected():
+    """A column inserted after caching is picked up on the next read"""
+    service = FakeSheetsService({'Issues': _issue_rows(), 'Schedule': _schedule_rows()})
+    client = make_sheets_client(service)
+    client.get_all_issues()
+
+    for i, row in enumerate(service.sheets['Issues']):
+        row.insert(1, '備考' if i == 0 else 'メモ')
+
+    issues = client.get_all_issues()
+    assert issues[0]['備考'] == 'メモ'
+    assert issues[0]['内容'] == 'API連携エラー'
+
+
+def test_projection_fetches_only_requested_columns():
+    """Narrow reads batchGet just the needed columns"""
+    service = FakeSheetsService({'Issues': _issue_rows(), 'Schedule': _schedule_rows()})
+    client = make_sheets_client(service)
+
+    issues = client.get_all_issues(fields=['ID', '期限', 'ステータス', '存在しない列'])
+    assert issues[0] == {'ID': '1', '期限': _issue_rows()[1][7], 'ステータス': '対応中', '存在しない列': ''}
+    assert len(issues) == 3
+
+    overdue = client.get_overdue_issues()
+    assert [i['ID'] for i in overdue] == ['1']
+    assert '影響範囲' not in overdue[0]
+    assert overdue[0]['内容'] == 'API連携エラー'
+
+
+def test_paged_iterators_stream_rows():
+    """Iterators read row-range pages and stop early when the consumer does"""
+    rows = _issue_rows()
+    rows += [[str(n)] + r[1:] for n, r in enumerate(rows[1:] * 3, start=4)]
+    service = FakeSheetsService({'Issues': rows, 'Schedule': _schedule_rows()})
+    client = make_sheets_client(service)
+
+    assert [i['ID'] for i in client.iter_issues(page_rows=4)] == [str(n) for n in range(1, 13)]
+    assert list(client.iter_issues(fields=['ID', '内容'], page_rows=5))[5] == {'ID': '6', '内容': '性能劣化'}
+    assert [t['ID'] for t in client.iter_schedule_tasks(page_rows=1)] == ['1', '2']
+
+    service.calls.clear()
+    pages = client._iter_pages('Issues', page_rows=2)
+    first = next(pages)
+    pages.close()
+    assert [i['ID'] for i in first] == ['1', '2']
+    # First page plus at most the prefetched second one
+    assert service.calls['values.get'] <= 2
+
+    assert [i['ID'] for i in client.get_overdue_issues(limit=2)] == ['1', '4']
+
+
+def test_raw_read_mode_converts_serial_dates():
+    """Raw mode turns serial-number dates into ISO strings and compares them directly"""
+    def serial(d):
+        return (d - date(1899, 12, 30)).days
+
+    today = date.today()
+    past, future = serial(today - timedelta(days=3)), serial(today + timedelta(days=3))
+    issues = [
+        list(ISSUE_HEADERS),
+        [1, past, '技術課題', 'API連携エラー', 'ベンダーA', '鈴木', '緊急', past, '対応中', '全体', past],
+        [2, past, '仕様確認', '帳票レイアウト', 'ベンダーB', '佐藤', '中', future, '新規', '限定的', past],
+    ]
+    schedule = [list(SCHEDULE_HEADERS), [1, 'SIT環境準備', 'ベンダーA', '鈴木', past, future, '停滞', 0.4, '', True, '']]
+    service = FakeSheetsService({'Issues': issues, 'Schedule': schedule})
+    client = SheetsClient(spreadsheet_id='test', service=service, read_mode='raw')
+
+    assert client.get_all_issues()[0]['期限'] == (today - timedelta(days=3)).isoformat()
+    assert [i['ID'] for i in client.get_overdue_issues()] == [1]
+    assert [t['ID'] for t in client.get_critical_path_tasks()] == [1]
+
+
+def test_analyze_with_fake_model():
+    """GeminiClient parses the JSON answer from the model"""
+    client = GeminiClient(project_id='test', model_name='fake', model=FakeGenerativeModel())
+    result = client.analyze_with_context("緊急課題は？", issues_data=make_sheets_client().get_all_issues())
+
+    assert result['next_action'] == FakeGenerativeModel.DEFAULT_ANSWER['next_action']
+    assert 'remaining_requests' in result
+
+
+if __name__ == "__main__":
+    test_read_and_filter_issues()
+    test_overdue_and_stalled()
+    test_date_formats_and_slip()
+    test_add_issue_appends_row()
+    test_reordered_columns_are_read_and_written_by_name()
+    test_columns_reordered_between_adds_are_written_by_name()
+    test_header_change_is_detected()
+    test_projection_fetches_only_requested_columns()
+    test_paged_iterators_stream_rows()
+    test_raw_read_mode_converts_serial_dates()
+    test_analyze_with_fake_model()
+    print("[SUCCESS] All tests passed!")
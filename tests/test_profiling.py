@@ -0,0 +1,68 @@
+"""
+Test on-demand request profiling (offline, temporary directory)
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from tools import profiling
+
+
+def _slow_part():
+    return sum(i * i for i in range(20000))
+
+
+def _handle_request():
+    profiling.tag('ask')
+    return _slow_part()
+
+
+def test_debug_header_needs_token():
+    """The header only triggers profiling when it matches PROFILE_TOKEN"""
+    saved = profiling.PROFILE_TOKEN, profiling.PROFILE_ENABLED, profiling.PROFILE_SAMPLE_RATE
+    try:
+        profiling.PROFILE_ENABLED, profiling.PROFILE_SAMPLE_RATE = False, 0
+        profiling.PROFILE_TOKEN = ''
+        assert not profiling.should_profile({'X-PMO-Profile': ''})
+        profiling.PROFILE_TOKEN = 'secret'
+        assert not profiling.should_profile({'X-PMO-Profile': 'guess'})
+        assert profiling.should_profile({'X-PMO-Profile': 'secret'})
+        profiling.PROFILE_SAMPLE_RATE = 1.0
+        assert profiling.should_profile({})
+    finally:
+        profiling.PROFILE_TOKEN, profiling.PROFILE_ENABLED, profiling.PROFILE_SAMPLE_RATE = saved
+
+
+def test_capture_is_stored_and_aggregated():
+    """Each capture is one compressed file; hot spots add up across captures"""
+    with tempfile.TemporaryDirectory() as tmp:
+        profiling.set_sink(profiling.local_sink(tmp))
+        try:
+            for _ in range(2):
+                with profiling.profile('chat') as capture:
+                    assert profiling.is_profiling()
+                    # Nested captures (deferred work run inline) do not restart the profiler
+                    with profiling.profile('deferred-ask') as inner:
+                        _handle_request()
+                assert inner.name is None
+            assert not profiling.is_profiling()
+        finally:
+            profiling.set_sink(None)
+
+        names = sorted(os.listdir(tmp))
+        assert len(names) == 2
+        meta = profiling.parse_name(capture.name)
+        assert meta['label'] == 'ask' and meta['id'] == capture.capture_id
+
+        count, rows = profiling.hot_spots([os.path.join(tmp, n) for n in names], top=50)
+        assert count == 2
+        slow = [r for r in rows if r[0].endswith('(_slow_part)')]
+        assert slow and slow[0][1] == 2
+
+
+if __name__ == "__main__":
+    test_debug_header_needs_token()
+    test_capture_is_stored_and_aggregated()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,157 @@
+"""
+Test retries, the circuit breaker and the degraded answer (offline, fake models)
+"""
+
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+
+from brain.gemini_client import GeminiClient
+from brain.model_router import ModelEndpoint, ModelRouter
+from brain.resilience import BoundedExecutor, CircuitBreaker, OverloadedError, RetryPolicy
+from fakes import FakeGenerativeModel
+from test_offline_clients import make_sheets_client
+
+
+class _FlakyModel(FakeGenerativeModel):
+    """Fails the first call with a 503, then answers"""
+
+    def generate_content(self, contents, **kwargs):
+        if self.calls == 0:
+            self.calls += 1
+            raise RuntimeError("503 Service Unavailable")
+        return super().generate_content(contents, **kwargs)
+
+
+def test_transient_errors_are_retried():
+    """A 503 followed by success returns the model answer"""
+    model = _FlakyModel()
+    client = GeminiClient(project_id="test", model=model)
+    client.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01)
+
+    result = client.analyze_with_context("緊急課題は？")
+
+    assert result['next_action'] == FakeGenerativeModel.DEFAULT_ANSWER['next_action']
+    assert model.calls == 2
+
+
+def test_retries_count_against_daily_limit():
+    """The retry is a second billed call and is charged; no retry once the limit is reached"""
+    client = GeminiClient(project_id="test", model=_FlakyModel())
+    client.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01)
+    remaining = client.get_remaining_requests()
+
+    client.analyze_with_context("緊急課題は？")
+    assert client.get_remaining_requests() == remaining - 2
+
+    model = _FlakyModel()
+    client = GeminiClient(project_id="test", model=model)
+    client.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.01)
+    saved = GeminiClient._request_count
+    GeminiClient._request_count = GeminiClient.DAILY_LIMIT - 1
+    try:
+        result = client.analyze_with_context("緊急課題は？")
+    finally:
+        GeminiClient._request_count = saved
+    assert model.calls == 1 and 'next_action' not in result
+
+
+def test_breaker_opens_and_answers_from_rules():
+    """Repeated failures open the breaker; answers are rule-based and quota is refunded"""
+    model = FakeGenerativeModel(fail_rate=1.0)
+    client = GeminiClient(project_id="test", model=model)
+    client.retry_policy = RetryPolicy(max_attempts=1)
+    client.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    sheets = make_sheets_client()
+    remaining = client.get_remaining_requests()
+
+    for _ in range(4):
+        result = client.analyze_with_context("緊急課題は？", sheets.get_all_issues(), sheets.get_all_schedule_tasks())
+
+    assert result['degraded'] is True
+    assert 'API連携エラー' in result['next_action']
+    assert model.calls == 2
+    assert client.get_remaining_requests() == remaining
+
+
+def test_trial_without_outcome_does_not_stick_half_open():
+    """A trial that fails before the model call is released; an abandoned one expires"""
+    client = GeminiClient(project_id="test", model=FakeGenerativeModel())
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    client.breaker.record_failure()
+    time.sleep(0.06)
+
+    build_context = client._build_context
+    client._build_context = lambda *args: 1 / 0
+    try:
+        client.analyze_with_context("緊急課題は？")
+        raise AssertionError("expected ZeroDivisionError")
+    except ZeroDivisionError:
+        pass
+    client._build_context = build_context
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    assert 'degraded' not in client.analyze_with_context("緊急課題は？")
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    first = breaker.allow()
+    assert first and breaker.allow() is None
+    time.sleep(0.06)
+    second = breaker.allow()
+    assert second and second != first
+
+    # The replaced trial cannot release the newer one
+    breaker.release(first)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.release(second)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_bounded_executor_refuses_when_full():
+    """Hung calls hold their slots and further work is refused instead of queued"""
+    release = threading.Event()
+    executor = BoundedExecutor(1)
+    future = executor.submit(release.wait)
+
+    try:
+        executor.submit(lambda: None)
+        assert False, "expected OverloadedError"
+    except OverloadedError:
+        pass
+    finally:
+        release.set()
+    future.result()
+
+
+def test_router_times_out_hung_model():
+    """A call that never returns is abandoned at the deadline"""
+    release = threading.Event()
+
+    class _HungModel:
+        def generate_content(self, prompt):
+            release.wait()
+
+    router = ModelRouter({'flash': [ModelEndpoint("hung", _HungModel())]}, timeout=0.1)
+    try:
+        router.generate("prompt")
+        assert False, "expected TimeoutError"
+    except TimeoutError:
+        pass
+    finally:
+        release.set()
+
+
+if __name__ == "__main__":
+    test_transient_errors_are_retried()
+    test_retries_count_against_daily_limit()
+    test_breaker_opens_and_answers_from_rules()
+    test_trial_without_outcome_does_not_stick_half_open()
+    test_bounded_executor_refuses_when_full()
+    test_router_times_out_hung_model()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,62 @@
+"""
+Test the declarative sheet schema migration (offline)
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../scripts'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+
+from setup_sheets_structure import SheetStructureSetup, load_desired_schema, plan_columns
+from fakes import FakeSheetsService
+
+
+def test_proposal_schema_is_parsed():
+    """Columns, dropdowns and checkboxes come from the proposal document"""
+    schema = load_desired_schema()
+
+    assert schema['issue']['columns'][:4] == ['ID', '起票日', 'カテゴリ', '内容']
+    assert schema['issue']['dropdowns']['優先度'] == ['緊急', '高', '中', '低']
+    assert schema['schedule']['dropdowns']['ステータス'] == ['未着手', '進行中', '停滞', '完了', '保留']
+    assert schema['schedule']['checkboxes'] == ['クリティカルパス']
+
+
+def test_missing_columns_inserted_next_to_anchors():
+    """Missing columns go after the nearest existing column; extras stay put"""
+    inserts, headers = plan_columns(['ID', '内容', '備考', 'ステータス'],
+                                    ['ID', 'カテゴリ', '内容', '優先度', 'ステータス', '更新日'])
+
+    assert inserts == [(1, 'カテゴリ'), (3, '優先度'), (6, '更新日')]
+    assert headers == ['ID', 'カテゴリ', '内容', '優先度', '備考', 'ステータス', '更新日']
+
+
+def test_migration_is_single_batch_and_idempotent():
+    """One batchUpdate migrates all sheets; a second run plans nothing"""
+    service = FakeSheetsService({
+        'Issues': [['ID', '起票日', 'カテゴリ', '内容', '担当者', 'ステータス'],
+                   ['1', '2025-11-01', '技術課題', 'API連携エラー', '鈴木', '対応中']],
+        'Schedule': [['タスク', '開始予定', '終了予定', '進捗率'],
+                     ['SIT環境準備', '2025-11-01', '2025-11-30', '40%']],
+    })
+    schema = load_desired_schema()
+    setup = SheetStructureSetup(None, 'test', service=service)
+    sheet_schemas = {'Issues': schema['issue'], 'Schedule': schema['schedule']}
+
+    plan = setup.plan(sheet_schemas)
+    setup.apply(plan)
+
+    assert service.calls.get('batchUpdate') == 1
+    assert service.sheets['Issues'][0] == schema['issue']['columns']
+    assert service.sheets['Issues'][1][5] == '鈴木'      # data moved with its header
+    assert service.sheets['Schedule'][0] == schema['schedule']['columns']
+    assert service.sheets['Schedule'][1][1] == 'SIT環境準備'
+
+    assert setup.plan(sheet_schemas)['requests'] == []
+
+
+if __name__ == "__main__":
+    test_proposal_schema_is_parsed()
+    test_missing_columns_inserted_next_to_anchors()
+    test_migration_is_single_batch_and_idempotent()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,54 @@
+"""
+Test background task queues (offline)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from tools.task_queue import InMemoryTaskQueue, SQLiteTaskQueue
+
+
+def test_in_memory_queue_runs_task():
+    """Enqueued payload is handed to the handler in the background"""
+    done = threading.Event()
+    received = []
+
+    def handler(payload):
+        received.append(payload)
+        done.set()
+
+    queue = InMemoryTaskQueue(handler)
+    queue.enqueue({"message_text": "/ask テスト"})
+
+    assert done.wait(timeout=5)
+    assert received == [{"message_text": "/ask テスト"}]
+
+
+def test_sqlite_queue_records_status():
+    """SQLite queue marks tasks done or failed"""
+    done = threading.Event()
+
+    def handler(payload):
+        if payload.get("fail"):
+            done.set()
+            raise RuntimeError("boom")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = SQLiteTaskQueue(handler, db_path=os.path.join(tmp, "tasks.db"))
+        ok_id = queue.enqueue({"message_text": "/risk-alert"})
+        fail_id = queue.enqueue({"fail": True})
+
+        assert done.wait(timeout=5)
+        queue._executor.shutdown(wait=True)
+
+        assert queue.get_status(ok_id) == 'done'
+        assert queue.get_status(fail_id) == 'failed'
+
+
+if __name__ == "__main__":
+    test_in_memory_queue_runs_task()
+    test_sqlite_queue_records_status()
+    print("[SUCCESS] All tests passed!")
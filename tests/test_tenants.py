@@ -0,0 +1,77 @@
+"""
+Test the multi-project tenant registry (offline)
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from tools.tenants import TenantRegistry
+
+
+CONFIG = {
+    "default": "project-a",
+    "max_clients": 2,
+    "tenants": {
+        "project-a": {"spreadsheet_id": "sheet-a", "spaces": ["spaces/A"]},
+        "project-b": {"spreadsheet_id": "sheet-b", "spaces": ["spaces/B"], "daily_limit": 1},
+        "project-c": {"spreadsheet_id": "sheet-c", "spaces": ["spaces/C"],
+                      "issue_sheet_name": "課題"},
+    }
+}
+
+
+def _registry(created):
+    def factory(tenant):
+        created.append(tenant.tenant_id)
+        return {"spreadsheet_id": tenant.spreadsheet_id}
+    return TenantRegistry.from_config(CONFIG, client_factory=factory)
+
+
+def test_resolve_space_and_default():
+    """Known spaces map to their tenant, unknown ones to the default"""
+    registry = _registry([])
+
+    assert registry.resolve("spaces/B").tenant_id == "project-b"
+    assert registry.resolve("spaces/C").issue_sheet_name == "課題"
+    assert registry.resolve("spaces/unknown").tenant_id == "project-a"
+    assert registry.resolve(None).tenant_id == "project-a"
+
+    # The data API does not serve a mistyped space from the default tenant
+    assert registry.resolve("spaces/unknown", fallback=False) is None
+    assert registry.resolve(None, fallback=False).tenant_id == "project-a"
+
+
+def test_clients_are_pooled_with_lru_eviction():
+    """Clients are reused and the least recently used one is evicted"""
+    created = []
+    registry = _registry(created)
+    a, b, c = (registry.resolve(s) for s in ("spaces/A", "spaces/B", "spaces/C"))
+
+    client_a = registry.get_sheets_client(a)
+    assert registry.get_sheets_client(a) is client_a
+    registry.get_sheets_client(b)
+    registry.get_sheets_client(a)      # a is now most recently used
+    registry.get_sheets_client(c)      # evicts b
+    registry.get_sheets_client(b)
+
+    assert created == ["project-a", "project-b", "project-c", "project-b"]
+
+
+def test_per_tenant_quota():
+    """Daily limit applies per tenant and refunds restore capacity"""
+    registry = _registry([])
+    b = registry.resolve("spaces/B")
+
+    assert registry.consume_quota(b)
+    assert not registry.consume_quota(b)
+    registry.refund_quota(b)
+    assert registry.consume_quota(b)
+    assert registry.consume_quota(registry.resolve("spaces/A"))
+
+
+if __name__ == "__main__":
+    test_resolve_space_and_default()
+    test_clients_are_pooled_with_lru_eviction()
+    test_per_tenant_quota()
+    print("[SUCCESS] All tests passed!")
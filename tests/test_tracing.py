@@ -0,0 +1,55 @@
+"""
+Test request-scoped tracing (offline)
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from tools import tracing
+
+
+def test_trace_records_spans_and_counters():
+    """Spans, attributes and cache counters end up in one record"""
+    records = []
+    tracing.set_sink(records.append)
+    tracing.set_enabled(True)
+
+    try:
+        with tracing.trace("chat_message", trace_header="abc123/1;o=1") as trace:
+            with tracing.span("sheets.read", range="Issues!A:L") as span:
+                span.set(rows=10, bytes=2048)
+            tracing.record_cache("snapshot", hit=False)
+            trace.set(command="/ask")
+    finally:
+        tracing.set_enabled(False)
+        tracing.set_sink(None)
+
+    assert len(records) == 1
+    record = records[0]
+    assert record['trace_id'] == "abc123"
+    assert record['command'] == "/ask"
+    assert record['spans'][0]['name'] == "sheets.read"
+    assert record['spans'][0]['rows'] == 10
+    assert record['counters'] == {"cache.snapshot.miss": 1}
+
+
+def test_disabled_tracing_is_noop():
+    """With tracing disabled no record is emitted"""
+    records = []
+    tracing.set_sink(records.append)
+
+    try:
+        with tracing.trace("chat_message"):
+            with tracing.span("sheets.read") as span:
+                assert not span.active
+    finally:
+        tracing.set_sink(None)
+
+    assert records == []
+
+
+if __name__ == "__main__":
+    test_trace_records_spans_and_counters()
+    test_disabled_tracing_is_noop()
+    print("[SUCCESS] All tests passed!")
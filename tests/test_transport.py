@@ -0,0 +1,91 @@
+"""
+Test the shared pooled transport (offline, local HTTP server)
+"""
+
+import os
+import sys
+import json
+import threading
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.http import HttpRequest
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Response
+
+from tools.transport import Http2Http, PooledHttp, get_http
+
+
+def _app(environ, start_response):
+    body = json.dumps({"path": environ["PATH_INFO"], "method": environ["REQUEST_METHOD"]})
+    return Response(body, content_type="application/json")(environ, start_response)
+
+
+def test_pooled_http_executes_api_requests():
+    """googleapiclient HttpRequest runs on the adapter and parses the JSON body"""
+    server = make_server("127.0.0.1", 0, _app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        http = PooledHttp(AnonymousCredentials())
+        uri = f"http://127.0.0.1:{server.server_port}/v4/spreadsheets/abc/values/Issues"
+
+        request = HttpRequest(http, lambda resp, content: json.loads(content), uri, method="GET")
+        assert request.execute() == {"path": "/v4/spreadsheets/abc/values/Issues", "method": "GET"}
+
+        resp, _ = http.request(uri, "POST", body=b"{}", headers={"Content-Type": "application/json"})
+        assert resp.status == 200
+        assert resp["content-type"] == "application/json"
+    finally:
+        server.shutdown()
+
+
+def test_transport_is_shared_per_credentials():
+    """The same credentials always map to the same pooled transport"""
+    credentials = AnonymousCredentials()
+    assert get_http(credentials) is get_http(credentials)
+    assert get_http(credentials) is not get_http(AnonymousCredentials())
+
+
+class _FakeCredentials:
+    def __init__(self):
+        self.token, self.refreshes = 'old', 0
+
+    def before_request(self, request, method, uri, headers):
+        headers['authorization'] = f"Bearer {self.token}"
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = 'new'
+
+
+class _FakeResponse:
+    def __init__(self, status_code):
+        self.status_code, self.reason_phrase = status_code, ''
+        self.headers, self.content = {}, b'{}'
+
+
+def test_http2_refreshes_credentials_on_401():
+    """A rejected token is refreshed once and the request retried (no httpx needed)"""
+    sent = []
+
+    class FakeClient:
+        def request(self, method, uri, content=None, headers=None, follow_redirects=True):
+            sent.append(headers['authorization'])
+            return _FakeResponse(401 if headers['authorization'] == 'Bearer old' else 200)
+
+    http = Http2Http.__new__(Http2Http)
+    http.credentials, http.client = _FakeCredentials(), FakeClient()
+    http._auth_request, http._refresh_lock = None, threading.Lock()
+
+    resp, _ = http.request("https://sheets.googleapis.com/v4/x")
+    assert resp.status == 200
+    assert sent == ['Bearer old', 'Bearer new'] and http.credentials.refreshes == 1
+
+
+if __name__ == "__main__":
+    test_pooled_http_executes_api_requests()
+    test_transport_is_shared_per_credentials()
+    test_http2_refreshes_credentials_on_401()
+    print("[SUCCESS] All tests passed!")
@@ -0,0 +1,63 @@
+"""
+Test cache prewarming and sheet-change notification parsing (offline)
+"""
+
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '../benchmarks'))
+sys.path.append(os.path.dirname(__file__))
+
+from brain.gemini_client import GeminiClient
+from fakes import FakeGenerativeModel, FakeSheetsService
+from tools.snapshot import snapshot_cache_for
+from tools.warmup import parse_change_notification, prewarm_sheets
+from test_offline_clients import make_sheets_client, _issue_rows, _schedule_rows
+
+
+def test_notification_formats():
+    """Apps Script bodies and Drive push headers both identify the change"""
+    assert parse_change_notification({}, {'spreadsheet_id': 'abc', 'sheet': 'Issues', 'row': 5}) == ('abc', 'Issues', False)
+    assert parse_change_notification({}, {'spreadsheet_id': 'abc', 'sheet': 'Issues', 'row': 1}) == ('abc', 'Issues', True)
+
+    drive = {'X-Goog-Resource-State': 'update',
+             'X-Goog-Resource-URI': 'https://www.googleapis.com/drive/v3/files/1AbC-x_9?alt=json'}
+    assert parse_change_notification(drive, None) == ('1AbC-x_9', None, False)
+    assert parse_change_notification({'X-Goog-Resource-State': 'sync'}, None) is None
+
+
+def test_warmup_keeps_fresh_snapshot_and_change_replaces_it():
+    """Warm-up reuses an unexpired snapshot; a change notification re-reads the sheet"""
+    service = FakeSheetsService({'Issues': _issue_rows(), 'Schedule': _schedule_rows()})
+    client = make_sheets_client(service)
+
+    first = prewarm_sheets(client)
+    assert first['issues'] == 3 and first['tasks'] == 2
+    cached = snapshot_cache_for(client).peek()
+    assert 'risks' in cached._derived and 'rollups' in cached._derived
+
+    assert prewarm_sheets(client)['version'] == first['version']
+
+    service.sheets['Issues'].append(['4', '', '品質', '新規課題', 'ベンダーC', '田中', '低', '', '新規'])
+    changed = prewarm_sheets(client, changed=True, changed_sheet='Issues')
+    assert changed['issues'] == 4
+    assert changed['version'] != first['version']
+
+
+def test_gemini_warm_up_does_not_generate():
+    """Warm-up opens the model connection with count_tokens, not a billed generation"""
+    model = FakeGenerativeModel()
+    client = GeminiClient(project_id='test', model_name='fake', model=model)
+    remaining = client.get_remaining_requests()
+
+    client.warm_up()
+    assert model.token_counts == 1
+    assert model.calls == 0
+    assert client.get_remaining_requests() == remaining
+
+
+if __name__ == "__main__":
+    test_notification_formats()
+    test_warmup_keeps_fresh_snapshot_and_change_replaces_it()
+    test_gemini_warm_up_does_not_generate()
+    print("[SUCCESS] All tests passed!")